@@ -20,6 +20,8 @@ def get_env_variable(var_name):
 
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv('SECRET_KEY', 'django-insecure-default-key-for-development')
+# Previous secret keys, comma separated, still accepted while rotating
+SECRET_KEY_FALLBACKS = [key for key in os.getenv('SECRET_KEY_FALLBACKS', '').split(',') if key]
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True  # Set to True for development
@@ -49,6 +51,7 @@ INSTALLED_APPS = [
     "debug",
 
     # other local apps
+    "core.apps.CoreConfig",
     "courses.apps.CoursesConfig",
     "reviews.apps.ReviewsConfig",
     "badges.apps.BadgesConfig",
@@ -184,6 +187,56 @@ LOGOUT_REDIRECT_URL = '/login/'
 STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY', 'dummy-dev-key')
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY', 'dummy-dev-key')
 STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET', 'dummy-dev-key')
+# Point at a local stub server (e.g. stripe-mock) for offline runs
+STRIPE_API_BASE = os.getenv('STRIPE_API_BASE', 'https://api.stripe.com')
+
+# Cache shared by every web worker and management command. Cached
+# entitlements, course outlines and the version counters of the in-memory
+# search and availability indexes are invalidated through it, so a change
+# made by one process (e.g. process_stripe_events completing an order) is
+# seen by all of them. Use Redis (REDIS_URL) when running on several
+# machines; otherwise a file-based cache in CACHE_DIR is shared by the
+# processes of this machine.
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR', str(BASE_DIR / 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': 100_000},
+        }
+    }
+
+# Add up views of unlimited video enrollments in the cache and write them
+# with flush_view_counts instead of one UPDATE per play
+VIDEO_VIEW_BUFFERING = os.getenv('VIDEO_VIEW_BUFFERING', 'False') == 'True'
+
+# Let the web server send protected files once Django has checked access:
+# '' (Django sends them), 'x-accel-redirect' (nginx) or 'x-sendfile'.
+# With nginx, FILE_SERVING_ACCEL_PREFIX is an internal location aliased to
+# MEDIA_ROOT.
+FILE_SERVING_OFFLOAD = os.getenv('FILE_SERVING_OFFLOAD', '')
+FILE_SERVING_ACCEL_PREFIX = os.getenv('FILE_SERVING_ACCEL_PREFIX', '/protected-media/')
+
+# Lifetime in seconds of the signed file URLs given out by the API
+MEDIA_URL_MAX_AGE = int(os.getenv('MEDIA_URL_MAX_AGE', 15 * 60))
+
+# Resumable uploads: largest accepted file, and where partly received files
+# are kept (defaults to MEDIA_ROOT/upload_parts, on the same disk as media
+# so finished files are moved rather than copied)
+UPLOAD_MAX_SIZE = int(os.getenv('UPLOAD_MAX_SIZE', 2 * 1024 ** 3))
+UPLOAD_PARTS_DIR = os.getenv('UPLOAD_PARTS_DIR', '')
+
+# Store each distinct uploaded content once (see core.storage)
+if os.getenv('MEDIA_DEDUPLICATION', 'False') == 'True':
+    DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
 
 # Import Zoom settings
 from .settings_zoom import *
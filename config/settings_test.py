@@ -10,6 +10,11 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # File-backed test database so concurrent tests wait on SQLite's
+        # busy timeout instead of failing with "database table is locked"
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -27,6 +32,14 @@ PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.MD5PasswordHasher',
 ]
 
+# Tests run in one process, so a local memory cache is shared enough
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+SILENCED_SYSTEM_CHECKS = ['core.W001']
+
 # Use simple file storage for tests
 DEFAULT_FILE_STORAGE = 'django.core.files.storage.InMemoryStorage'
 
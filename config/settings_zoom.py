@@ -8,10 +8,3 @@ ZOOM_ACCOUNT_ID = os.getenv('ZOOM_ACCOUNT_ID', 'dummy-account-id')
 ZOOM_CLIENT_ID = os.getenv('ZOOM_CLIENT_ID', 'dummy-client-id')
 ZOOM_CLIENT_SECRET = os.getenv('ZOOM_CLIENT_SECRET', 'dummy-client-secret')
 
-# Cache Configuration (using local memory cache for development)
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-    }
-}
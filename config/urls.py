@@ -30,6 +30,7 @@ urlpatterns = [
     path("api/live/", include("live_sessions.urls", namespace="live_sessions")),
     path("api/messaging/", include("messaging.urls", namespace="messaging")),
     path("api/debug/", include("debug.urls")),
+    path("api/", include("core.urls", namespace="core")),
     # reviews, badges will be added next
     
     # Frontend URLs
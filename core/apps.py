@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+from django.core import checks
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core'
+
+    def ready(self):
+        from .checks import check_shared_cache
+        from .signals import connect_blob_signals
+
+        checks.register(check_shared_cache, checks.Tags.caches)
+        connect_blob_signals()
@@ -0,0 +1,33 @@
+"""
+Version counters in the shared cache.
+
+Data cached under a key that includes a version, or copies of data kept
+in each process along with the version they were loaded at, become stale
+once the version is bumped. A counter that is missing (never set, or
+evicted) is seeded with a random number rather than 1, so entries cached
+under an earlier run of the counter never become current again.
+"""
+import secrets
+
+from django.core.cache import cache
+
+
+def _seed(key):
+    cache.add(key, secrets.randbits(48), timeout=None)
+    return cache.get(key)
+
+
+def get_version(key):
+    """Current version, seeding the counter if it is missing"""
+    version = cache.get(key)
+    if version is None:
+        version = _seed(key)
+    return version
+
+
+def bump_version(key):
+    """Move the counter on; returns the new version"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return _seed(key)
@@ -0,0 +1,28 @@
+"""
+System checks for settings the rest of the site relies on
+"""
+from django.conf import settings
+from django.core.checks import Warning
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def check_shared_cache(app_configs, **kwargs):
+    """
+    The default cache must be shared by all processes.
+
+    Entitlements, course outlines and index versions are invalidated in the
+    cache; with a per-process cache, workers keep serving stale entries after
+    another process (a worker or a management command) changes them.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in PROCESS_LOCAL_CACHES:
+        return [Warning(
+            f'The default cache ({backend}) is not shared between processes.',
+            hint='Set REDIS_URL, or use the file-based cache configured in config.settings.',
+            id='core.W001',
+        )]
+    return []
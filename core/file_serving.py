@@ -0,0 +1,203 @@
+"""
+Serving stored files with conditional and byte range request support.
+
+Views check access first and then hand the file to serve_file. Whole files
+go out as a FileResponse, which WSGI servers send with sendfile() when the
+file is on disk. With FILE_SERVING_OFFLOAD set to 'x-accel-redirect'
+(nginx) or 'x-sendfile' (Apache, lighttpd), Django only answers the
+conditional request and leaves the bytes, including byte ranges, to the
+web server.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header, quote_etag
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range Range header.
+
+    Returns:
+        tuple: (start, end) inclusive byte offsets, None when the header is
+        absent or not a single byte range (serve the whole file), or
+        'unsatisfiable' when the range lies outside the file
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        return 'unsatisfiable'
+    return start, end
+
+
+def _iter_range(file, start, length):
+    file.seek(start)
+    remaining = length
+    try:
+        while remaining > 0:
+            chunk = file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+class StoredFile(File):
+    """A file in storage known only by its name, opened on demand"""
+
+    def __init__(self, name, storage=None):
+        super().__init__(None, name)
+        self.storage = storage or default_storage
+
+    @property
+    def size(self):
+        return self.storage.size(self.name)
+
+    @property
+    def path(self):
+        return self.storage.path(self.name)
+
+    def open(self, mode='rb'):
+        self.file = self.storage.open(self.name, mode)
+        return self
+
+
+def file_etag(file):
+    """
+    Validator for a stored file.
+
+    Uploads get a new storage name whenever their content changes, so the
+    name and size identify the content without reading it.
+    """
+    return hashlib.md5(f'{file.name}:{file.size}'.encode()).hexdigest()
+
+
+def _offload(file, content_type):
+    """
+    Response telling the web server to send the file itself, or None when
+    offloading is off or the file is not in local storage.
+    """
+    mode = settings.FILE_SERVING_OFFLOAD
+    if not mode:
+        return None
+    try:
+        path = file.path
+    except (AttributeError, NotImplementedError):
+        return None
+
+    response = HttpResponse(content_type=content_type)
+    if mode == 'x-accel-redirect':
+        # Shared blobs live elsewhere than their name says; use their path
+        location = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        response['X-Accel-Redirect'] = settings.FILE_SERVING_ACCEL_PREFIX + quote(location)
+    elif mode == 'x-sendfile':
+        response['X-Sendfile'] = str(path)
+    else:
+        raise ValueError(f'Unknown FILE_SERVING_OFFLOAD mode: {mode}')
+    return response
+
+
+def serve_file(request, file, content_type, filename=None, etag=None,
+               cache_control=None, as_attachment=False):
+    """
+    Build a response for a stored file.
+
+    Handles If-None-Match (304), and Range requests for a single byte range
+    (206, or 416 when unsatisfiable). A Range request whose If-Range does
+    not match the current ETag gets the full file. When offloading is on,
+    everything but the 304 is left to the web server.
+
+    Args:
+        file: an unopened FieldFile or File
+        etag: validator for the current content, without quotes
+        cache_control: value of the Cache-Control header
+    """
+    quoted_etag = quote_etag(etag) if etag else None
+
+    if quoted_etag and quoted_etag in [
+        tag.strip() for tag in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')
+    ]:
+        response = HttpResponse(status=304)
+    elif (offloaded := _offload(file, content_type)) is not None:
+        response = offloaded
+    else:
+        size = file.size
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if if_range and if_range != quoted_etag:
+            byte_range = None
+
+        if byte_range == 'unsatisfiable':
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        elif byte_range is not None:
+            start, end = byte_range
+            file.open('rb')
+            response = StreamingHttpResponse(
+                _iter_range(file, start, end - start + 1),
+                status=206,
+                content_type=content_type
+            )
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        else:
+            file.open('rb')
+            response = FileResponse(file, content_type=content_type)
+            response['Content-Length'] = str(size)
+
+    if filename and response.status_code != 304:
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+
+    response['Accept-Ranges'] = 'bytes'
+    if quoted_etag:
+        response['ETag'] = quoted_etag
+    if cache_control:
+        response['Cache-Control'] = cache_control
+    return response
+
+
+def serve_protected_file(request, file, as_attachment=False, cache_control='private, no-cache'):
+    """
+    Serve an uploaded file the caller has already checked access to.
+
+    By default the response may only be cached privately and must be
+    revalidated, so a lost entitlement takes effect on the next request.
+    """
+    if not file:
+        raise Http404('No file attached')
+    content_type, encoding = mimetypes.guess_type(file.name)
+    return serve_file(
+        request,
+        file,
+        content_type if content_type and not encoding else 'application/octet-stream',
+        filename=os.path.basename(file.name),
+        etag=file_etag(file),
+        cache_control=cache_control,
+        as_attachment=as_attachment
+    )
@@ -0,0 +1,34 @@
+"""
+Base class for maintenance commands that can also run as a worker
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+
+class PeriodicCommand(BaseCommand):
+    """
+    Command that does its work once, or every --interval seconds.
+
+    Subclasses implement run_once(**options), which does one pass and
+    reports on it. Add arguments by extending add_arguments with super().
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running, repeating every N seconds (0 runs once)'
+        )
+
+    def run_once(self, **options):
+        raise NotImplementedError('subclasses of PeriodicCommand must provide a run_once() method')
+
+    def handle(self, *args, **options):
+        while True:
+            self.run_once(**options)
+            if not options['interval']:
+                break
+            # Drop connections that have expired or broken while sleeping
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -0,0 +1,38 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import signed_urls
+
+
+class Command(BaseCommand):
+    help = 'Benchmark signing and verifying media URLs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--urls', type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        names = [f'pdfs/course-{i % 500}/chapter-{i}.pdf' for i in range(options['urls'])]
+
+        started = time.perf_counter()
+        signed = [signed_urls.sign(name, i) for i, name in enumerate(names)]
+        self.report('Sign', time.perf_counter() - started, len(names))
+
+        timings = []
+        started = time.perf_counter()
+        for name, params in zip(names, signed):
+            t0 = time.perf_counter()
+            if not signed_urls.verify(name, str(params['user']), str(params['expires']), params['signature']):
+                raise AssertionError(f'{name} failed verification')
+            timings.append(time.perf_counter() - t0)
+        self.report('Verify', time.perf_counter() - started, len(names))
+
+        timings.sort()
+        self.stdout.write(
+            f'Verify latency: mean {statistics.mean(timings) * 1e6:.1f}us, '
+            f'p95 {timings[int(len(timings) * 0.95) - 1] * 1e6:.1f}us'
+        )
+
+    def report(self, label, elapsed, count):
+        self.stdout.write(f'{label}: {count} URLs in {elapsed:.2f}s, {count / elapsed:,.0f}/s')
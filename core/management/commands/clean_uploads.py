@@ -0,0 +1,10 @@
+from core.management.base import PeriodicCommand
+from core.uploads import clean_uploads
+
+
+class Command(PeriodicCommand):
+    help = 'Remove abandoned resumable uploads and their partly received files'
+
+    def run_once(self, **options):
+        count = clean_uploads()
+        self.stdout.write(f'Removed {count} uploads')
@@ -0,0 +1,34 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import CommandError
+
+from core.management.base import PeriodicCommand
+from core.storage import ContentAddressedStorage, collect_blobs, recount_references
+
+
+class Command(PeriodicCommand):
+    help = 'Remove deduplicated media blobs that no file field refers to any more'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--recount', action='store_true',
+            help='Rebuild reference counts from the file fields first'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Report without deleting')
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, ContentAddressedStorage):
+            raise CommandError('The default storage is not content addressed (MEDIA_DEDUPLICATION)')
+        super().handle(*args, **options)
+
+    def run_once(self, **options):
+        if options['recount']:
+            changed = recount_references()
+            self.stdout.write(f'Corrected the reference count of {changed} blobs')
+
+        removed, reclaimed = collect_blobs(
+            default_storage, batch_size=options['batch_size'], dry_run=options['dry_run']
+        )
+        verb = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(f'{verb} {removed} blobs, {reclaimed / 1024 ** 2:.1f} MiB reclaimed')
@@ -0,0 +1,66 @@
+"""
+Models shared by the whole site
+"""
+import uuid
+
+from django.conf import settings
+from django.db import models
+
+
+class Upload(models.Model):
+    """
+    A resumable upload of a file for one file field of an existing object.
+
+    Chunks are appended to a part file on disk until offset reaches size;
+    the file is then moved into storage and set on the target object (see
+    core.uploads).
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('complete', 'Complete'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='uploads'
+    )
+    target = models.CharField(max_length=20, help_text="Kind of object the file is for")
+    object_id = models.PositiveIntegerField()
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(help_text="Total size in bytes")
+    offset = models.PositiveBigIntegerField(default=0, help_text="Bytes received so far")
+    sha256 = models.CharField(max_length=64, blank=True)
+    stored_name = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"Upload of {self.filename} ({self.offset}/{self.size})"
+
+
+class Blob(models.Model):
+    """
+    One stored content of ContentAddressedStorage, shared by every file
+    field value with that content (see core.storage).
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.IntegerField(default=0, help_text="File field values naming this blob")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ref_count', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"Blob {self.sha256[:12]} ({self.ref_count} references)"
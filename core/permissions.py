@@ -4,6 +4,7 @@ Custom permissions for role-based access control.
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 from django.shortcuts import get_object_or_404
 from courses.models import Course
+from enrollments.entitlements import can_access_content, get_entitlements
 
 class IsTeacherOrReadOnly(BasePermission):
     """
@@ -64,12 +65,11 @@ class IsEnrolledOrTeacher(BasePermission):
         course_id = view.kwargs.get('course_pk') or request.data.get('course')
         if not course_id:
             return False
-            
-        if not hasattr(request.user, 'student_profile'):
+        
+        try:
+            return get_entitlements(request.user).has_course(course_id)
+        except (TypeError, ValueError):
             return False
-            
-        course = get_object_or_404(Course, pk=course_id)
-        return course.enrollments.filter(student=request.user.student_profile).exists()
 
 class IsStudent(BasePermission):
     def has_permission(self, request, view):
@@ -130,17 +130,8 @@ class IsEnrolledOrPreview(BasePermission):
         if request.user.is_staff or obj.is_preview:
             return True
             
-        # Teachers can access their own content
-        if hasattr(request.user, 'teacher_profile'):
-            return obj.course.teacher.user == request.user
-            
-        # Students need to be enrolled
-        if hasattr(request.user, 'student_profile'):
-            return obj.course.enrollments.filter(
-                student=request.user.student_profile
-            ).exists()
-            
-        return False
+        # Teachers can access their own content, students need to be enrolled
+        return can_access_content(request.user, obj)
 
 
 class CanAccessProgress(BasePermission):
@@ -0,0 +1,30 @@
+"""
+Serializers for the core app.
+"""
+from rest_framework import serializers
+
+from .models import Upload
+from .uploads import TARGETS
+
+
+class UploadCreateSerializer(serializers.Serializer):
+    """Start a resumable upload of a file for an existing object"""
+    target = serializers.ChoiceField(choices=sorted(TARGETS))
+    object_id = serializers.IntegerField(min_value=1)
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+
+    def validate_filename(self, value):
+        if '/' in value or '\\' in value or value in ('.', '..'):
+            raise serializers.ValidationError('Give a file name without a path')
+        return value
+
+
+class UploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Upload
+        fields = [
+            'id', 'target', 'object_id', 'filename', 'size', 'offset',
+            'status', 'sha256', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
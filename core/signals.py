@@ -0,0 +1,49 @@
+"""
+Signal handlers for core.
+
+Keep blob reference counts in step with the file fields stored in
+ContentAddressedStorage: a reference is added when the storage saves a
+file, and dropped here once the row naming it is deleted or points at
+another file.
+
+The handlers are connected per model by connect_blob_signals(), for the
+models with file fields only. Whether those files are content addressed
+depends on the storage in effect when they are saved, so the handlers
+check blob_fields() each time.
+"""
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_delete, pre_save
+
+from .storage import blob_fields, file_fields, release
+
+
+def connect_blob_signals():
+    """Connect the handlers below to every model with a file field"""
+    for model in apps.get_models():
+        if file_fields(model):
+            pre_save.connect(release_replaced_files, sender=model)
+            post_delete.connect(release_deleted_files, sender=model)
+
+
+def release_replaced_files(sender, instance, raw=False, **kwargs):
+    fields = blob_fields(sender)
+    if not fields or raw or instance._state.adding:
+        return
+    previous = sender._base_manager.filter(pk=instance.pk).values_list(
+        *[field.attname for field in fields]
+    ).first()
+    if previous is None:
+        return
+    replaced = [
+        name for field, name in zip(fields, previous)
+        if name and name != getattr(instance, field.attname).name
+    ]
+    if replaced:
+        transaction.on_commit(lambda: release(*replaced))
+
+
+def release_deleted_files(sender, instance, **kwargs):
+    names = [getattr(instance, field.attname).name for field in blob_fields(sender)]
+    if any(names):
+        transaction.on_commit(lambda: release(*names))
@@ -0,0 +1,205 @@
+"""
+Content-addressed storage for uploaded files.
+
+ContentAddressedStorage keeps one copy of each distinct content: a file is
+hashed while it is written, stored once as blobs/<aa>/<sha256> and given
+the name <upload_to>/<sha256>/<original file name>. The name maps to the
+blob without any lookup, so serving a file costs no query, and downloads
+keep their original file name. Names without a hash, from before the
+storage was enabled, are read from their usual place.
+
+Each Blob row counts the file field values naming it. Saving a file adds
+a reference; the model signal handlers in core.signals drop one when a row
+is deleted or its file replaced, so delete() leaves blobs alone. Blobs
+without references are removed in batches by collect_blobs, after a grace
+period so a file being attached is not collected. A blob row is locked
+while a file is added to it or while it is collected, so a new reference
+never points at a removed blob. recount_references rebuilds the counts
+from the file fields if they ever drift.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from collections import Counter
+from datetime import timedelta
+from functools import lru_cache
+
+from django.apps import apps
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Blob
+
+BLOB_DIR = 'blobs'
+HASHED_NAME = re.compile(r'(?:^|/)([0-9a-f]{64})/[^/]+$')
+GRACE_PERIOD = timedelta(hours=1)
+
+
+def blob_digest(name):
+    """SHA-256 a stored name refers to, or None for names without one"""
+    match = HASHED_NAME.search(name or '')
+    return match.group(1) if match else None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage that stores identical files once"""
+
+    def blob_path(self, digest):
+        return os.path.join(self.location, BLOB_DIR, digest[:2], digest)
+
+    def path(self, name):
+        digest = blob_digest(name)
+        if digest is None:
+            return super().path(name)
+        return self.blob_path(digest)
+
+    def get_available_name(self, name, max_length=None):
+        """
+        The name as given, shortened to leave room for the hash.
+
+        Names need no random suffix: two files get the same name only when
+        they have the same content.
+        """
+        name = str(name).replace('\\', '/')
+        dir_name, file_name = os.path.split(name)
+        if '..' in dir_name.split('/'):
+            raise SuspiciousFileOperation(f"Detected path traversal attempt in '{dir_name}'")
+        if max_length:
+            excess = len(name) + 65 - max_length
+            if excess > 0:
+                file_root, file_ext = os.path.splitext(file_name)
+                if excess >= len(file_root):
+                    raise SuspiciousFileOperation(
+                        f'Storage can not fit "{name}" and its content hash in {max_length} characters'
+                    )
+                name = os.path.join(dir_name, file_root[:-excess] + file_ext)
+        return name
+
+    def _save(self, name, content):
+        # Resumable uploads hand over their finished part file and its hash
+        digest = getattr(content, 'sha256', None)
+        if digest and hasattr(content, 'temporary_file_path'):
+            source = content.temporary_file_path()
+            size = os.path.getsize(source)
+        else:
+            source, digest, size = self._write_temporary(content)
+
+        path = self.blob_path(digest)
+        with transaction.atomic():
+            Blob.objects.select_for_update().get_or_create(
+                sha256=digest, defaults={'size': size}
+            )
+            if os.path.exists(path):
+                os.remove(source)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                file_move_safe(source, path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(path, self.file_permissions_mode)
+            Blob.objects.filter(pk=digest).update(ref_count=F('ref_count') + 1)
+
+        dir_name, file_name = os.path.split(name)
+        return '/'.join(filter(None, (dir_name, digest, file_name)))
+
+    def _write_temporary(self, content):
+        """Stream content to a temporary file next to the blobs, hashing it"""
+        directory = os.path.join(self.location, BLOB_DIR)
+        os.makedirs(directory, exist_ok=True)
+        fd, source = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        hasher = hashlib.sha256()
+        size = 0
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in content.chunks():
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                out.write(chunk)
+                hasher.update(chunk)
+                size += len(chunk)
+        return source, hasher.hexdigest(), size
+
+    def delete(self, name):
+        # Blobs are shared; they go once nothing refers to them
+        if blob_digest(name) is None:
+            super().delete(name)
+
+
+def release(*names):
+    """Drop one reference to the blob of each name"""
+    for digest, count in Counter(filter(None, map(blob_digest, names))).items():
+        Blob.objects.filter(pk=digest).update(
+            ref_count=F('ref_count') - count, updated_at=timezone.now()
+        )
+
+
+@lru_cache(maxsize=None)
+def file_fields(model):
+    """File fields of a model, whatever their storage"""
+    return [field for field in model._meta.concrete_fields if isinstance(field, models.FileField)]
+
+
+def blob_fields(model):
+    """File fields of a model whose files are content addressed"""
+    return [
+        field for field in file_fields(model)
+        if isinstance(field.storage, ContentAddressedStorage)
+    ]
+
+
+def recount_references():
+    """
+    Set every blob's count from the file fields naming it.
+
+    Returns:
+        int: number of blobs whose count changed
+    """
+    counts = Counter()
+    for model in apps.get_models():
+        for field in blob_fields(model):
+            names = model._base_manager.exclude(**{field.name: ''}).values_list(field.name, flat=True)
+            counts.update(filter(None, map(blob_digest, names)))
+
+    changed = 0
+    with transaction.atomic():
+        for digest, ref_count in Blob.objects.values_list('sha256', 'ref_count'):
+            if counts.get(digest, 0) != ref_count:
+                Blob.objects.filter(pk=digest).update(
+                    ref_count=counts.get(digest, 0), updated_at=timezone.now()
+                )
+                changed += 1
+    return changed
+
+
+def collect_blobs(storage, batch_size=500, now=None, dry_run=False):
+    """
+    Remove blobs nothing has referred to for GRACE_PERIOD.
+
+    Returns:
+        tuple: (blobs removed, bytes reclaimed)
+    """
+    cutoff = (now or timezone.now()) - GRACE_PERIOD
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    removed = reclaimed = 0
+    last = ''
+    while True:
+        with transaction.atomic():
+            batch = list(
+                Blob.objects.filter(ref_count__lte=0, updated_at__lt=cutoff, sha256__gt=last)
+                .order_by('sha256')
+                .select_for_update(skip_locked=skip_locked)
+                .values_list('sha256', 'size')[:batch_size]
+            )
+            if not batch:
+                return removed, reclaimed
+            last = batch[-1][0]
+            if not dry_run:
+                for digest, _ in batch:
+                    if os.path.exists(storage.blob_path(digest)):
+                        os.remove(storage.blob_path(digest))
+                Blob.objects.filter(pk__in=[digest for digest, _ in batch]).delete()
+        removed += len(batch)
+        reclaimed += sum(size for _, size in batch)
@@ -0,0 +1,18 @@
+"""
+Tests for the core system checks
+"""
+from django.test import SimpleTestCase, override_settings
+
+from core.checks import check_shared_cache
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_cache_is_reported(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['core.W001'])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp/cache'
+    }})
+    def test_shared_cache_passes(self):
+        self.assertEqual(check_shared_cache(None), [])
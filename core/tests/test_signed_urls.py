@@ -0,0 +1,69 @@
+"""
+Tests for signed media URLs
+"""
+import shutil
+import tempfile
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient, APIRequestFactory
+
+from accounts.models import TeacherProfile
+from core import signed_urls
+from courses.content_serializers import PDFSerializer
+from courses.models import PDF, Course
+
+User = get_user_model()
+
+
+class SignedUrlTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        teacher_user = User.objects.create_user(username='teacher', password='teacher123')
+        teacher = TeacherProfile.objects.create(user=teacher_user)
+        course = Course.objects.create(teacher=teacher, title='Course', price=50, published=True)
+        self.pdf = PDF.objects.create(course=course, title='Notes')
+        self.pdf.file.save('notes.pdf', ContentFile(b'%PDF-1.4 notes'))
+        request = APIRequestFactory().get('/')
+        request.user = teacher_user
+        self.data = PDFSerializer(self.pdf, context={'request': request}).data
+        url = urlsplit(self.data['file_url'])
+        self.url = f'{url.path}?{url.query}'
+
+    def test_only_the_signed_url_is_exposed(self):
+        self.assertNotIn('file', self.data)
+
+    def test_signed_url_serves_the_file_without_queries(self):
+        with self.assertNumQueries(0):
+            response = APIClient().get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4 notes')
+        self.assertTrue(response['Cache-Control'].startswith('private, max-age='))
+
+    def test_tampered_or_expired_urls_are_rejected(self):
+        client = APIClient()
+        self.assertEqual(client.get(self.url.replace('notes', 'other')).status_code, 403)
+        self.assertEqual(client.get(self.url.replace('user=', 'user=9')).status_code, 403)
+        self.assertEqual(client.get(self.url.split('&signature')[0]).status_code, 403)
+
+        params = signed_urls.sign(self.pdf.file.name, 1, max_age=-3600)
+        self.assertFalse(signed_urls.verify(
+            self.pdf.file.name, params['user'], params['expires'], params['signature']
+        ))
+
+    def test_urls_survive_key_rotation(self):
+        name = self.pdf.file.name
+        params = signed_urls.sign(name, 1)
+
+        with override_settings(SECRET_KEY='new-key', SECRET_KEY_FALLBACKS=['test-secret-key-for-testing-only']):
+            self.assertTrue(signed_urls.verify(name, params['user'], params['expires'], params['signature']))
+        with override_settings(SECRET_KEY='new-key', SECRET_KEY_FALLBACKS=[]):
+            self.assertFalse(signed_urls.verify(name, params['user'], params['expires'], params['signature']))
@@ -0,0 +1,115 @@
+"""
+Tests for content-addressed, deduplicating media storage
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db.models.signals import post_delete, pre_save
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import TeacherProfile
+from core.models import Blob
+from core.storage import blob_digest
+from courses.models import PDF, Course
+
+User = get_user_model()
+WORKSHEET = b'%PDF-1.4 worksheet' * 1000
+DIGEST = hashlib.sha256(WORKSHEET).hexdigest()
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        storage = override_settings(
+            MEDIA_ROOT=self.media_root,
+            STORAGES={'default': {'BACKEND': 'core.storage.ContentAddressedStorage'}}
+        )
+        storage.enable()
+        self.addCleanup(storage.disable)
+
+        teacher_user = User.objects.create_user(username='teacher', password='teacher123')
+        teacher = TeacherProfile.objects.create(user=teacher_user)
+        self.teacher_user = teacher_user
+        self.courses = [
+            Course.objects.create(teacher=teacher, title=f'Course {i}', price=50) for i in range(2)
+        ]
+
+    def attach(self, course, content=WORKSHEET, name='worksheet.pdf'):
+        with self.captureOnCommitCallbacks(execute=True):
+            pdf = PDF.objects.create(course=course, title='Worksheet')
+            pdf.file.save(name, ContentFile(content))
+        return pdf
+
+    def blob_files(self):
+        return [
+            name for _, _, names in os.walk(os.path.join(self.media_root, 'blobs')) for name in names
+        ]
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.attach(self.courses[0])
+        second = self.attach(self.courses[1], name='copy.pdf')
+
+        self.assertEqual(blob_digest(first.file.name), DIGEST)
+        self.assertTrue(second.file.name.endswith(f'/{DIGEST}/copy.pdf'))
+        self.assertEqual(self.blob_files(), [DIGEST])
+        self.assertEqual(Blob.objects.get().ref_count, 2)
+        with second.file.open('rb') as stored:
+            self.assertEqual(stored.read(), WORKSHEET)
+
+    def test_handlers_listen_to_models_with_files_only(self):
+        self.assertTrue(pre_save.has_listeners(PDF))
+        self.assertTrue(post_delete.has_listeners(PDF))
+        self.assertFalse(pre_save.has_listeners(Blob))
+        self.assertFalse(post_delete.has_listeners(Blob))
+
+    def test_unreferenced_blobs_are_collected(self):
+        kept = self.attach(self.courses[0])
+        replaced = self.attach(self.courses[1], content=b'first draft')
+        with self.captureOnCommitCallbacks(execute=True):
+            replaced.file.save('final.pdf', ContentFile(WORKSHEET))
+        with self.captureOnCommitCallbacks(execute=True):
+            kept.delete()
+
+        self.assertEqual(
+            dict(Blob.objects.values_list('sha256', 'ref_count')),
+            {DIGEST: 1, hashlib.sha256(b'first draft').hexdigest(): 0}
+        )
+        Blob.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        out = StringIO()
+        call_command('collect_blobs', '--recount', stdout=out)
+
+        self.assertIn('Corrected the reference count of 0 blobs', out.getvalue())
+        self.assertIn('Removed 1 blobs', out.getvalue())
+        self.assertEqual(self.blob_files(), [DIGEST])
+        self.assertEqual(list(Blob.objects.values_list('sha256', flat=True)), [DIGEST])
+
+    def test_resumable_uploads_reuse_their_hash(self):
+        self.attach(self.courses[0])
+        pdf = PDF.objects.create(course=self.courses[1], title='Worksheet')
+        client = APIClient()
+        client.force_authenticate(user=self.teacher_user)
+        upload = client.post('/api/uploads/', {
+            'target': 'pdf', 'object_id': pdf.id, 'filename': 'worksheet.pdf', 'size': len(WORKSHEET)
+        }, format='json').data
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.patch(
+                f"/api/uploads/{upload['id']}/", WORKSHEET,
+                content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET='0'
+            )
+
+        self.assertEqual(response.data['status'], 'complete')
+        pdf.refresh_from_db()
+        self.assertEqual(blob_digest(pdf.file.name), DIGEST)
+        self.assertEqual(self.blob_files(), [DIGEST])
+        self.assertEqual(Blob.objects.get().ref_count, 2)
@@ -0,0 +1,113 @@
+"""
+Tests for resumable chunked uploads
+"""
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import TeacherProfile
+from core import uploads
+from core.models import Upload
+from courses.models import PDF, Course
+
+User = get_user_model()
+CONTENT = os.urandom(200_000)
+
+
+class UploadTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.teacher_user = User.objects.create_user(username='teacher', password='teacher123')
+        teacher = TeacherProfile.objects.create(user=self.teacher_user)
+        course = Course.objects.create(teacher=teacher, title='Course', price=50, published=True)
+        self.pdf = PDF.objects.create(course=course, title='Notes')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.teacher_user)
+
+    def start(self, **fields):
+        data = {'target': 'pdf', 'object_id': self.pdf.id, 'filename': 'notes.pdf', 'size': len(CONTENT)}
+        data.update(fields)
+        return self.client.post('/api/uploads/', data, format='json')
+
+    def send(self, upload_id, offset, data, **headers):
+        return self.client.patch(
+            f'/api/uploads/{upload_id}/', data,
+            content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset), **headers
+        )
+
+    def test_chunks_are_assembled_and_attached(self):
+        response = self.start()
+        self.assertEqual(response.status_code, 201)
+        upload_id = response.data['id']
+        self.assertTrue(response['Location'].endswith(f'/api/uploads/{upload_id}/'))
+
+        self.assertEqual(self.send(upload_id, 0, CONTENT[:70_000]).status_code, 200)
+        # A retried chunk at a stale offset is refused with the current offset
+        response = self.send(upload_id, 0, CONTENT[:70_000])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '70000')
+
+        # Another process picks up the upload: the hash is read back once
+        uploads._hashers.clear()
+        self.assertEqual(self.client.head(f'/api/uploads/{upload_id}/')['Upload-Offset'], '70000')
+        response = self.send(upload_id, 70_000, CONTENT[70_000:])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'complete')
+        self.assertEqual(response.data['sha256'], hashlib.sha256(CONTENT).hexdigest())
+        self.pdf.refresh_from_db()
+        with self.pdf.file.open('rb') as stored:
+            self.assertEqual(stored.read(), CONTENT)
+        self.assertEqual(os.listdir(uploads.parts_dir()), [])
+
+    def test_chunks_of_one_upload_are_written_one_at_a_time(self):
+        upload_id = self.start().data['id']
+        upload = Upload.objects.get(pk=upload_id)
+
+        with open(uploads.part_path(upload), 'r+b') as part, uploads._locked(part):
+            response = self.send(upload_id, 0, CONTENT[:1000])
+        self.assertEqual(response.status_code, 423)
+        self.assertEqual(self.send(upload_id, 0, CONTENT[:1000]).status_code, 200)
+
+    def test_chunk_checksums_and_limits(self):
+        upload_id = self.start().data['id']
+        chunk = CONTENT[:1000]
+        wrong = 'sha256 ' + base64.b64encode(hashlib.sha256(b'other').digest()).decode()
+        right = 'sha256 ' + base64.b64encode(hashlib.sha256(chunk).digest()).decode()
+
+        self.assertEqual(self.send(upload_id, 0, chunk, HTTP_UPLOAD_CHECKSUM=wrong).status_code, 460)
+        self.assertEqual(Upload.objects.get(pk=upload_id).offset, 0)
+        self.assertEqual(self.send(upload_id, 0, chunk, HTTP_UPLOAD_CHECKSUM=right).status_code, 200)
+        self.assertEqual(self.send(upload_id, 1000, CONTENT).status_code, 413)
+
+        self.assertEqual(self.start(filename='notes.exe').status_code, 400)
+        with override_settings(UPLOAD_MAX_SIZE=100):
+            self.assertEqual(self.start().status_code, 413)
+        student = User.objects.create_user(username='student', password='student123')
+        self.client.force_authenticate(user=student)
+        self.assertEqual(self.start().status_code, 403)
+        self.assertEqual(self.client.get(f'/api/uploads/{upload_id}/').status_code, 404)
+
+    def test_abandoned_uploads_are_cleaned(self):
+        upload_id = self.start().data['id']
+        self.send(upload_id, 0, CONTENT[:1000])
+        Upload.objects.filter(pk=upload_id).update(updated_at=timezone.now() - timedelta(days=2))
+
+        self.assertEqual(uploads.clean_uploads(), 1)
+
+        self.assertFalse(Upload.objects.exists())
+        self.assertEqual(os.listdir(uploads.parts_dir()), [])
@@ -0,0 +1,89 @@
+"""
+Views for resumable chunked uploads
+"""
+from rest_framework import mixins, permissions, status, viewsets
+from rest_framework.response import Response
+
+from .models import Upload
+from .serializers import UploadCreateSerializer, UploadSerializer
+from .uploads import UploadError, abort_upload, append_chunk, parse_checksum, start_upload
+
+CHUNK_CONTENT_TYPE = 'application/offset+octet-stream'
+
+
+class UploadViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Resumable uploads.
+
+    create:
+        Start an upload (target, object_id, filename, size)
+
+    retrieve:
+        Current offset, also in the Upload-Offset header (HEAD works too)
+
+    partial_update:
+        Append a chunk: raw bytes with the Upload-Offset header and
+        optionally Upload-Checksum ('sha256 <base64>')
+
+    destroy:
+        Abort the upload
+    """
+    serializer_class = UploadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Upload.objects.filter(user=self.request.user)
+
+    def _response(self, upload, status_code=status.HTTP_200_OK):
+        response = Response(UploadSerializer(upload).data, status=status_code)
+        response['Upload-Offset'] = str(upload.offset)
+        response['Upload-Length'] = str(upload.size)
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    def _error(self, error):
+        return Response({'error': str(error)}, status=error.status)
+
+    def create(self, request):
+        serializer = UploadCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            upload = start_upload(request.user, **serializer.validated_data)
+        except UploadError as e:
+            return self._error(e)
+        response = self._response(upload, status.HTTP_201_CREATED)
+        response['Location'] = request.build_absolute_uri(f'{upload.pk}/')
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._response(self.get_object())
+
+    def partial_update(self, request, *args, **kwargs):
+        upload = self.get_object()
+        if request.content_type != CHUNK_CONTENT_TYPE:
+            return Response(
+                {'error': f'Send chunks as {CHUNK_CONTENT_TYPE}'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers.get('Content-Length') or 0)
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'Upload-Offset and Content-Length headers are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            checksum = parse_checksum(request.headers.get('Upload-Checksum'))
+            # Read the raw body; DRF's parsers would buffer it
+            upload = append_chunk(upload, offset, request.stream, length, checksum)
+        except UploadError as e:
+            response = self._error(e)
+            response['Upload-Offset'] = str(upload.offset)
+            return response
+        return self._response(upload)
+
+    def destroy(self, request, *args, **kwargs):
+        abort_upload(self.get_object())
+        return Response(status=status.HTTP_204_NO_CONTENT)
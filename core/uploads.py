@@ -0,0 +1,356 @@
+"""
+Resumable chunked uploads of files for existing objects.
+
+An upload is started for one file field of an object the user may change
+(a course PDF, an assignment or message attachment, a submission file)
+with the file's name and total size. Chunks are then sent in order, each
+with the offset it starts at; after a lost connection the client asks for
+the current offset and carries on from there.
+
+Chunks are streamed from the request into a part file under
+UPLOAD_PARTS_DIR while a SHA-256 of the whole file is updated, so the file
+is never held in memory and never read back to hash it. The running hash
+of each upload is kept in the process that last wrote to it; another
+process rebuilds it from the part file once. A chunk may carry its own
+checksum, and is dropped if it does not match. When the last byte
+arrives, the part file is moved (renamed on local storage) into the
+field's storage and set on the object.
+
+A lock on the part file (flock, or msvcrt.locking on Windows) keeps two
+requests from writing the same upload at once. Uploads left pending for UPLOAD_EXPIRY and their part files are
+removed by clean_uploads.
+"""
+import base64
+import binascii
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable, Tuple
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Upload
+
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+MAX_PENDING_UPLOADS = 20
+UPLOAD_EXPIRY = timedelta(days=1)
+READ_SIZE = 64 * 1024
+MAX_CACHED_HASHERS = 1000
+
+
+class UploadError(Exception):
+    """A request cannot be applied to an upload"""
+
+    def __init__(self, message, status=400):
+        self.status = status
+        super().__init__(message)
+
+
+def _teaches(user, obj):
+    teacher = getattr(user, 'teacher_profile', None)
+    return user.is_staff or (teacher is not None and obj.course.teacher_id == teacher.id)
+
+
+@dataclass(frozen=True)
+class UploadTarget:
+    model: str
+    field: str
+    can_upload: Callable
+    extensions: Tuple[str, ...] = ()
+
+
+TARGETS = {
+    'pdf': UploadTarget('courses.PDF', 'file', _teaches, ('.pdf',)),
+    'assignment': UploadTarget('courses.Assignment', 'attachment', _teaches),
+    'submission': UploadTarget('courses.Submission', 'file', lambda user, obj: obj.student_id == user.pk),
+    'message': UploadTarget('messaging.Message', 'attachment', lambda user, obj: obj.sender_id == user.pk),
+}
+
+
+class PartFile(File):
+    """A finished part file; local storage moves it instead of copying"""
+
+    def __init__(self, path, name):
+        super().__init__(open(path, 'rb'), name)
+        self.path = path
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def parts_dir():
+    return settings.UPLOAD_PARTS_DIR or os.path.join(settings.MEDIA_ROOT, 'upload_parts')
+
+
+def part_path(upload):
+    return os.path.join(parts_dir(), f'{upload.pk}.part')
+
+
+def _target_object(target, object_id):
+    spec = TARGETS[target]
+    return spec, apps.get_model(spec.model).objects.filter(pk=object_id).first()
+
+
+def start_upload(user, target, object_id, filename, size):
+    """
+    Register an upload and create its empty part file.
+
+    Raises:
+        UploadError: unknown target, object or extension, no permission,
+        file too large or too many pending uploads
+    """
+    if target not in TARGETS:
+        raise UploadError(f'Unknown upload target: {target}')
+    spec, obj = _target_object(target, object_id)
+    if obj is None:
+        raise UploadError('Object not found', status=404)
+    if not spec.can_upload(user, obj):
+        raise UploadError('You cannot upload files for this object', status=403)
+    if spec.extensions and not filename.lower().endswith(spec.extensions):
+        raise UploadError(f"Only {', '.join(spec.extensions)} files can be uploaded here")
+    if size > settings.UPLOAD_MAX_SIZE:
+        raise UploadError(f'Files are limited to {settings.UPLOAD_MAX_SIZE} bytes', status=413)
+    if Upload.objects.filter(user=user, status='pending').count() >= MAX_PENDING_UPLOADS:
+        raise UploadError('Too many unfinished uploads', status=429)
+
+    upload = Upload.objects.create(
+        user=user, target=target, object_id=object_id, filename=filename, size=size
+    )
+    os.makedirs(parts_dir(), exist_ok=True)
+    open(part_path(upload), 'xb').close()
+    return upload
+
+
+def _busy():
+    return UploadError('Another chunk of this upload is being written', status=423)
+
+
+if os.name == 'nt':
+    import msvcrt
+
+    # Windows locks are mandatory, so lock a byte past any upload's data
+    LOCK_OFFSET = 2 ** 62
+
+    @contextmanager
+    def _locked(part):
+        """Hold an exclusive lock on an open part file, or raise a 423"""
+        part.seek(LOCK_OFFSET)
+        try:
+            msvcrt.locking(part.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            raise _busy()
+        try:
+            yield
+        finally:
+            part.seek(LOCK_OFFSET)
+            msvcrt.locking(part.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    @contextmanager
+    def _locked(part):
+        """Hold an exclusive lock on an open part file, or raise a 423"""
+        try:
+            fcntl.flock(part, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise _busy()
+        try:
+            yield
+        finally:
+            fcntl.flock(part, fcntl.LOCK_UN)
+
+
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+def _running_hash(upload, part):
+    """SHA-256 of the upload's first offset bytes, cached or read back"""
+    with _hashers_lock:
+        cached = _hashers.get(upload.pk)
+    if cached is not None and cached[0] == upload.offset:
+        return cached[1].copy()
+
+    hasher = hashlib.sha256()
+    part.seek(0)
+    remaining = upload.offset
+    while remaining > 0:
+        data = part.read(min(READ_SIZE, remaining))
+        if not data:
+            raise UploadError('Part file is shorter than the upload offset', status=500)
+        hasher.update(data)
+        remaining -= len(data)
+    return hasher
+
+
+def _remember_hash(upload, hasher):
+    with _hashers_lock:
+        _hashers.pop(upload.pk, None)
+        if len(_hashers) >= MAX_CACHED_HASHERS:
+            _hashers.pop(next(iter(_hashers)))
+        _hashers[upload.pk] = (upload.offset, hasher)
+
+
+def _forget_hash(upload):
+    with _hashers_lock:
+        _hashers.pop(upload.pk, None)
+
+
+def parse_checksum(header):
+    """
+    Parse an Upload-Checksum header ('sha256 <base64 digest>').
+
+    Returns:
+        bytes: the expected digest, or None without a header
+    """
+    if not header:
+        return None
+    algorithm, _, encoded = header.strip().partition(' ')
+    if algorithm.lower() != 'sha256':
+        raise UploadError(f'Unsupported checksum algorithm: {algorithm}')
+    try:
+        return base64.b64decode(encoded, validate=True)
+    except binascii.Error:
+        raise UploadError('Checksum is not valid base64')
+
+
+def append_chunk(upload, offset, stream, length, checksum=None):
+    """
+    Write the next chunk of an upload and finish it after the last one.
+
+    Bytes received before a lost connection are kept (and the offset
+    advanced) unless the chunk had a checksum to verify.
+
+    Args:
+        stream: file-like object to read length bytes from
+        checksum: expected SHA-256 digest of the chunk, or None
+
+    Returns:
+        Upload: with the new offset, complete after the last chunk
+
+    Raises:
+        UploadError: wrong offset (409), chunk too large (413), another
+        request writing the same upload (423), checksum mismatch (460)
+    """
+    if upload.status != 'pending':
+        raise UploadError('Upload is already complete', status=409)
+    if length > MAX_CHUNK_SIZE:
+        raise UploadError(f'Chunks are limited to {MAX_CHUNK_SIZE} bytes', status=413)
+    if offset + length > upload.size:
+        raise UploadError('Chunk goes past the declared upload size', status=413)
+
+    with open(part_path(upload), 'r+b') as part, _locked(part):
+        upload.refresh_from_db(fields=['offset', 'status'])
+        if upload.status != 'pending':
+            raise UploadError('Upload is already complete', status=409)
+        if offset != upload.offset:
+            raise UploadError(f'Upload is at offset {upload.offset}', status=409)
+
+        hasher = _running_hash(upload, part)
+        chunk_hasher = hashlib.sha256() if checksum is not None else None
+        before = hasher.copy() if checksum is not None else None
+        part.seek(offset)
+        part.truncate()
+
+        received = 0
+        interrupted = False
+        try:
+            while received < length:
+                data = stream.read(min(READ_SIZE, length - received))
+                if not data:
+                    interrupted = True
+                    break
+                part.write(data)
+                hasher.update(data)
+                if chunk_hasher:
+                    chunk_hasher.update(data)
+                received += len(data)
+        except OSError:
+            interrupted = True
+
+        if chunk_hasher and (interrupted or chunk_hasher.digest() != checksum):
+            part.truncate(offset)
+            _remember_hash(upload, before)
+            if interrupted:
+                raise UploadError('Connection lost before the chunk could be verified')
+            raise UploadError('Chunk does not match its checksum', status=460)
+
+        part.flush()
+        os.fsync(part.fileno())
+        upload.offset = offset + received
+        Upload.objects.filter(pk=upload.pk).update(offset=upload.offset, updated_at=timezone.now())
+        _remember_hash(upload, hasher)
+        if interrupted:
+            raise UploadError(f'Connection lost; upload is at offset {upload.offset}')
+
+        if upload.offset == upload.size:
+            _complete(upload, hasher)
+    return upload
+
+
+def _complete(upload, hasher):
+    """Move the finished part file into storage and attach it to its object"""
+    spec, obj = _target_object(upload.target, upload.object_id)
+    if obj is None:
+        raise UploadError('Object not found', status=404)
+
+    field_file = getattr(obj, spec.field)
+    content = PartFile(part_path(upload), upload.filename)
+    # Lets content-addressed storage skip hashing the file again
+    content.sha256 = hasher.hexdigest()
+    try:
+        with transaction.atomic():
+            field_file.save(upload.filename, content, save=True)
+            upload.sha256 = hasher.hexdigest()
+            upload.stored_name = field_file.name
+            upload.status = 'complete'
+            upload.save(update_fields=['sha256', 'stored_name', 'status', 'updated_at'])
+    finally:
+        content.close()
+    _forget_hash(upload)
+    if os.path.exists(part_path(upload)):
+        os.remove(part_path(upload))
+
+
+def abort_upload(upload):
+    """Delete an upload and whatever part of the file was received"""
+    _forget_hash(upload)
+    if os.path.exists(part_path(upload)):
+        os.remove(part_path(upload))
+    upload.delete()
+
+
+def clean_uploads(now=None):
+    """
+    Remove uploads untouched for UPLOAD_EXPIRY, and part files left
+    without an upload.
+
+    Returns:
+        int: number of uploads removed
+    """
+    cutoff = (now or timezone.now()) - UPLOAD_EXPIRY
+    stale = Upload.objects.filter(updated_at__lt=cutoff)
+    removed = 0
+    for upload in stale.filter(status='pending').iterator():
+        abort_upload(upload)
+        removed += 1
+    removed += stale.filter(status='complete').delete()[0]
+
+    directory = parts_dir()
+    if os.path.isdir(directory):
+        pending = {str(pk) for pk in Upload.objects.filter(status='pending').values_list('pk', flat=True)}
+        for entry in os.scandir(directory):
+            name, extension = os.path.splitext(entry.name)
+            if (
+                extension == '.part' and name not in pending
+                and entry.stat().st_mtime < cutoff.timestamp()
+            ):
+                os.remove(entry.path)
+    return removed
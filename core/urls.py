@@ -0,0 +1,17 @@
+"""
+URL configuration for the core app.
+"""
+from django.urls import path, include
+from rest_framework.routers import SimpleRouter
+
+from . import upload_views, views
+
+app_name = 'core'
+
+router = SimpleRouter()
+router.register(r'uploads', upload_views.UploadViewSet, basename='upload')
+
+urlpatterns = [
+    path('media/<path:name>', views.signed_media, name='signed-media'),
+    path('', include(router.urls)),
+]
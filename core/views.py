@@ -0,0 +1,39 @@
+"""
+Views shared by the whole site
+"""
+import mimetypes
+import time
+
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponseForbidden
+from django.views.decorators.http import require_safe
+
+from .file_serving import StoredFile, serve_protected_file
+from .signed_urls import verify
+
+# Types a browser may render from our origin; anything else is downloaded
+INLINE_TYPES = ('application/pdf', 'image/png', 'image/jpeg', 'image/gif', 'image/webp', 'text/plain')
+
+
+@require_safe
+def signed_media(request, name):
+    """
+    Serve an uploaded file to the holder of a signed URL.
+
+    Access was checked when the URL was signed, so this makes no database
+    query; the URL may be cached until it expires.
+    """
+    params = request.GET
+    if not verify(name, params.get('user'), params.get('expires'), params.get('signature')):
+        return HttpResponseForbidden('Invalid or expired link')
+    if not default_storage.exists(name):
+        raise Http404('No such file')
+
+    content_type, _ = mimetypes.guess_type(name)
+    max_age = max(int(params['expires']) - int(time.time()), 0)
+    return serve_protected_file(
+        request,
+        StoredFile(name),
+        as_attachment=content_type not in INLINE_TYPES,
+        cache_control=f'private, max-age={max_age}'
+    )
@@ -55,6 +55,7 @@ class Assignment(models.Model):
     # Attached files
     attachment = models.FileField(
         upload_to='assignment_files/',
+        max_length=255,
         null=True,
         blank=True,
         help_text="Optional file attachment (worksheet, template, etc.)"
@@ -110,6 +111,7 @@ class Submission(models.Model):
     )
     file = models.FileField(
         upload_to='assignment_submissions/',
+        max_length=255,
         null=True,
         blank=True,
         help_text="File upload for the assignment"
@@ -180,6 +182,7 @@ class AssignmentFeedback(models.Model):
     # Optional attachment
     attachment = models.FileField(
         upload_to='feedback_attachments/',
+        max_length=255,
         null=True,
         blank=True
     )
@@ -2,6 +2,7 @@
 Serializers for assignment models
 """
 from rest_framework import serializers
+from core.signed_urls import signed_media_url
 from courses.assignment_models import Assignment, Submission, AssignmentFeedback
 
 
@@ -18,14 +19,12 @@ class AssignmentSerializer(serializers.ModelSerializer):
             'max_points', 'attachment', 'attachment_url'
         ]
         read_only_fields = ['created_at']
+        # Clients get the file through attachment_url only
+        extra_kwargs = {'attachment': {'write_only': True}}
     
     def get_attachment_url(self, obj):
-        """Get full URL for attachment if present"""
-        if obj.attachment and obj.attachment.url:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.attachment.url)
-        return None
+        """Get a signed, expiring URL for attachment if present"""
+        return signed_media_url(self.context.get('request'), obj.attachment)
 
 
 class SubmissionSerializer(serializers.ModelSerializer):
@@ -45,14 +44,12 @@ class SubmissionSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['submitted_at', 'modified_at', 'student', 'status', 
                            'points_earned', 'graded_by', 'graded_at']
+        # Clients get the file through file_url only
+        extra_kwargs = {'file': {'write_only': True}}
     
     def get_file_url(self, obj):
-        """Get full URL for file if present"""
-        if obj.file and obj.file.url:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.file.url)
-        return None
+        """Get a signed, expiring URL for file if present"""
+        return signed_media_url(self.context.get('request'), obj.file)
     
     def create(self, validated_data):
         """Set the student to the current user"""
@@ -88,14 +85,12 @@ class AssignmentFeedbackSerializer(serializers.ModelSerializer):
             'created_at', 'attachment', 'attachment_url'
         ]
         read_only_fields = ['created_at', 'teacher']
+        # Clients get the file through attachment_url only
+        extra_kwargs = {'attachment': {'write_only': True}}
     
     def get_attachment_url(self, obj):
-        """Get full URL for attachment if present"""
-        if obj.attachment and obj.attachment.url:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.attachment.url)
-        return None
+        """Get a signed, expiring URL for attachment if present"""
+        return signed_media_url(self.context.get('request'), obj.attachment)
     
     def create(self, validated_data):
         """Set the teacher to the current user"""
@@ -15,6 +15,7 @@ from courses.assignment_serializers import (
     AssignmentFeedbackSerializer
 )
 from courses.models import Course
+from core.file_serving import serve_protected_file
 from core.permissions import IsEnrolledOrTeacher, IsTeacherOrReadOnly, IsTeacher
 
 
@@ -312,6 +313,11 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         )
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def file(self, request, pk=None, **kwargs):
+        """Download the submitted file (the student and the course's teacher)"""
+        return serve_protected_file(request, self.get_object().file, as_attachment=True)
+
 
 class FeedbackViewSet(viewsets.ModelViewSet):
     """
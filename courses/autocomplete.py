@@ -0,0 +1,314 @@
+"""
+In-memory prefix index for search-as-you-type.
+
+Published course titles, names of teachers with published courses and
+category names are folded like course search text (lower case, no
+accents) and split into words. Every word becomes a key
+(word, -popularity, kind, id) in one sorted list, so the entries with a
+word starting with a prefix are a contiguous run found with bisect.
+Popularity is the number of enrollments: a course's own, and the sum over
+the courses of a teacher or category.
+
+Short prefixes match long runs, so the top results of every prefix of up
+to PRECOMPUTED_PREFIX_LENGTH letters are computed when the index is
+loaded, and those of any other query that scans a long run are memoized.
+A change drops the memoized prefixes of the words it touches, and all
+memoized multi-word queries. The index is loaded lazily and kept up to
+date by the course, category and user signal handlers. Like the
+availability index, other processes notice changes through a version
+counter in the shared cache. Enrollment counts are not tracked one by one;
+the whole index is reloaded every REFRESH_SECONDS to pick them up.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from itertools import groupby
+
+from django.db.models import Count, Q
+
+from core.cache_versions import bump_version, get_version
+
+from .search import STOP_WORDS, WORD_PATTERN, fold
+
+VERSION_CACHE_KEY = 'courses_autocomplete_version'
+REFRESH_SECONDS = 15 * 60
+MAX_LIMIT = 20
+PRECOMPUTED_PREFIX_LENGTH = 3
+# Queries scanning more keys than this are memoized
+MEMO_MIN_RUN = 256
+# Memoized multi-word queries are dropped all at once past this many
+MAX_MEMOIZED_PHRASES = 10_000
+# Sorts after any word starting with a given prefix
+PREFIX_END = chr(0x10FFFF)
+
+KINDS = ('course', 'teacher', 'category')
+
+
+def words(label):
+    """Folded words of a label that can start a match"""
+    folded = WORD_PATTERN.findall(fold(label))
+    kept = [word for word in folded if word not in STOP_WORDS]
+    return sorted(set(kept or folded))
+
+
+def _best(keys, entries, others=(), limit=MAX_LIMIT):
+    """
+    Most popular entries among keys whose words also match others.
+
+    Returns:
+        list of (kind, object_id, label)
+    """
+    matches = {}
+    for _, negative_popularity, kind, object_id in keys:
+        if (kind, object_id) in matches:
+            continue
+        label, _, entry_words = entries[(kind, object_id)]
+        if all(any(word.startswith(other) for word in entry_words) for other in others):
+            matches[(kind, object_id)] = (
+                negative_popularity, len(label), KINDS.index(kind), object_id, kind, label
+            )
+    return [
+        (kind, object_id, label)
+        for *_, object_id, kind, label in heapq.nsmallest(limit, matches.values())
+    ]
+
+
+class AutocompleteIndex:
+    """Sorted word keys of courses, teachers and categories"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """Drop the local copy; it is reloaded on the next query"""
+        with self._lock:
+            self._keys = []
+            self._entries = {}
+            self._memo = {}
+            self._phrases = {}
+            self._loaded = False
+            self._loaded_at = None
+            self._version = None
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self, entries):
+        """
+        Replace the index contents.
+
+        Args:
+            entries: iterable of (kind, object_id, label, popularity)
+        """
+        keys = []
+        stored = {}
+        for kind, object_id, label, popularity in entries:
+            entry_words = words(label)
+            stored[(kind, object_id)] = (label, popularity, entry_words)
+            keys.extend((word, -popularity, kind, object_id) for word in entry_words)
+        keys.sort()
+
+        memo = {}
+        for length in range(1, PRECOMPUTED_PREFIX_LENGTH + 1):
+            for prefix, run in groupby(keys, key=lambda key: key[0][:length]):
+                # Shorter words were covered by a shorter prefix
+                if len(prefix) == length:
+                    memo[prefix] = _best(run, stored)
+
+        with self._lock:
+            self._keys = keys
+            self._entries = stored
+            self._memo = memo
+            self._phrases = {}
+            self._loaded = True
+            self._loaded_at = time.monotonic()
+
+    def rebuild(self):
+        """Reload every entry from the database"""
+        version = get_version(VERSION_CACHE_KEY)
+        self.load(
+            entry
+            for load_entries in (course_entries, teacher_entries, category_entries)
+            for entry in load_entries()
+        )
+        self._version = version
+
+    def ensure_loaded(self):
+        """Load the index, or reload it when stale or changed elsewhere"""
+        if not self._is_current():
+            with self._lock:
+                if not self._is_current():
+                    self.rebuild()
+
+    def _is_current(self):
+        return (
+            self._loaded
+            and time.monotonic() - self._loaded_at < REFRESH_SECONDS
+            and get_version(VERSION_CACHE_KEY) == self._version
+        )
+
+    def replace(self, kind, object_ids, entries):
+        """Drop the given objects' entries and insert their current ones"""
+        with self._lock:
+            for object_id in object_ids:
+                self._remove(kind, object_id)
+            for entry_kind, object_id, label, popularity in entries:
+                entry_words = words(label)
+                self._entries[(entry_kind, object_id)] = (label, popularity, entry_words)
+                for word in entry_words:
+                    insort(self._keys, (word, -popularity, entry_kind, object_id))
+                self._forget(entry_words)
+
+    def _forget(self, changed_words):
+        """Drop memoized results of every prefix of the words"""
+        self._phrases.clear()
+        for word in changed_words:
+            for length in range(1, len(word) + 1):
+                self._memo.pop(word[:length], None)
+
+    def _remove(self, kind, object_id):
+        entry = self._entries.pop((kind, object_id), None)
+        if entry is None:
+            return
+        _, popularity, entry_words = entry
+        self._forget(entry_words)
+        for word in entry_words:
+            key = (word, -popularity, kind, object_id)
+            i = bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                del self._keys[i]
+
+    def mark_changed(self):
+        """
+        Bump the shared version after a local incremental update.
+
+        The local copy stays current only if no other process changed the
+        index since it was loaded; otherwise it is rebuilt on the next query.
+        """
+        new_version = bump_version(VERSION_CACHE_KEY)
+
+        with self._lock:
+            previous = self._version or 0
+            if self._loaded and new_version == previous + 1:
+                self._version = new_version
+            else:
+                self._loaded = False
+
+    def _run(self, prefix):
+        """Bounds of the keys whose word starts with prefix"""
+        return (
+            bisect_left(self._keys, (prefix,)),
+            bisect_left(self._keys, (prefix + PREFIX_END,))
+        )
+
+    def search(self, query, limit=8):
+        """
+        Entries with a word starting with each word of the query.
+
+        Returns:
+            list of (kind, object_id, label), most popular first
+        """
+        # Stop words are not indexed unless a label has nothing else
+        folded = set(WORD_PATTERN.findall(fold(query)))
+        query_words = (folded - STOP_WORDS) or folded
+        if not query_words:
+            return []
+        limit = min(limit, MAX_LIMIT)
+
+        with self._lock:
+            if len(query_words) == 1:
+                anchor = next(iter(query_words))
+                memo, memo_key = self._memo, anchor
+                if anchor in memo:
+                    return memo[anchor][:limit]
+                start, end = self._run(anchor)
+            else:
+                memo, memo_key = self._phrases, tuple(sorted(query_words))
+                if memo_key in memo:
+                    return memo[memo_key][:limit]
+                # Scan the word with the fewest keys, check the others
+                runs = {word: self._run(word) for word in query_words}
+                anchor = min(runs, key=lambda word: runs[word][1] - runs[word][0])
+                start, end = runs[anchor]
+            others = query_words - {anchor}
+
+            run = self._keys[start:end]
+            if len(run) <= MEMO_MIN_RUN:
+                return _best(run, self._entries, others, limit)
+            if len(self._phrases) >= MAX_MEMOIZED_PHRASES:
+                self._phrases.clear()
+            memo[memo_key] = _best(run, self._entries, others)
+            return memo[memo_key][:limit]
+
+
+def course_entries(course_ids=None):
+    from .models import Course
+
+    courses = Course.objects.filter(published=True)
+    if course_ids is not None:
+        courses = courses.filter(pk__in=course_ids)
+    rows = courses.annotate(popularity=Count('enrolled_students')).values_list(
+        'pk', 'title', 'popularity'
+    )
+    return [('course', pk, title, popularity) for pk, title, popularity in rows]
+
+
+def teacher_entries(teacher_ids=None):
+    from accounts.models import TeacherProfile
+
+    teachers = TeacherProfile.objects.filter(courses__published=True)
+    if teacher_ids is not None:
+        teachers = teachers.filter(pk__in=teacher_ids)
+    rows = teachers.annotate(popularity=Count('courses__enrolled_students')).values_list(
+        'pk', 'user__first_name', 'user__last_name', 'user__username', 'popularity'
+    )
+    return [
+        ('teacher', pk, f'{first_name} {last_name}'.strip() or username, popularity)
+        for pk, first_name, last_name, username, popularity in rows
+    ]
+
+
+def category_entries(category_ids=None):
+    from .models import CourseCategory
+
+    categories = CourseCategory.objects.all()
+    if category_ids is not None:
+        categories = categories.filter(pk__in=category_ids)
+    rows = categories.annotate(popularity=Count(
+        'courses__enrolled_students', filter=Q(courses__published=True)
+    )).values_list('pk', 'name', 'popularity')
+    return [('category', pk, name, popularity) for pk, name, popularity in rows]
+
+
+autocomplete_index = AutocompleteIndex()
+
+ENTRY_LOADERS = {
+    'course': course_entries,
+    'teacher': teacher_entries,
+    'category': category_entries,
+}
+
+
+def entries_changed(kind, object_ids):
+    """Re-read the entries of changed (or deleted) objects of one kind"""
+    object_ids = [object_id for object_id in object_ids if object_id is not None]
+    if not object_ids:
+        return
+    if autocomplete_index.loaded:
+        autocomplete_index.replace(kind, object_ids, ENTRY_LOADERS[kind](object_ids))
+    autocomplete_index.mark_changed()
+
+
+def autocomplete(query, limit=8):
+    """Suggestions for a partly typed query, most popular first"""
+    autocomplete_index.ensure_loaded()
+    return [
+        {'type': kind, 'id': object_id, 'label': label}
+        for kind, object_id, label in autocomplete_index.search(query, limit)
+    ]
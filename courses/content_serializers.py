@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from core.signed_urls import signed_media_url
 from .models import Video, PDF
 
 class VideoSerializer(serializers.ModelSerializer):
@@ -17,12 +18,12 @@ class PDFSerializer(serializers.ModelSerializer):
         fields = ['id', 'course', 'title', 'description', 'file', 'file_url',
                  'order_index', 'is_preview', 'created_at']
         read_only_fields = ['created_at', 'file_url']
+        # Clients get the file through file_url only
+        extra_kwargs = {'file': {'write_only': True}}
     
     def get_file_url(self, obj):
-        request = self.context.get('request')
-        if obj.file and request:
-            return request.build_absolute_uri(obj.file.url)
-        return None
+        """Signed link that serves the file without another access check"""
+        return signed_media_url(self.context.get('request'), obj.file)
 
 
 # Uncomment when models are ready to be used
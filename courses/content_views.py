@@ -10,9 +10,12 @@ from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from .models import Course, Video, PDF
 from .content_serializers import VideoSerializer, PDFSerializer
+from core.file_serving import serve_protected_file
 from core.permissions import (
     CanManageCourseContent, IsEnrolledOrPreview
 )
+from enrollments.entitlements import accessible_content_q
+from enrollments.view_counts import record_video_view
 
 class BaseContentViewSet(viewsets.ModelViewSet):
     """Base viewset for all content types"""
@@ -37,12 +40,13 @@ class BaseContentViewSet(viewsets.ModelViewSet):
             # Students can see previews and content of enrolled courses
             return queryset.filter(
                 Q(is_preview=True, course__published=True) |
-                Q(course__enrollments__student=self.request.user.student_profile,
-                  course__enrollments__active=True)
-            ).distinct()
+                accessible_content_q(
+                    self.request.user, include_videos=queryset.model is Video
+                )
+            )
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'download', 'play']:
             return [IsEnrolledOrPreview()]
         return [CanManageCourseContent()]
 
@@ -60,12 +64,28 @@ class VideoViewSet(BaseContentViewSet):
     queryset = Video.objects.select_related('course', 'course__teacher').all()
     serializer_class = VideoSerializer
 
+    @action(detail=True, methods=['post'])
+    def play(self, request, pk=None, **kwargs):
+        """Start playing the video; counts against bought views"""
+        video = self.get_object()
+        if not record_video_view(request.user, video):
+            return Response(
+                {'detail': 'You have used all views of this video'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return Response(self.get_serializer(video).data)
+
 
 class PDFViewSet(BaseContentViewSet):
     """Viewset for managing PDF content"""
     queryset = PDF.objects.select_related('course', 'course__teacher').all()
     serializer_class = PDFSerializer
 
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None, **kwargs):
+        """Send the PDF to users who can see it, with byte range support"""
+        return serve_protected_file(request, self.get_object().file)
+
 
 # Commented out due to missing models
 # class AssignmentViewSet(BaseContentViewSet):
@@ -41,3 +41,28 @@ class CourseSerializer(serializers.ModelSerializer):
             'id', 'title', 'description', 'price', 'created_at', 'published',
             'teacher', 'teacher_name', 'category', 'category_id'
         ]
+
+
+class AutocompleteQuerySerializer(serializers.Serializer):
+    """Query parameters for search-as-you-type suggestions"""
+    q = serializers.CharField(max_length=100, trim_whitespace=True)
+    limit = serializers.IntegerField(required=False, default=8, min_value=1, max_value=20)
+
+
+class ContentOrderItemSerializer(serializers.Serializer):
+    """One item of a course's content, in its new place, optionally edited"""
+    type = serializers.ChoiceField(choices=['video', 'pdf', 'assignment'])
+    id = serializers.IntegerField(min_value=1)
+    title = serializers.CharField(max_length=200, required=False)
+    is_preview = serializers.BooleanField(required=False)
+
+
+class ContentReorderSerializer(serializers.Serializer):
+    """The full content of a course, first item first"""
+    items = ContentOrderItemSerializer(many=True, allow_empty=False)
+
+    def validate_items(self, items):
+        keys = [(item['type'], item['id']) for item in items]
+        if len(set(keys)) != len(keys):
+            raise serializers.ValidationError('Each item may only appear once')
+        return items
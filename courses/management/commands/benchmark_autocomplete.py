@@ -0,0 +1,63 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from courses.autocomplete import AutocompleteIndex
+
+SYLLABLES = ('ba', 'cé', 'di', 'fo', 'gu', 'la', 'mè', 'no', 'pi', 'ré', 'su', 'ta', 'vo', 'zé')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark autocomplete lookups on generated courses, teachers and categories'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=100_000)
+        parser.add_argument('--teachers', type=int, default=5000)
+        parser.add_argument('--queries', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        def word():
+            return ''.join(rng.choices(SYLLABLES, k=rng.randrange(2, 5)))
+
+        entries = [
+            ('course', i, ' '.join(word() for _ in range(rng.randrange(2, 6))).capitalize(),
+             int(rng.paretovariate(1.2)))
+            for i in range(1, options['courses'] + 1)
+        ]
+        entries += [
+            ('teacher', i, f'{word().capitalize()} {word().capitalize()}', rng.randrange(500))
+            for i in range(1, options['teachers'] + 1)
+        ]
+        entries += [('category', i, word().capitalize(), rng.randrange(5000)) for i in range(1, 51)]
+
+        index = AutocompleteIndex()
+        started = time.perf_counter()
+        index.load(entries)
+        self.stdout.write(f'Index built with {len(index)} entries in {time.perf_counter() - started:.2f}s')
+
+        # Prefixes of 1 to 6 letters of real labels, as typed keystroke by keystroke
+        queries = []
+        for _ in range(options['queries']):
+            label = rng.choice(entries)[2]
+            queries.append(label[:rng.randrange(1, min(len(label), 6) + 1)])
+
+        for label, run in (('Cold', queries), ('Warm', queries)):
+            timings = []
+            for query in run:
+                t0 = time.perf_counter()
+                index.search(query)
+                timings.append(time.perf_counter() - t0)
+            self.report(label, timings)
+
+    def report(self, label, timings):
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+        self.stdout.write(
+            f'{label}: {len(timings)} queries, '
+            f'mean {statistics.mean(timings) * 1000:.3f}ms, p95 {p95 * 1000:.3f}ms'
+        )
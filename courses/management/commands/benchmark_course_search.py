@@ -0,0 +1,118 @@
+import itertools
+import random
+import sqlite3
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from courses import search
+
+WORDS = (
+    'développement web python django javascript réseaux sécurité données analyse '
+    'statistiques mathématiques algèbre géométrie physique chimie biologie français '
+    'anglais espagnol histoire géographie économie comptabilité marketing gestion '
+    'programmation apprentissage automatique intelligence artificielle photographie '
+    'musique guitare piano dessin peinture cuisine pâtisserie nutrition yoga '
+    'débutants avancés pratique complète introduction méthodes projets examens'
+).split()
+CATEGORIES = ('Informatique', 'Langues', 'Sciences', 'Arts', 'Économie', 'Bien-être')
+NAMES = ('Amélie', 'Benoît', 'Chloé', 'Denis', 'Élodie', 'François', 'Gaëlle', 'Hélène')
+SYLLABLES = ('ba', 'cé', 'di', 'fo', 'gu', 'la', 'mè', 'no', 'pi', 'ré', 'su', 'ta', 'vo', 'zé')
+
+
+def vocabulary(rng, size):
+    """Real words first, then made-up ones, with cumulative Zipf weights"""
+    words = list(WORDS)
+    seen = set(words)
+    while len(words) < size:
+        word = ''.join(rng.choices(SYLLABLES, k=rng.randrange(2, 5)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words, list(itertools.accumulate(1 / rank for rank in range(1, size + 1)))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark ranked FTS5 course search against LIKE scans, in memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=100_000)
+        parser.add_argument('--vocabulary', type=int, default=20_000)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--baseline-queries', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        db = sqlite3.connect(':memory:')
+        db.execute(search.CREATE_TABLE_SQL)
+        db.execute('CREATE TABLE category (id INTEGER PRIMARY KEY, name TEXT)')
+        db.execute(
+            'CREATE TABLE course (id INTEGER PRIMARY KEY, title TEXT, description TEXT, '
+            'category_id INTEGER, teacher TEXT)'
+        )
+        db.executemany('INSERT INTO category VALUES (?, ?)', list(enumerate(CATEGORIES, 1)))
+
+        self.stdout.write(f"Generating {options['courses']} courses...")
+        words, cum_weights = vocabulary(rng, options['vocabulary'])
+        rows = []
+        for course_id in range(1, options['courses'] + 1):
+            rows.append((
+                course_id,
+                ' '.join(rng.choices(words, cum_weights=cum_weights, k=4)).capitalize(),
+                ' '.join(rng.choices(words, cum_weights=cum_weights, k=40)),
+                rng.randrange(1, len(CATEGORIES) + 1),
+                f'{rng.choice(NAMES)} {rng.choice(NAMES)}',
+            ))
+        db.executemany('INSERT INTO course VALUES (?, ?, ?, ?, ?)', rows)
+
+        started = time.perf_counter()
+        db.executemany(search.INSERT_SQL.replace('%s', '?'), [
+            (course_id, *(' '.join(search.analyze(text)) for text in (
+                title, description, CATEGORIES[category_id - 1], teacher
+            )))
+            for course_id, title, description, category_id, teacher in rows
+        ])
+        self.stdout.write(f'Index built in {time.perf_counter() - started:.2f}s')
+
+        # Two-word queries typed without accents, as users do
+        queries = [
+            ' '.join(search.fold(word) for word in rng.choices(words, cum_weights=cum_weights, k=2))
+            for _ in range(options['queries'])
+        ]
+        rank_sql = search.RANK_SQL.format(restrict='').replace('%s', '?')
+        timings, matched = [], 0
+        for query in queries:
+            t0 = time.perf_counter()
+            ids = db.execute(rank_sql, [search.match_expression(query), search.MAX_RESULTS]).fetchall()
+            timings.append(time.perf_counter() - t0)
+            matched += bool(ids)
+
+        like_sql = (
+            'SELECT course.id FROM course LEFT JOIN category ON category.id = course.category_id '
+            'WHERE ' + ' AND '.join(
+                ['(course.title LIKE ? OR course.description LIKE ? OR category.name LIKE ?)'] * 2
+            )
+        )
+        baseline = []
+        for query in queries[:options['baseline_queries']]:
+            params = [f'%{word}%' for word in query.split() for _ in range(3)]
+            t0 = time.perf_counter()
+            db.execute(like_sql, params).fetchall()
+            baseline.append(time.perf_counter() - t0)
+
+        self.stdout.write(f'{matched}/{len(queries)} queries matched courses')
+        self.report('FTS5 ranked search', timings)
+        if baseline:
+            self.report('LIKE scan', baseline)
+            speedup = statistics.mean(baseline) / statistics.mean(timings)
+            self.stdout.write(self.style.SUCCESS(f'Speedup: {speedup:.0f}x'))
+
+    def report(self, label, timings):
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+        self.stdout.write(
+            f'{label}: {len(timings)} queries, '
+            f'mean {statistics.mean(timings) * 1000:.3f}ms, p95 {p95 * 1000:.3f}ms'
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from courses.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the course search index from the courses table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Course search index rebuilt'))
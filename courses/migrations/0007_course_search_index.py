@@ -0,0 +1,34 @@
+from django.db import migrations
+
+# Frozen copy of courses.search.CREATE_TABLE_SQL; migrations must not
+# change when the search module does. The table is filled by the
+# rebuild_course_search command and kept up to date by signal handlers.
+CREATE_TABLE_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS courses_course_search USING fts5("
+    "title, description, category, teacher, tokenize='unicode61 remove_diacritics 2')"
+)
+DROP_TABLE_SQL = "DROP TABLE IF EXISTS courses_course_search"
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(CREATE_TABLE_SQL)
+    elif vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(DROP_TABLE_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_merge_20250904_1555'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.14 on 2026-10-19 04:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_course_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='assignment',
+            name='attachment',
+            field=models.FileField(blank=True, help_text='Optional file attachment (worksheet, template, etc.)', max_length=255, null=True, upload_to='assignment_files/'),
+        ),
+        migrations.AlterField(
+            model_name='assignmentfeedback',
+            name='attachment',
+            field=models.FileField(blank=True, max_length=255, null=True, upload_to='feedback_attachments/'),
+        ),
+        migrations.AlterField(
+            model_name='pdf',
+            name='file',
+            field=models.FileField(max_length=255, upload_to='pdfs/'),
+        ),
+        migrations.AlterField(
+            model_name='submission',
+            name='file',
+            field=models.FileField(blank=True, help_text='File upload for the assignment', max_length=255, null=True, upload_to='assignment_submissions/'),
+        ),
+    ]
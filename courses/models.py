@@ -50,7 +50,7 @@ class PDF(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='pdfs')
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
-    file = models.FileField(upload_to='pdfs/')
+    file = models.FileField(upload_to='pdfs/', max_length=255)
     order_index = models.PositiveIntegerField(default=1)
     is_preview = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
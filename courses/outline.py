@@ -0,0 +1,167 @@
+"""
+Course outline: all content of a course in order, with a student's progress.
+
+The structure (videos, PDFs and assignments of a course, merged by
+order_index) is the same for everyone, so it is read with one query per
+content type and cached under the course's outline version. The version
+is a counter in the cache shared by all processes (see CACHES in
+config.settings), bumped whenever content of the course is saved, deleted
+or reordered (see courses.signals and reorder_content), so a change made
+by any worker makes the old entry unreachable instead of deleting it.
+What depends on the user, which items they may open and their
+ContentProgress, is added on every request from their cached
+entitlements and one progress query.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import transaction
+
+from core.cache_versions import bump_version, get_version
+from enrollments.entitlements import get_entitlements
+
+STRUCTURE_TIMEOUT = 24 * 60 * 60
+EDITABLE_FIELDS = ('title', 'is_preview')
+# Items sharing an order_index are listed in this order
+KIND_ORDER = ('video', 'pdf', 'assignment')
+
+
+def _version_key(course_id):
+    return f'courses_outline_version:{course_id}'
+
+
+def outline_version(course_id):
+    return get_version(_version_key(course_id))
+
+
+def bump_outline_version(course_id):
+    """Make the cached structure of a course stale"""
+    bump_version(_version_key(course_id))
+
+
+class OutlineError(Exception):
+    """A new ordering does not match the content of the course"""
+
+
+def content_models():
+    from .assignment_models import Assignment
+    from .models import PDF, Video
+
+    return {'video': Video, 'pdf': PDF, 'assignment': Assignment}
+
+
+def build_structure(course_id):
+    """Ordered content items of a course, without anything user specific"""
+    models = content_models()
+    common = ('id', 'title', 'description', 'order_index', 'is_preview')
+    items = []
+    for kind, fields in (
+        ('video', common),
+        ('pdf', common),
+        ('assignment', common + ('due_date', 'available_from', 'max_points')),
+    ):
+        for row in models[kind].objects.filter(course_id=course_id).values(*fields):
+            items.append({'type': kind, **row})
+    items.sort(key=lambda item: (item['order_index'], KIND_ORDER.index(item['type']), item['id']))
+    return items
+
+
+def course_structure(course_id):
+    """Cached structure of a course, rebuilt after its content changes"""
+    key = f'courses_outline:{course_id}:{outline_version(course_id)}'
+    items = cache.get(key)
+    if items is None:
+        items = build_structure(course_id)
+        cache.set(key, items, STRUCTURE_TIMEOUT)
+    return items
+
+
+def course_outline(course, user):
+    """
+    Structure of a course with access and progress of the user merged in.
+
+    Returns:
+        list of item dicts, each with 'accessible' and 'progress' (None
+        when the user has not opened the item)
+    """
+    from .progress_models import ContentProgress
+
+    teacher = getattr(user, 'teacher_profile', None) if user.is_authenticated else None
+    full_access = user.is_authenticated and (
+        user.is_staff or (teacher is not None and course.teacher_id == teacher.id)
+    )
+    entitlements = get_entitlements(user)
+    enrolled = entitlements.has_course(course.pk)
+
+    progress = {}
+    if user.is_authenticated:
+        models = content_models()
+        content_types = ContentType.objects.get_for_models(*models.values())
+        kinds = {content_types[model].id: kind for kind, model in models.items()}
+        for row in ContentProgress.objects.filter(student=user, course=course).values(
+            'content_type_id', 'object_id', 'is_completed', 'progress_percent', 'last_accessed'
+        ):
+            kind = kinds.get(row.pop('content_type_id'))
+            progress[(kind, row.pop('object_id'))] = row
+
+    outline = []
+    for item in course_structure(course.pk):
+        accessible = full_access or item['is_preview'] or enrolled or (
+            item['type'] == 'video' and entitlements.has_video(item['id'])
+        )
+        outline.append({
+            **item,
+            'accessible': accessible,
+            'progress': progress.get((item['type'], item['id'])),
+        })
+    return outline
+
+
+def reorder_content(course, items):
+    """
+    Renumber a course's content in the given order and apply small edits.
+
+    Args:
+        items: every item of the course, first first, as dicts with type,
+            id and optionally title and is_preview
+
+    Returns:
+        int: number of items changed
+
+    Raises:
+        OutlineError: items missing from or foreign to the course
+    """
+    models = content_models()
+    wanted = {(item['type'], item['id']): (position, item) for position, item in enumerate(items, 1)}
+    changed = 0
+    with transaction.atomic():
+        current = {
+            kind: {obj.pk: obj for obj in model.objects.select_for_update().filter(course=course)}
+            for kind, model in models.items()
+        }
+        existing = {(kind, pk) for kind, objects in current.items() for pk in objects}
+        if existing != set(wanted):
+            unknown = len(set(wanted) - existing)
+            missing = len(existing - set(wanted))
+            raise OutlineError(
+                f'Give every item of the course once: {missing} missing, {unknown} not in this course'
+            )
+
+        for kind, objects in current.items():
+            updated, fields = [], {'order_index'}
+            for pk, obj in objects.items():
+                position, item = wanted[(kind, pk)]
+                edits = {'order_index': position}
+                edits.update((field, item[field]) for field in EDITABLE_FIELDS if field in item)
+                if any(getattr(obj, field) != value for field, value in edits.items()):
+                    for field, value in edits.items():
+                        setattr(obj, field, value)
+                    fields.update(edits)
+                    updated.append(obj)
+            if updated:
+                models[kind].objects.bulk_update(updated, sorted(fields))
+                changed += len(updated)
+
+        # bulk_update sends no post_save signals
+        if changed:
+            transaction.on_commit(lambda: bump_outline_version(course.pk))
+    return changed
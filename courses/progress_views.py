@@ -16,6 +16,7 @@ from courses.progress_serializers import (
 )
 from courses.models import Course, Video, PDF
 from core.permissions import IsEnrolledOrTeacher
+from enrollments.entitlements import get_entitlements
 
 
 class ContentProgressViewSet(mixins.RetrieveModelMixin,
@@ -151,7 +152,7 @@ class CourseProgressViewSet(mixins.RetrieveModelMixin,
         course = get_object_or_404(Course, id=course_id)
         
         # Check enrollment
-        if not course.enrolled_students.filter(student=request.user).exists():
+        if not get_entitlements(request.user).has_course(course.id):
             return Response(
                 {'error': 'You are not enrolled in this course'},
                 status=status.HTTP_403_FORBIDDEN
@@ -0,0 +1,256 @@
+"""
+Ranked full-text search over courses.
+
+Text is analyzed in Python before it is indexed or searched: folded to
+lower case without accents, split into words, stripped of common French
+and English stop words and reduced with a light French stemmer, so
+"Développement" and "developper" meet on the same term. Because both
+sides go through analyze(), the backends only have to match terms.
+
+On SQLite the analyzed title, description, category and teacher name of
+each course live in an FTS5 table whose rowid is the course id, ranked
+with BM25 (title weighted highest). Rows are rewritten whenever a course,
+its category or its teacher's name changes (see courses.signals), in the
+same transaction as the change. Code that writes courses with update() or
+bulk_create must call index_courses() itself; rebuild_course_search
+rebuilds the whole table.
+
+On PostgreSQL the built-in full-text search is used instead, with the
+'french' configuration and unaccent; vectors are built at query time, so
+there is nothing to keep in sync. Other databases fall back to substring
+matching.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+from django.db import connection
+from django.db.models import Case, F, Func, IntegerField, Q, Value, When
+
+TABLE = 'courses_course_search'
+COLUMNS = ('title', 'description', 'category', 'teacher')
+# BM25 weights, in COLUMNS order
+WEIGHTS = (10.0, 1.0, 4.0, 3.0)
+MAX_RESULTS = 500
+MAX_QUERY_TERMS = 10
+POSTGRES_CONFIG = 'french'
+
+CREATE_TABLE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    f"{', '.join(COLUMNS)}, tokenize='unicode61 remove_diacritics 2')"
+)
+DROP_TABLE_SQL = f"DROP TABLE IF EXISTS {TABLE}"
+INSERT_SQL = f"INSERT INTO {TABLE} (rowid, {', '.join(COLUMNS)}) VALUES (%s, %s, %s, %s, %s)"
+RANK_SQL = (
+    f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s{{restrict}} "
+    f"ORDER BY bm25({TABLE}, {', '.join(str(w) for w in WEIGHTS)}) LIMIT %s"
+)
+
+STOP_WORDS = frozenset("""
+    a au aux avec ce ces dans de des du en et la le les leur un une ou par
+    pour sur l d s n qu c j m t y est sont
+    an and at by for from in into is of on or the to with
+""".split())
+
+# Tried longest first; a suffix is only removed when three letters remain
+FRENCH_SUFFIXES = tuple(sorted("""
+    issement atrice ateur ation ement ence isme iste able ible euse eur eau
+    eux ive if ite ant ent ee er ez e
+""".split(), key=len, reverse=True))
+PLURAL_SUFFIXES = ('s', 'x')
+MIN_STEM = 3
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def fold(text):
+    """Lower-case text with accents removed"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def _strip(word, suffixes):
+    for suffix in suffixes:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+
+@lru_cache(maxsize=100_000)
+def stem(word):
+    """
+    Light French stemmer.
+
+    Drops a plural ending, then one derivational or inflectional suffix,
+    then a final s/x again so "cours", "course" and "courses" agree.
+    """
+    word = _strip(word, PLURAL_SUFFIXES)
+    word = _strip(word, FRENCH_SUFFIXES)
+    return _strip(word, PLURAL_SUFFIXES)
+
+
+def analyze(text):
+    """Terms of a text as they are indexed and searched"""
+    return [stem(word) for word in WORD_PATTERN.findall(fold(text)) if word not in STOP_WORDS]
+
+
+def match_expression(query):
+    """
+    FTS5 MATCH expression for a user query, or '' when it has no terms.
+
+    Every term must match; the last one also matches as a prefix, for
+    queries typed as you go.
+    """
+    terms = list(dict.fromkeys(analyze(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return ''
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _teacher_name(user):
+    return ' '.join(filter(None, [user.first_name, user.last_name, user.username]))
+
+
+def document(course):
+    """Analyzed (title, description, category, teacher) of a course"""
+    return tuple(' '.join(analyze(text)) for text in (
+        course.title,
+        course.description,
+        course.category.name if course.category_id else '',
+        _teacher_name(course.teacher.user),
+    ))
+
+
+def _in_order(queryset, ids):
+    if not ids:
+        return queryset.none()
+    return queryset.filter(pk__in=ids).order_by(Case(
+        *[When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)],
+        output_field=IntegerField()
+    ))
+
+
+class SQLiteSearchBackend:
+    """FTS5 index in the course database"""
+
+    def search(self, queryset, query):
+        match = match_expression(query)
+        if not match:
+            return queryset.none()
+        # Rank only courses the queryset can return, so hidden courses
+        # do not take places in the top results
+        restrict_sql, restrict_params = queryset.order_by().values('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                RANK_SQL.format(restrict=f' AND rowid IN ({restrict_sql})'),
+                [match, *restrict_params, MAX_RESULTS]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        return _in_order(queryset, ids)
+
+    def index(self, course_ids):
+        from .models import Course
+
+        course_ids = list(course_ids)
+        if not course_ids:
+            return
+        courses = Course.objects.filter(pk__in=course_ids).select_related('category', 'teacher__user')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {TABLE} WHERE rowid IN ({', '.join(['%s'] * len(course_ids))})",
+                course_ids
+            )
+            cursor.executemany(INSERT_SQL, [(course.pk, *document(course)) for course in courses])
+
+    def rebuild(self, batch_size=2000):
+        from .models import Course
+
+        courses = Course.objects.select_related('category', 'teacher__user').order_by('pk')
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLE}")
+            batch = []
+            for course in courses.iterator(chunk_size=batch_size):
+                batch.append((course.pk, *document(course)))
+                if len(batch) >= batch_size:
+                    cursor.executemany(INSERT_SQL, batch)
+                    batch = []
+            if batch:
+                cursor.executemany(INSERT_SQL, batch)
+
+
+class PostgresSearchBackend:
+    """PostgreSQL full-text search; needs the unaccent extension"""
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        if not analyze(query):
+            return queryset.none()
+
+        def unaccented(field):
+            return Func(F(field), function='unaccent')
+
+        vector = (
+            SearchVector(unaccented('title'), weight='A', config=POSTGRES_CONFIG)
+            + SearchVector(unaccented('category__name'), weight='B', config=POSTGRES_CONFIG)
+            + SearchVector(
+                unaccented('teacher__user__first_name'), unaccented('teacher__user__last_name'),
+                weight='C', config=POSTGRES_CONFIG
+            )
+            + SearchVector(unaccented('description'), weight='D', config=POSTGRES_CONFIG)
+        )
+        search_query = SearchQuery(fold(query), config=POSTGRES_CONFIG, search_type='websearch')
+        return queryset.annotate(
+            search=vector,
+            rank=SearchRank(vector, search_query)
+        ).filter(search=search_query).order_by('-rank', 'pk')
+
+    def index(self, course_ids):
+        pass
+
+    def rebuild(self, batch_size=2000):
+        pass
+
+
+class SubstringSearchBackend:
+    """Unranked substring matching for databases without a full-text index"""
+
+    def search(self, queryset, query):
+        condition = Q()
+        for word in query.split():
+            condition &= (
+                Q(title__icontains=word)
+                | Q(description__icontains=word)
+                | Q(category__name__icontains=word)
+            )
+        return queryset.filter(condition)
+
+    def index(self, course_ids):
+        pass
+
+    def rebuild(self, batch_size=2000):
+        pass
+
+
+def get_backend():
+    if connection.vendor == 'sqlite':
+        return SQLiteSearchBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return SubstringSearchBackend()
+
+
+def search_courses(queryset, query):
+    """Courses of the queryset matching query, best match first"""
+    return get_backend().search(queryset, query)
+
+
+def index_courses(course_ids):
+    """Rewrite the search entries of courses; deleted courses are dropped"""
+    get_backend().index(course_ids)
+
+
+def rebuild_index(batch_size=2000):
+    get_backend().rebuild(batch_size)
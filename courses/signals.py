@@ -0,0 +1,69 @@
+"""
+Signal handlers for courses.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .assignment_models import Assignment
+from .autocomplete import entries_changed
+from .models import PDF, Course, CourseCategory, Video
+from .outline import bump_outline_version
+from .search import index_courses
+
+NAME_FIELDS = {'first_name', 'last_name', 'username'}
+
+
+def _course_changed(course_id, teacher_id, category_id):
+    entries_changed('course', [course_id])
+    entries_changed('teacher', [teacher_id])
+    entries_changed('category', [category_id])
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def reindex_course(sender, instance, **kwargs):
+    index_courses([instance.pk])
+    ids = (instance.pk, instance.teacher_id, instance.category_id)
+    transaction.on_commit(lambda: _course_changed(*ids))
+
+
+@receiver(pre_delete, sender=CourseCategory)
+def remember_category_courses(sender, instance, **kwargs):
+    # Deleting the category clears course.category with an UPDATE
+    instance._course_ids = list(instance.courses.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=CourseCategory)
+@receiver(post_delete, sender=CourseCategory)
+def reindex_category(sender, instance, created=False, **kwargs):
+    category_id = instance.pk
+    transaction.on_commit(lambda: entries_changed('category', [category_id]))
+    if not created:
+        course_ids = getattr(instance, '_course_ids', None)
+        if course_ids is None:
+            course_ids = instance.courses.values_list('pk', flat=True)
+        index_courses(course_ids)
+
+
+@receiver(post_save, sender=User)
+def reindex_teacher_courses(sender, instance, created, update_fields=None, **kwargs):
+    # Logins only touch last_login
+    if created or (update_fields is not None and not NAME_FIELDS & set(update_fields)):
+        return
+    courses = Course.objects.filter(teacher__user=instance)
+    index_courses(courses.values_list('pk', flat=True))
+    teacher_ids = list(courses.values_list('teacher_id', flat=True).distinct())
+    transaction.on_commit(lambda: entries_changed('teacher', teacher_ids))
+
+
+@receiver(post_save, sender=Video)
+@receiver(post_delete, sender=Video)
+@receiver(post_save, sender=PDF)
+@receiver(post_delete, sender=PDF)
+@receiver(post_save, sender=Assignment)
+@receiver(post_delete, sender=Assignment)
+def content_changed(sender, instance, **kwargs):
+    course_id = instance.course_id
+    transaction.on_commit(lambda: bump_outline_version(course_id))
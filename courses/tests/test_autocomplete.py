@@ -0,0 +1,93 @@
+"""
+Tests for the in-memory autocomplete index and its endpoint
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import TeacherProfile
+from courses.autocomplete import autocomplete, autocomplete_index
+from courses.models import Course, CourseCategory
+from enrollments.models import Enrollment
+
+User = get_user_model()
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        autocomplete_index.reset()
+        teacher_user = User.objects.create_user(
+            username='teacher', password='teacher123', first_name='Pauline', last_name='Durand'
+        )
+        self.teacher = TeacherProfile.objects.create(user=teacher_user)
+        self.category = CourseCategory.objects.create(name='Programmation')
+        self.beginner = self.create('Python pour débutants', enrollments=1)
+        self.advanced = self.create('Python avancé', enrollments=3)
+        self.create('Python en préparation', published=False)
+
+    def create(self, title, enrollments=0, published=True):
+        course = Course.objects.create(
+            teacher=self.teacher, category=self.category, title=title, price=10, published=published
+        )
+        for i in range(enrollments):
+            student = User.objects.create_user(username=f'{course.pk}-{i}', password='student123')
+            Enrollment.objects.create(student=student, course=course)
+        return course
+
+    def labels(self, query, limit=8):
+        return [suggestion['label'] for suggestion in autocomplete(query, limit)]
+
+    def test_prefixes_match_any_word_most_popular_first(self):
+        self.assertEqual(self.labels('py'), ['Python avancé', 'Python pour débutants'])
+        self.assertEqual(self.labels('py', limit=1), ['Python avancé'])
+        self.assertEqual(self.labels('DEB'), ['Python pour débutants'])
+        self.assertEqual(self.labels('pyth ava'), ['Python avancé'])
+        self.assertEqual(self.labels('p'), [
+            'Programmation', 'Pauline Durand', 'Python avancé', 'Python pour débutants'
+        ])
+        self.assertEqual(self.labels('xyz'), [])
+
+    def test_stop_words_in_queries_are_ignored(self):
+        self.create('Introduction to Python', enrollments=2)
+        self.create('Cours de français')
+
+        self.assertEqual(self.labels('introduction to'), ['Introduction to Python'])
+        self.assertEqual(self.labels('introduction to py'), ['Introduction to Python'])
+        self.assertEqual(self.labels('cours de'), ['Cours de français'])
+        self.assertEqual(self.labels('cours de f'), ['Cours de français'])
+        self.assertEqual(self.labels('pour'), [])
+
+    def test_changes_are_applied_without_reloading(self):
+        autocomplete('py')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            course = self.create('Pygame')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.advanced.published = False
+            self.advanced.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teacher.user.first_name = 'Sophie'
+            self.teacher.user.save()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.labels('py'), ['Python pour débutants', 'Pygame'])
+            self.assertEqual(self.labels('soph'), ['Sophie Durand'])
+            self.assertEqual(self.labels('paul'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            course.delete()
+        self.assertEqual(self.labels('pyg'), [])
+
+    def test_endpoint(self):
+        client = APIClient()
+
+        response = client.get('/api/autocomplete/', {'q': 'pyt', 'limit': 5})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(s['type'], s['id']) for s in response.data],
+            [('course', self.advanced.id), ('course', self.beginner.id)]
+        )
+        self.assertEqual(client.get('/api/autocomplete/').status_code, 400)
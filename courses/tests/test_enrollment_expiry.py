@@ -0,0 +1,78 @@
+"""
+Tests for the active() enrollment filter and the expiry sweeper
+"""
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import TeacherProfile
+from courses.models import Course
+from enrollments.entitlements import get_entitlements
+from enrollments.lifecycle import expire_enrollments
+from enrollments.models import Enrollment
+
+User = get_user_model()
+
+
+class EnrollmentExpiryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        teacher_user = User.objects.create_user(username='teacher', password='teacher123')
+        teacher = TeacherProfile.objects.create(user=teacher_user)
+        self.courses = [
+            Course.objects.create(teacher=teacher, title=f'Course {i}', price=50, published=True)
+            for i in range(4)
+        ]
+        self.student = User.objects.create_user(username='student', password='student123')
+        self.now = timezone.now()
+
+    def enroll(self, course, **fields):
+        return Enrollment.objects.create(student=self.student, course=course, **fields)
+
+    def test_active_matches_is_active(self):
+        enrollments = [
+            self.enroll(self.courses[0]),
+            self.enroll(self.courses[1], expires_at=self.now + timedelta(days=1)),
+            self.enroll(self.courses[2], expires_at=self.now - timedelta(days=1)),
+            self.enroll(self.courses[3], status='cancelled'),
+        ]
+
+        active = set(Enrollment.objects.active().values_list('pk', flat=True))
+
+        self.assertEqual(active, {e.pk for e in enrollments if e.is_active})
+        self.assertEqual(len(active), 2)
+
+    def test_sweeper_expires_ended_enrollments_in_batches(self):
+        ended = [
+            self.enroll(course, expires_at=self.now - timedelta(hours=i + 1))
+            for i, course in enumerate(self.courses[:3])
+        ]
+        running = self.enroll(self.courses[3], expires_at=self.now + timedelta(hours=1))
+        get_entitlements(self.student)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expire_enrollments(now=self.now, batch_size=2), 3)
+
+        self.assertEqual(
+            set(Enrollment.objects.filter(status='expired').values_list('pk', flat=True)),
+            {enrollment.pk for enrollment in ended}
+        )
+        running.refresh_from_db()
+        self.assertEqual(running.status, 'active')
+        self.assertEqual(get_entitlements(self.student).course_ids.tolist(), [self.courses[3].id])
+
+        self.assertEqual(expire_enrollments(now=self.now), 0)
+
+    def test_command(self):
+        self.enroll(self.courses[0], expires_at=self.now - timedelta(minutes=1))
+
+        out = StringIO()
+        call_command('expire_enrollments', stdout=out)
+
+        self.assertIn('Expired 1 enrollments', out.getvalue())
+        self.assertFalse(Enrollment.objects.active().exists())
@@ -0,0 +1,107 @@
+"""
+Tests for cached per-user entitlements and the access checks using them
+"""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import TeacherProfile
+from courses.models import Course, Video
+from enrollments.entitlements import can_access_content, compute_entitlements, get_entitlements
+from enrollments.models import Enrollment
+
+User = get_user_model()
+
+
+class EntitlementTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        teacher_user = User.objects.create_user(username='teacher', password='teacher123')
+        self.teacher = TeacherProfile.objects.create(user=teacher_user)
+        self.teacher_user = teacher_user
+        self.courses = [
+            Course.objects.create(teacher=self.teacher, title=f'Course {i}', price=50, published=True)
+            for i in range(3)
+        ]
+        self.videos = [
+            Video.objects.create(
+                course=course, title=f'Video {i}', video_url=f'https://example.com/{i}.mp4'
+            )
+            for i, course in enumerate(self.courses)
+        ]
+        self.student = User.objects.create_user(username='student', password='student123')
+
+    def enroll_in_video(self, video, **fields):
+        return Enrollment.objects.create(
+            student=self.student,
+            content_type=ContentType.objects.get_for_model(Video),
+            object_id=video.id,
+            **fields
+        )
+
+    def test_entitlements_are_computed_in_one_query(self):
+        Enrollment.objects.create(student=self.student, course=self.courses[0])
+        Enrollment.objects.create(student=self.student, course=self.courses[1], status='cancelled')
+        self.enroll_in_video(self.videos[2])
+        ContentType.objects.get_for_models(Course, Video)
+
+        with self.assertNumQueries(1):
+            entitlements, ttl = compute_entitlements(self.student.pk)
+
+        self.assertEqual(entitlements.course_ids.tolist(), [self.courses[0].id])
+        self.assertEqual(entitlements.video_ids.tolist(), [self.videos[2].id])
+        self.assertIsNone(ttl)
+        self.assertTrue(entitlements.has_video(self.videos[0].id, self.courses[0].id))
+        self.assertFalse(entitlements.has_video(self.videos[1].id, self.courses[1].id))
+
+    def test_cached_until_enrollments_change(self):
+        get_entitlements(self.student)
+        with self.assertNumQueries(0):
+            self.assertFalse(get_entitlements(self.student).has_course(self.courses[0].id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment = Enrollment.objects.create(student=self.student, course=self.courses[0])
+        self.assertTrue(get_entitlements(self.student).has_course(self.courses[0].id))
+
+        enrollment.status = 'expired'
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment.save()
+        self.assertFalse(get_entitlements(self.student).has_course(self.courses[0].id))
+
+    def test_expiring_enrollments_bound_the_cache_lifetime(self):
+        now = timezone.now()
+        Enrollment.objects.create(
+            student=self.student, course=self.courses[0], expires_at=now + timedelta(minutes=5)
+        )
+        Enrollment.objects.create(
+            student=self.student, course=self.courses[1], expires_at=now - timedelta(minutes=5)
+        )
+
+        entitlements, ttl = compute_entitlements(self.student.pk, now=now)
+
+        self.assertEqual(entitlements.course_ids.tolist(), [self.courses[0].id])
+        self.assertEqual(ttl, 301)
+
+    def test_content_access(self):
+        self.enroll_in_video(self.videos[1])
+        preview = Video.objects.create(
+            course=self.courses[2], title='Preview', video_url='https://example.com/p.mp4',
+            is_preview=True
+        )
+
+        self.assertFalse(can_access_content(self.student, self.videos[0]))
+        self.assertTrue(can_access_content(self.student, self.videos[1]))
+        self.assertTrue(can_access_content(self.student, preview))
+        self.assertTrue(can_access_content(self.teacher_user, self.videos[0]))
+
+        client = APIClient()
+        client.force_authenticate(user=self.student)
+        self.assertEqual(client.get(f'/api/videos/{self.videos[1].id}/').status_code, 200)
+        self.assertEqual(client.get(f'/api/videos/{self.videos[0].id}/').status_code, 404)
+        response = client.get('/api/videos/')
+        self.assertEqual({video['id'] for video in response.data}, {self.videos[1].id, preview.id})
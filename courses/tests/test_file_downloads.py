@@ -0,0 +1,103 @@
+"""
+Tests for authorized downloads of PDFs, submissions and message attachments
+"""
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import TeacherProfile
+from courses.assignment_models import Assignment, Submission
+from courses.models import PDF, Course
+from enrollments.models import Enrollment
+from messaging.models import Conversation, Message
+
+User = get_user_model()
+CONTENT = bytes(range(256)) * 40
+
+
+class FileDownloadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        teacher_user = User.objects.create_user(username='teacher', password='teacher123')
+        teacher = TeacherProfile.objects.create(user=teacher_user)
+        self.course = Course.objects.create(teacher=teacher, title='Course', price=50, published=True)
+        self.pdf = PDF.objects.create(course=self.course, title='Notes')
+        self.pdf.file.save('notes.pdf', ContentFile(CONTENT))
+        self.student = User.objects.create_user(username='student', password='student123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+        self.url = f'/api/pdfs/{self.pdf.id}/download/'
+
+    def enroll(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.create(student=self.student, course=self.course)
+
+    def test_only_entitled_users_can_download(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        self.enroll()
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+    def test_ranges_and_revalidation(self):
+        self.enroll()
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(CONTENT)}')
+        self.assertEqual(b''.join(response.streaming_content), CONTENT[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), CONTENT[-10:])
+
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE=f'bytes={len(CONTENT)}-').status_code, 416)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_offloading_to_the_web_server(self):
+        self.enroll()
+
+        with override_settings(FILE_SERVING_OFFLOAD='x-accel-redirect'):
+            response = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.pdf.file.name}')
+        self.assertEqual(response.content, b'')
+
+        with override_settings(FILE_SERVING_OFFLOAD='x-sendfile'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], self.pdf.file.path)
+
+    def test_submission_and_attachment_downloads(self):
+        assignment = Assignment.objects.create(course=self.course, title='Essay', instructions='Write')
+        submission = Submission.objects.create(assignment=assignment, student=self.student)
+        submission.file.save('essay.txt', ContentFile(b'my essay'))
+        other = User.objects.create_user(username='other', password='other123')
+        conversation = Conversation.objects.create()
+        conversation.participants.add(self.student, self.course.teacher.user)
+        message = Message.objects.create(conversation=conversation, sender=self.student, content='Hi')
+        message.attachment.save('question.txt', ContentFile(b'a question'))
+
+        response = self.client.get(f'/api/submissions/{submission.id}/file/')
+        self.assertEqual(b''.join(response.streaming_content), b'my essay')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment;'))
+        response = self.client.get(f'/api/messaging/messages/{message.id}/attachment/')
+        self.assertEqual(b''.join(response.streaming_content), b'a question')
+
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(f'/api/submissions/{submission.id}/file/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/messaging/messages/{message.id}/attachment/').status_code, 404)
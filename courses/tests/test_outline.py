@@ -0,0 +1,112 @@
+"""
+Tests for the course outline endpoint
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import TeacherProfile
+from courses.assignment_models import Assignment
+from courses.models import PDF, Course, Video
+from courses.progress_models import ContentProgress
+from enrollments.models import Enrollment
+
+User = get_user_model()
+
+
+class CourseOutlineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        teacher_user = User.objects.create_user(username='teacher', password='teacher123')
+        teacher = TeacherProfile.objects.create(user=teacher_user)
+        self.course = Course.objects.create(teacher=teacher, title='Course', price=50, published=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.intro = Video.objects.create(
+                course=self.course, title='Intro', video_url='https://example.com/1.mp4',
+                order_index=1, is_preview=True
+            )
+            self.notes = PDF.objects.create(course=self.course, title='Notes', file='pdfs/notes.pdf', order_index=2)
+            self.lesson = Video.objects.create(
+                course=self.course, title='Lesson', video_url='https://example.com/2.mp4', order_index=2
+            )
+            self.homework = Assignment.objects.create(
+                course=self.course, title='Homework', instructions='Do it', order_index=3
+            )
+        self.student = User.objects.create_user(username='student', password='student123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+        self.url = f'/api/courses/{self.course.id}/outline/'
+
+    def outline(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.data['items']
+
+    def test_content_is_ordered_with_progress_merged(self):
+        ContentProgress.objects.create(
+            student=self.student, course=self.course, is_completed=True, progress_percent=100,
+            content_type=ContentType.objects.get_for_model(Video), object_id=self.intro.id
+        )
+
+        items = self.outline()
+
+        self.assertEqual(
+            [(item['type'], item['title']) for item in items],
+            [('video', 'Intro'), ('video', 'Lesson'), ('pdf', 'Notes'), ('assignment', 'Homework')]
+        )
+        self.assertEqual([item['accessible'] for item in items], [True, False, False, False])
+        self.assertTrue(items[0]['progress']['is_completed'])
+        self.assertIsNone(items[1]['progress'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.create(student=self.student, course=self.course)
+        self.assertTrue(all(item['accessible'] for item in self.outline()))
+
+    def test_query_count_does_not_grow_with_content(self):
+        self.outline()
+        with self.assertNumQueries(2):
+            self.outline()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(20):
+                PDF.objects.create(course=self.course, title=f'Extra {i}', file='pdfs/x.pdf', order_index=5)
+
+        # The structure is rebuilt once after the change, then cached again
+        with self.assertNumQueries(5):
+            self.assertEqual(len(self.outline()), 24)
+        with self.assertNumQueries(2):
+            self.outline()
+
+    def test_anonymous_users_see_previews_only(self):
+        self.client.force_authenticate(user=None)
+        self.assertEqual([item['accessible'] for item in self.outline()], [True, False, False, False])
+
+    def test_bulk_reorder(self):
+        teacher_client = APIClient()
+        teacher_client.force_authenticate(user=self.course.teacher.user)
+        url = f'/api/courses/{self.course.id}/reorder/'
+        order = [
+            {'type': 'assignment', 'id': self.homework.id},
+            {'type': 'pdf', 'id': self.notes.id, 'is_preview': True},
+            {'type': 'video', 'id': self.lesson.id, 'title': 'First lesson'},
+            {'type': 'video', 'id': self.intro.id},
+        ]
+        self.outline()
+
+        # Course, one read and one bulk update per content type, then the outline
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(11):
+            response = teacher_client.post(url, {'items': order}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        items = self.outline()
+        self.assertEqual(
+            [(item['title'], item['order_index']) for item in items],
+            [('Homework', 1), ('Notes', 2), ('First lesson', 3), ('Intro', 4)]
+        )
+        self.assertEqual([item['accessible'] for item in items], [False, True, False, True])
+
+        self.assertEqual(teacher_client.post(url, {'items': order[:3]}, format='json').status_code, 400)
+        self.assertEqual(teacher_client.post(url, {'items': order + order[:1]}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'items': order}, format='json').status_code, 403)
@@ -0,0 +1,72 @@
+"""
+Tests for ranked course search and keeping its index in sync
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import TeacherProfile
+from courses.models import Course, CourseCategory
+from courses.search import analyze, rebuild_index, search_courses
+
+User = get_user_model()
+
+
+class CourseSearchTests(TestCase):
+    def setUp(self):
+        teacher_user = User.objects.create_user(
+            username='teacher', password='teacher123', first_name='Amélie', last_name='Poulain'
+        )
+        self.teacher = TeacherProfile.objects.create(user=teacher_user)
+        self.category = CourseCategory.objects.create(name='Informatique')
+        self.web = self.create('Développement web', 'HTML, CSS et JavaScript pour débutants')
+        self.python = self.create('Python pour tous', 'Un cours de développement logiciel', category=self.category)
+        self.guitar = self.create('Guitare', 'Les accords de base')
+
+    def create(self, title, description='', **fields):
+        return Course.objects.create(
+            teacher=self.teacher, title=title, description=description, price=10,
+            published=fields.pop('published', True), **fields
+        )
+
+    def search(self, query):
+        return list(search_courses(Course.objects.filter(published=True), query))
+
+    def test_analysis_folds_accents_and_stems(self):
+        self.assertEqual(analyze('Développements'), analyze('developpement'))
+        self.assertEqual(analyze('les cours'), analyze('course'))
+
+    def test_matches_are_ranked_title_first(self):
+        self.assertEqual(self.search('developpement'), [self.web, self.python])
+        self.assertEqual(self.search('DÉVELOPPEMENT Logiciels'), [self.python])
+        self.assertEqual(self.search('informatique'), [self.python])
+        self.assertEqual(set(self.search('amelie')), {self.web, self.python, self.guitar})
+        self.assertEqual(self.search('guit'), [self.guitar])
+        self.assertEqual(self.search('le de'), [])
+
+    def test_index_follows_changes(self):
+        self.guitar.title = 'Guitare électrique'
+        self.guitar.save()
+        self.assertEqual(self.search('electrique'), [self.guitar])
+
+        self.category.name = 'Programmation'
+        self.category.save()
+        self.assertEqual(self.search('programmation'), [self.python])
+
+        self.teacher.user.last_name = 'Dupont'
+        self.teacher.user.save()
+        self.assertEqual(len(self.search('dupont')), 3)
+
+        self.web.delete()
+        self.assertEqual(self.search('developpement'), [self.python])
+
+        rebuild_index()
+        self.assertEqual(self.search('developpement'), [self.python])
+
+    def test_api_search_only_returns_visible_courses(self):
+        hidden = self.create('Développement mobile', published=False)
+
+        response = APIClient().get('/api/courses/', {'search': 'développement'})
+
+        self.assertEqual([course['id'] for course in response.data], [self.web.id, self.python.id])
+        self.assertNotIn(hidden.id, [course['id'] for course in response.data])
@@ -0,0 +1,119 @@
+"""
+Tests for view counting and view limits of individually bought videos
+"""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import TeacherProfile
+from courses.models import Course, Video
+from enrollments.models import Enrollment, VideoEnrollment
+from enrollments import view_counts
+from enrollments.view_counts import flush_view_counts, record_video_view
+
+User = get_user_model()
+
+
+class VideoViewCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        teacher_user = User.objects.create_user(username='teacher', password='teacher123')
+        teacher = TeacherProfile.objects.create(user=teacher_user)
+        course = Course.objects.create(teacher=teacher, title='Course', price=50, published=True)
+        self.video = Video.objects.create(
+            course=course, title='Lesson', video_url='https://example.com/1.mp4'
+        )
+        self.student = User.objects.create_user(username='student', password='student123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+
+    def buy_video(self, max_views=0, **fields):
+        enrollment = Enrollment.objects.create(
+            student=self.student,
+            content_type=ContentType.objects.get_for_model(Video),
+            object_id=self.video.id,
+            **fields
+        )
+        return VideoEnrollment.objects.create(enrollment=enrollment, video=self.video, max_views=max_views)
+
+    def play(self):
+        return self.client.post(f'/api/videos/{self.video.id}/play/').status_code
+
+    def test_view_limit_is_enforced(self):
+        video_enrollment = self.buy_video(max_views=2)
+
+        self.assertEqual([self.play(), self.play(), self.play()], [200, 200, 403])
+
+        video_enrollment.refresh_from_db()
+        self.assertEqual(video_enrollment.views_count, 2)
+        self.assertFalse(video_enrollment.can_view())
+        self.assertFalse(video_enrollment.increment_view_count())
+
+    def test_fetching_video_details_is_not_a_play(self):
+        video_enrollment = self.buy_video(max_views=1)
+
+        for _ in range(2):
+            self.assertEqual(self.client.get(f'/api/videos/{self.video.id}/').status_code, 200)
+        self.assertEqual(self.play(), 200)
+
+        video_enrollment.refresh_from_db()
+        self.assertEqual(video_enrollment.views_count, 1)
+
+    def test_expired_enrollment_counts_no_views(self):
+        video_enrollment = self.buy_video(expires_at=timezone.now() - timedelta(minutes=1))
+
+        self.assertFalse(video_enrollment.can_view())
+        self.assertFalse(video_enrollment.increment_view_count())
+        self.assertFalse(video_enrollment.increment_view_count(buffered=True))
+        with override_settings(VIDEO_VIEW_BUFFERING=True):
+            self.assertFalse(record_video_view(self.student, self.video))
+        video_enrollment.refresh_from_db()
+        self.assertEqual(video_enrollment.views_count, 0)
+        self.assertEqual(flush_view_counts(), 0)
+
+    @override_settings(VIDEO_VIEW_BUFFERING=True)
+    def test_unlimited_views_are_buffered_until_flushed(self):
+        video_enrollment = self.buy_video()
+
+        for _ in range(3):
+            self.assertEqual(self.play(), 200)
+        self.assertTrue(video_enrollment.increment_view_count(buffered=True))
+        video_enrollment.refresh_from_db()
+        self.assertEqual(video_enrollment.views_count, 0)
+
+        self.assertEqual(flush_view_counts(), 4)
+        video_enrollment.refresh_from_db()
+        self.assertEqual(video_enrollment.views_count, 4)
+        self.assertEqual(flush_view_counts(), 0)
+
+        self.play()
+        self.assertEqual(flush_view_counts(), 1)
+        video_enrollment.refresh_from_db()
+        self.assertEqual(video_enrollment.views_count, 5)
+
+    @override_settings(VIDEO_VIEW_BUFFERING=True)
+    def test_buffered_views_survive_lost_registrations(self):
+        video_enrollment = self.buy_video()
+        self.play()
+        self.assertEqual(flush_view_counts(), 1)
+
+        # The sequence is evicted: new slots must come after the flushed ones
+        cache.delete(view_counts.SEQUENCE_KEY)
+        self.play()
+        self.assertEqual(flush_view_counts(), 1)
+
+        # The slot is evicted while the counter survives: the next view,
+        # once the registration has expired, registers it again
+        self.play()
+        cache.delete(view_counts._slot_key(cache.get(view_counts.SEQUENCE_KEY)))
+        self.assertEqual(flush_view_counts(), 0)
+        cache.delete(view_counts._registered_key(video_enrollment.pk))
+        self.play()
+        self.assertEqual(flush_view_counts(), 2)
+        video_enrollment.refresh_from_db()
+        self.assertEqual(video_enrollment.views_count, 4)
@@ -45,6 +45,7 @@ submissions_router = NestedDefaultRouter(router, r'submissions', lookup='submiss
 submissions_router.register(r'feedback', assignment_views.FeedbackViewSet, basename='submission-feedback')
 
 urlpatterns = [
+    path('autocomplete/', views.AutocompleteView.as_view(), name='autocomplete'),
     # Include all router URLs
     path('', include(router.urls)),
     path('', include(courses_router.urls)),
@@ -1,12 +1,18 @@
-from rest_framework import viewsets, permissions, filters
+from rest_framework import generics, viewsets, permissions, filters
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import CourseCategory, Course, Video
-from .course_serializers import CourseCategorySerializer, CourseSerializer
+from .course_serializers import (
+    AutocompleteQuerySerializer, ContentReorderSerializer, CourseCategorySerializer, CourseSerializer
+)
 from .content_serializers import VideoSerializer
 from core.permissions import IsTeacher
+from .autocomplete import autocomplete
+from .outline import OutlineError, course_outline, outline_version, reorder_content
+from .search import search_courses
+from enrollments.entitlements import accessible_content_q, can_access_content
 
 class CourseCategoryViewSet(viewsets.ModelViewSet):
     queryset = CourseCategory.objects.all()
@@ -19,11 +25,21 @@ class CourseCategoryViewSet(viewsets.ModelViewSet):
         return [permissions.IsAdminUser()]
 
 
+class CourseSearchFilter(filters.BaseFilterBackend):
+    """?search= ranked by the course search index, best match first"""
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query or queryset.query.is_sliced:
+            return queryset
+        return search_courses(queryset, query)
+
+
 class CourseViewSet(viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['title', 'description', 'category__name']
+    filter_backends = [CourseSearchFilter]
     permission_classes = [permissions.AllowAny]  # Default to AllowAny for list and retrieve actions
 
     def get_queryset(self):
@@ -54,7 +70,7 @@ class CourseViewSet(viewsets.ModelViewSet):
 
     def get_permissions(self):
         # Always allow list and retrieve actions
-        if self.action in ["list", "retrieve"]:
+        if self.action in ["list", "retrieve", "outline"]:
             return [permissions.AllowAny()]
             
         # Teacher permissions for create, update, delete
@@ -85,6 +101,54 @@ class CourseViewSet(viewsets.ModelViewSet):
             ]
         })
 
+    @action(detail=True, methods=['get'])
+    def outline(self, request, pk=None):
+        """
+        All videos, PDFs and assignments of the course in order, with
+        whether the user can open each one and their progress on it
+        """
+        course = self.get_object()
+        return Response({
+            'course': course.pk,
+            'version': outline_version(course.pk),
+            'items': course_outline(course, request.user),
+        })
+
+    @action(detail=True, methods=['post'])
+    def reorder(self, request, pk=None):
+        """
+        Set the order of all content of the course at once, optionally
+        renaming items or changing is_preview, and return the new outline
+        """
+        course = self.get_object()
+        if not request.user.is_staff and getattr(request.user, 'teacher_profile', None) != course.teacher:
+            return Response({"detail": "Not authorized"}, status=403)
+
+        serializer = ContentReorderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            reorder_content(course, serializer.validated_data['items'])
+        except OutlineError as e:
+            return Response({'error': str(e)}, status=400)
+        return Response({
+            'course': course.pk,
+            'items': course_outline(course, request.user),
+        })
+
+
+class AutocompleteView(generics.GenericAPIView):
+    """
+    Suggestions for a partly typed search.
+    GET /api/autocomplete/?q=<text>&limit=<n>
+    """
+    permission_classes = [permissions.AllowAny]
+    serializer_class = AutocompleteQuerySerializer
+
+    def get(self, request):
+        params = self.get_serializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(autocomplete(params.validated_data['q'], params.validated_data['limit']))
+
 
 class VideoViewSet(viewsets.ModelViewSet):
     serializer_class = VideoSerializer
@@ -100,12 +164,11 @@ class VideoViewSet(viewsets.ModelViewSet):
             # Teachers can see all videos in their courses
             return queryset.filter(course__teacher=self.request.user.teacher_profile)
         else:
-            # Students can see preview videos and videos of courses they're enrolled in
+            # Students can see preview videos and videos they're entitled to
             return queryset.filter(
                 Q(is_preview=True, course__published=True) |
-                Q(course__enrolled_students__student=self.request.user, 
-                  course__enrolled_students__is_active=True)
-            ).distinct()
+                accessible_content_q(self.request.user, include_videos=True)
+            )
 
     def get_permissions(self):
         if self.action in ["list", "retrieve"]:
@@ -120,18 +183,11 @@ class VideoViewSet(viewsets.ModelViewSet):
             if not request.user.is_authenticated:
                 return Response({"detail": "Authentication required"}, status=401)
             
-            # Check if user is enrolled in the course
-            if not hasattr(request.user, 'teacher_profile'):
-                enrollment = video.course.enrolled_students.filter(
-                    student=request.user,
-                    is_active=True
-                ).first()
-                
-                if not enrollment:
-                    return Response(
-                        {"detail": "You must be enrolled in this course to access this video"},
-                        status=403
-                    )
+            if not can_access_content(request.user, video):
+                return Response(
+                    {"detail": "You must be enrolled in this course to access this video"},
+                    status=403
+                )
         
         serializer = self.get_serializer(video)
         return Response(serializer.data)
@@ -0,0 +1,73 @@
+"""
+Expansion of content bundles into the content they grant.
+
+A bundle lists purchasable items (enrollments.content_models.ContentType),
+each pointing at a course, video, session... or at another bundle. The
+whole tree under any number of bundles is read with one recursive query:
+the CTE walks from each bought bundle down through nested bundles, and
+the final SELECT returns the non-bundle items reached from each of them.
+UNION (rather than UNION ALL) drops (bundle, nested bundle) pairs already
+visited, so a bundle that contains itself, directly or further down, does
+not make the query loop.
+"""
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+
+from .content_models import ContentBundle
+
+
+def _tables():
+    items = ContentBundle.content_items.field
+    through = items.remote_field.through._meta
+    return {
+        'bundle': ContentBundle._meta.db_table,
+        'through': through.db_table,
+        'through_bundle': items.m2m_column_name(),
+        'through_item': items.m2m_reverse_name(),
+        'item': items.related_model._meta.db_table,
+    }
+
+
+def _expansion_sql(bundle_count):
+    placeholders = ', '.join(['%s'] * bundle_count)
+    return """
+        WITH RECURSIVE expanded (root_id, bundle_id) AS (
+            SELECT id, id FROM {bundle} WHERE id IN ({placeholders})
+            UNION
+            SELECT expanded.root_id, item.object_id
+            FROM expanded
+            JOIN {through} link ON link.{through_bundle} = expanded.bundle_id
+            JOIN {item} item ON item.id = link.{through_item}
+            WHERE item.content_type_id = %s
+        )
+        SELECT DISTINCT expanded.root_id, item.content_type_id, item.object_id
+        FROM expanded
+        JOIN {through} link ON link.{through_bundle} = expanded.bundle_id
+        JOIN {item} item ON item.id = link.{through_item}
+        WHERE item.content_type_id <> %s
+    """.format(placeholders=placeholders, **_tables())
+
+
+def expand_bundles(bundle_ids):
+    """
+    Content granted by each bundle, nested bundles included.
+
+    Returns:
+        dict: bundle id -> set of (content_type_id, object_id)
+    """
+    bundle_ids = sorted(set(bundle_ids))
+    if not bundle_ids:
+        return {}
+
+    bundle_type_id = ContentType.objects.get_for_model(ContentBundle).id
+    expanded = defaultdict(set)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _expansion_sql(len(bundle_ids)),
+            [*bundle_ids, bundle_type_id, bundle_type_id]
+        )
+        for root_id, content_type_id, object_id in cursor.fetchall():
+            expanded[root_id].add((content_type_id, object_id))
+    return dict(expanded)
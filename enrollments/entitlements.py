@@ -0,0 +1,168 @@
+"""
+Per-user entitlements: which courses and videos a user may access.
+
+A user's active enrollments are read with one query and reduced to two
+sorted arrays of ids, one of courses and one of videos. The arrays are
+cached per user as packed bytes and searched with bisect, so an access
+check after the first is a cache read and no database query.
+
+The cached entry is dropped when one of the user's enrollments is saved or
+deleted (see enrollments.signals), and expires on its own when the first
+of the user's enrollments with an end date runs out. Code that writes
+enrollments with bulk_create or update() must call
+invalidate_entitlements() itself. Enrollments also change in management
+commands (process_stripe_events, expire_enrollments), so the cache has to
+be shared between processes for web workers to see the change (see
+CACHES in config.settings).
+"""
+from array import array
+from bisect import bisect_left
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+CACHE_TIMEOUT = 60 * 60
+ARRAY_TYPE = 'q'
+
+
+def _cache_key(user_id):
+    return f'enrollments_entitlements:{user_id}'
+
+
+def _contains(ids, value):
+    index = bisect_left(ids, value)
+    return index < len(ids) and ids[index] == value
+
+
+class Entitlements:
+    """Sorted course and video ids a user is enrolled in"""
+
+    def __init__(self, course_ids=(), video_ids=()):
+        self.course_ids = array(ARRAY_TYPE, sorted(set(course_ids)))
+        self.video_ids = array(ARRAY_TYPE, sorted(set(video_ids)))
+
+    def has_course(self, course_id):
+        return _contains(self.course_ids, int(course_id))
+
+    def has_video(self, video_id, course_id=None):
+        """A video is accessible when bought on its own or with its course"""
+        if course_id is not None and self.has_course(course_id):
+            return True
+        return _contains(self.video_ids, int(video_id))
+
+    def pack(self):
+        return self.course_ids.tobytes(), self.video_ids.tobytes()
+
+    @classmethod
+    def unpack(cls, packed):
+        entitlements = cls()
+        entitlements.course_ids.frombytes(packed[0])
+        entitlements.video_ids.frombytes(packed[1])
+        return entitlements
+
+
+def compute_entitlements(user_id, now=None):
+    """
+    Read a user's entitlements from their active enrollments.
+
+    Returns:
+        tuple: (Entitlements, seconds until the first enrollment expires or
+        None)
+    """
+    from courses.models import Course, Video
+    from .models import Enrollment
+
+    now = now or timezone.now()
+    course_type = ContentType.objects.get_for_model(Course)
+    video_type = ContentType.objects.get_for_model(Video)
+
+    course_ids, video_ids = [], []
+    next_expiry = None
+    for content_type_id, object_id, course_id, expires_at in Enrollment.objects.active(now).filter(
+        student_id=user_id
+    ).values_list('content_type_id', 'object_id', 'course_id', 'expires_at'):
+        if course_id is not None:
+            course_ids.append(course_id)
+        elif content_type_id == course_type.id:
+            course_ids.append(object_id)
+        elif content_type_id == video_type.id:
+            video_ids.append(object_id)
+        if expires_at is not None and (next_expiry is None or expires_at < next_expiry):
+            next_expiry = expires_at
+
+    ttl = None
+    if next_expiry is not None:
+        ttl = max(int((next_expiry - now).total_seconds()) + 1, 1)
+    return Entitlements(course_ids, video_ids), ttl
+
+
+def get_entitlements(user):
+    """Cached entitlements of a user; empty for anonymous users"""
+    if not user.is_authenticated:
+        return Entitlements()
+
+    packed = cache.get(_cache_key(user.pk))
+    if packed is not None:
+        return Entitlements.unpack(packed)
+
+    entitlements, ttl = compute_entitlements(user.pk)
+    cache.set(_cache_key(user.pk), entitlements.pack(), min(ttl or CACHE_TIMEOUT, CACHE_TIMEOUT))
+    return entitlements
+
+
+def invalidate_entitlements(*user_ids):
+    """Drop cached entitlements once the current transaction commits"""
+    keys = [_cache_key(user_id) for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _is_course_teacher(user, course):
+    teacher = getattr(user, 'teacher_profile', None)
+    return teacher is not None and course.teacher_id == teacher.id
+
+
+def can_access_course(user, course):
+    """Staff, the course's teacher and enrolled users can access a course"""
+    if not user.is_authenticated:
+        return False
+    if user.is_staff or _is_course_teacher(user, course):
+        return True
+    return get_entitlements(user).has_course(course.pk)
+
+
+def can_access_content(user, content):
+    """
+    Access to course content such as a video or PDF.
+
+    Previews are open; videos can also be bought on their own.
+    """
+    if getattr(content, 'is_preview', False):
+        return True
+    if not user.is_authenticated:
+        return False
+    if user.is_staff or _is_course_teacher(user, content.course):
+        return True
+
+    from courses.models import Video
+    entitlements = get_entitlements(user)
+    if isinstance(content, Video):
+        return entitlements.has_video(content.pk, content.course_id)
+    return entitlements.has_course(content.course_id)
+
+
+def accessible_content_q(user, include_videos=False):
+    """
+    Filter for course content the user is entitled to, from the cached ids.
+
+    Args:
+        include_videos: also match individually bought videos by pk
+    """
+    entitlements = get_entitlements(user)
+    q = Q(course_id__in=entitlements.course_ids.tolist())
+    if include_videos:
+        q |= Q(pk__in=entitlements.video_ids.tolist())
+    return q
@@ -0,0 +1,43 @@
+"""
+Expiry of enrollments with an end date.
+
+Access checks already treat an enrollment past its expires_at as inactive
+(Enrollment.objects.active()); expire_enrollments brings the stored status
+in line for listings and reports. It walks the overdue rows oldest first
+through the (status, expires_at) index and marks each batch expired with
+one UPDATE limited to rows still active. update() sends no post_save, so
+the students' cached entitlements are dropped here.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .entitlements import invalidate_entitlements
+from .models import Enrollment
+
+
+def expire_enrollments(now=None, batch_size=500):
+    """
+    Mark active enrollments that have run out as expired.
+
+    Returns:
+        int: number of enrollments expired
+    """
+    now = now or timezone.now()
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    expired = 0
+    while True:
+        with transaction.atomic():
+            candidates = Enrollment.objects.due_to_expire(now).order_by(
+                'expires_at', 'pk'
+            ).select_for_update(skip_locked=skip_locked)
+            rows = list(candidates.values_list('pk', 'student_id')[:batch_size])
+            if not rows:
+                return expired
+
+            expired += Enrollment.objects.due_to_expire(now).filter(
+                pk__in=[pk for pk, _ in rows]
+            ).update(status='expired')
+            invalidate_entitlements(*(student_id for _, student_id in rows))
+
+        if len(rows) < batch_size:
+            return expired
@@ -0,0 +1,14 @@
+from core.management.base import PeriodicCommand
+from enrollments.lifecycle import expire_enrollments
+
+
+class Command(PeriodicCommand):
+    help = 'Mark active enrollments whose end date has passed as expired'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def run_once(self, **options):
+        count = expire_enrollments(batch_size=options['batch_size'])
+        self.stdout.write(f'Expired {count} enrollments')
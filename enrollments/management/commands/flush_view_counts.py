@@ -0,0 +1,10 @@
+from core.management.base import PeriodicCommand
+from enrollments.view_counts import flush_view_counts
+
+
+class Command(PeriodicCommand):
+    help = 'Write video views buffered in the cache to their enrollments'
+
+    def run_once(self, **options):
+        count = flush_view_counts()
+        self.stdout.write(f'Flushed {count} views')
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.14 on 2026-10-19 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enrollments', '0004_enrollment_payment_enrollment_status_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['student', 'status', 'expires_at'], name='enrollments_student_60e539_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['content_type', 'object_id'], name='enrollments_content_5f0d45_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['status', 'expires_at'], name='enrollments_status_cd2ae5_idx'),
+        ),
+    ]
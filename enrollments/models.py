@@ -2,12 +2,33 @@
 Models for managing course enrollments.
 """
 from django.db import models
+from django.db.models import Q
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 from courses.models import Course
 from .content_models import ContentType as EnrollmentContentType, ContentBundle
 
+
+class EnrollmentQuerySet(models.QuerySet):
+    """Enrollment filters that run in the database"""
+
+    def active(self, now=None):
+        """Active enrollments that have not run out, as is_active"""
+        from django.utils import timezone
+        now = now or timezone.now()
+        return self.filter(
+            Q(expires_at__isnull=True) | Q(expires_at__gt=now),
+            status='active'
+        )
+
+    def due_to_expire(self, now=None):
+        """Enrollments still marked active whose end date has passed"""
+        from django.utils import timezone
+        now = now or timezone.now()
+        return self.filter(status='active', expires_at__lte=now)
+
+
 class Enrollment(models.Model):
     """
     Represents a student's enrollment in a course, video, or other content.
@@ -88,8 +109,16 @@ class Enrollment(models.Model):
     notes = models.TextField(blank=True)
     last_accessed = models.DateTimeField(null=True, blank=True)
     
+    objects = EnrollmentQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-enrolled_at']
+        indexes = [
+            models.Index(fields=['student', 'status', 'expires_at']),
+            models.Index(fields=['content_type', 'object_id']),
+            # Lets the expiry sweeper range-scan active rows by end date
+            models.Index(fields=['status', 'expires_at']),
+        ]
     
     def __str__(self):
         if self.course:
@@ -144,6 +173,15 @@ class Enrollment(models.Model):
         self.save(update_fields=['last_accessed'])
 
 
+class VideoEnrollmentQuerySet(models.QuerySet):
+    def viewable(self, now=None):
+        """Video enrollments with an active enrollment and views left"""
+        return self.filter(
+            Q(max_views=0) | Q(views_count__lt=models.F('max_views')),
+            enrollment__in=Enrollment.objects.active(now).values('pk')
+        )
+
+
 class VideoEnrollment(models.Model):
     """
     Represents access to individual video content.
@@ -162,6 +200,8 @@ class VideoEnrollment(models.Model):
     max_views = models.PositiveIntegerField(default=0)  # 0 means unlimited
     views_count = models.PositiveIntegerField(default=0)
     
+    objects = VideoEnrollmentQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.enrollment.student.username} - {self.video.title}"
     
@@ -172,11 +212,31 @@ class VideoEnrollment(models.Model):
             return True
         return self.views_count < self.max_views
         
-    def increment_view_count(self):
-        """Increment the view count"""
-        self.views_count += 1
-        self.save(update_fields=['views_count'])
+    def increment_view_count(self, buffered=False):
+        """
+        Count one view, if the enrollment is active and has views left.
+
+        The check and the increment are a single conditional UPDATE, so
+        concurrent plays cannot go over max_views. With buffered=True the
+        views of unlimited enrollments are added up in the cache and
+        written by enrollments.view_counts.flush_view_counts(), once the
+        enrollment is found to be active.
+
+        Returns:
+            bool: whether the view was allowed
+        """
+        viewable = VideoEnrollment.objects.filter(pk=self.pk).viewable()
+        if buffered and self.max_views == 0:
+            if not viewable.exists():
+                return False
+            from .view_counts import buffer_view
+            buffer_view(self.pk)
+            return True
+        counted = viewable.update(views_count=models.F('views_count') + 1)
+        if counted:
+            self.views_count += 1
+        return bool(counted)
         
     def can_view(self):
-        """Check if student can view this video"""
-        return self.enrollment.is_active and self.has_views_remaining
+        """Check if student can view this video, in one query"""
+        return VideoEnrollment.objects.filter(pk=self.pk).viewable().exists()
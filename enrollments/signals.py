@@ -0,0 +1,13 @@
+"""
+Signal handlers for enrollments.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Enrollment
+from .entitlements import invalidate_entitlements
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def drop_cached_entitlements(sender, instance, **kwargs):
+    invalidate_entitlements(instance.student_id)
@@ -0,0 +1,140 @@
+"""
+Counting plays of individually bought videos.
+
+Enrollments with a view limit are charged with one conditional UPDATE
+that only matches while the enrollment is active and under its limit, so
+the quota check and the increment cannot be separated by a concurrent
+play. Unlimited enrollments have nothing to enforce, so with
+VIDEO_VIEW_BUFFERING on their plays are added up in the cache and written
+by flush_view_counts() instead of costing a write per play.
+
+The buffer keeps one counter per video enrollment. An enrollment with
+views to write takes a numbered slot, which is how the flusher finds it,
+and keeps a marker while registered. A view registers its enrollment
+again whenever the marker is missing or its counter starts over, and
+markers expire after REGISTRATION_TIMEOUT, so a lost slot or sequence
+only delays views until the next one. Slots are taken with add(), so two
+processes given the same number by a non-atomic incr() do not overwrite
+each other. A lost counter only undercounts an enrollment without a
+limit. Run one flusher at a time.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .entitlements import get_entitlements
+from .models import VideoEnrollment
+
+SEQUENCE_KEY = 'enrollments_views_seq'
+FLUSHED_KEY = 'enrollments_views_flushed'
+REGISTRATION_TIMEOUT = 60 * 60
+
+
+def _count_key(video_enrollment_id):
+    return f'enrollments_views:{video_enrollment_id}'
+
+
+def _slot_key(slot):
+    return f'enrollments_views_slot:{slot}'
+
+
+def _registered_key(video_enrollment_id):
+    return f'enrollments_views_registered:{video_enrollment_id}'
+
+
+def _incr(key, delta=1):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key, delta)
+
+
+def _next_slot():
+    try:
+        return cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        # Numbers up to the flushed one would never be read again
+        cache.add(SEQUENCE_KEY, cache.get(FLUSHED_KEY, 0), timeout=None)
+        return cache.incr(SEQUENCE_KEY)
+
+
+def _register(video_enrollment_id):
+    while not cache.add(_slot_key(_next_slot()), video_enrollment_id, timeout=None):
+        # Taken by another process given the same number
+        continue
+
+
+def buffer_view(video_enrollment_id):
+    """Add a view to the cached counter of a video enrollment"""
+    count = _incr(_count_key(video_enrollment_id))
+    registered = _registered_key(video_enrollment_id)
+    if cache.add(registered, True, timeout=REGISTRATION_TIMEOUT) or count == 1:
+        _register(video_enrollment_id)
+
+
+def flush_view_counts():
+    """
+    Write buffered views to the database.
+
+    Enrollments with the same number of buffered views are updated
+    together, so a flush costs one UPDATE per distinct count.
+
+    Returns:
+        int: number of views written
+    """
+    last = cache.get(FLUSHED_KEY, 0)
+    sequence = cache.get(SEQUENCE_KEY, 0)
+    if sequence <= last:
+        return 0
+
+    slot_keys = [_slot_key(slot) for slot in range(last + 1, sequence + 1)]
+    ids = set(cache.get_many(slot_keys).values())
+    # Views from here on register their enrollment again
+    cache.delete_many([_registered_key(pk) for pk in ids])
+    counts = cache.get_many([_count_key(pk) for pk in ids])
+    by_count = defaultdict(list)
+    for pk in ids:
+        count = counts.get(_count_key(pk))
+        if count:
+            by_count[count].append(pk)
+
+    with transaction.atomic():
+        for count, pks in by_count.items():
+            VideoEnrollment.objects.filter(pk__in=pks).update(views_count=F('views_count') + count)
+
+    cache.delete_many(slot_keys)
+    cache.set(FLUSHED_KEY, sequence, timeout=None)
+    written = 0
+    for count, pks in by_count.items():
+        for pk in pks:
+            written += count
+            try:
+                cache.decr(_count_key(pk), count)
+            except ValueError:
+                pass
+    return written
+
+
+def record_video_view(user, video):
+    """
+    Count a play of a video the user bought on its own.
+
+    Previews, staff and users with the video's course are not counted.
+
+    Returns:
+        bool: False when the user has no views of the video left
+    """
+    if video.is_preview or user.is_staff or get_entitlements(user).has_course(video.course_id):
+        return True
+
+    video_enrollments = VideoEnrollment.objects.filter(enrollment__student=user, video=video)
+    # Unlimited enrollments first, so a play does not use up limited views
+    video_enrollment = video_enrollments.viewable().order_by('max_views').first()
+    if video_enrollment is None:
+        # Access without video details has no limit to enforce
+        return not video_enrollments.exists()
+    return video_enrollment.increment_view_count(buffered=settings.VIDEO_VIEW_BUFFERING)
@@ -18,7 +18,7 @@ class EnrollCourseView(generics.CreateAPIView):
         course = get_object_or_404(Course, pk=request.data.get('course'))
         
         # Check if already enrolled
-        if Enrollment.objects.filter(student=request.user, course=course).exists():
+        if Enrollment.objects.active().filter(student=request.user, course=course).exists():
             return Response(
                 {"detail": "You are already enrolled in this course."},
                 status=status.HTTP_400_BAD_REQUEST
@@ -29,7 +29,7 @@ class EnrollCourseView(generics.CreateAPIView):
         enrollment = Enrollment.objects.create(
             student=request.user,
             course=course,
-            is_active=True
+            status='active'
         )
         
         serializer = self.get_serializer(enrollment)
@@ -6,10 +6,11 @@ from django.http import JsonResponse, HttpResponse
 from django.urls import reverse
 from django.conf import settings
 from django.template.loader import render_to_string
-from django.db.models import Avg, Count, Q
+from django.db.models import Avg, Count, Q, Sum
 from django.utils import timezone
 
 from courses.models import Course, CourseCategory
+from courses.search import search_courses
 from accounts.models import TeacherProfile, StudentProfile
 from live_sessions.models import TimeSlot
 
@@ -431,7 +432,7 @@ def course_list(request):
     # Filter by search query
     search_query = request.GET.get('q')
     if search_query:
-        courses = courses.filter(title__icontains=search_query)
+        courses = search_courses(courses, search_query)
     
     return render(request, 'frontend/course_list.html', {
         'courses': courses,
@@ -559,15 +560,24 @@ def dashboard(request):
         # We're using a simple query to retrieve courses
         # In a real app, you might want to use a more complex model relationship
         courses = Course.objects.filter(published=True)
+        total_earnings = 0
         if hasattr(user, 'teacher_profile'):
             courses = courses.filter(teacher=user.teacher_profile)
+            
+            # Net earnings in euros, from the daily sales rollups
+            from payments.models import SalesRollup
+            totals = SalesRollup.objects.filter(
+                teacher=user.teacher_profile, currency='EUR'
+            ).aggregate(gross=Sum('gross'), refunds=Sum('refunds'))
+            if totals['gross'] is not None:
+                total_earnings = totals['gross'] - totals['refunds']
         
         # Add teacher-specific data to context
         context.update({
             'courses': courses,
             'total_students': 0,  # This would come from your enrollment model
             'upcoming_sessions': 0,  # This would come from your sessions model
-            'total_earnings': 0,  # This would come from your payments model
+            'total_earnings': total_earnings,
         })
         
         return render(request, 'frontend/teacher_dashboard.html', context)
@@ -578,7 +588,7 @@ def dashboard(request):
         import datetime
         
         # Get active enrollments
-        enrollments = Enrollment.objects.filter(student=user, status='active').select_related(
+        enrollments = Enrollment.objects.active().filter(student=user).select_related(
             'course', 'course__teacher', 'content_type'
         ).prefetch_related('video_details')
         
@@ -704,18 +714,18 @@ def book_session_view(request):
     from django.utils import timezone
     
     # Get student's enrolled courses
-    enrollments = Enrollment.objects.filter(
-        student=user, 
-        status='active'
+    enrollments = Enrollment.objects.active().filter(
+        student=user
     ).select_related('course', 'course__teacher')
     
     # Get available time slots for the next 30 days
     now = timezone.now()
     thirty_days_later = now + timezone.timedelta(days=30)
     
-    # If a specific teacher is selected
+    # Only teachers of the student's courses can be booked from this page
     teacher_id = request.GET.get('teacher')
     available_slots = TimeSlot.objects.filter(
+        teacher_id__in=enrollments.exclude(course=None).values('course__teacher_id'),
         is_available=True,
         start_time__gt=now,
         start_time__lt=thirty_days_later
@@ -847,28 +857,30 @@ def teacher_detail(request, teacher_id):
         'avg_rating': teacher.avg_rating or 0,
     }
     
-    # Get teacher's available time slots
-    from django.utils import timezone
-    available_slots = TimeSlot.objects.filter(
-        teacher=teacher, 
-        is_available=True,
-        start_time__gte=timezone.now()
-    ).order_by('start_time')
-    
     # Group slots by day for easier display
     from collections import defaultdict
     from datetime import datetime, timedelta
+    from django.utils import timezone
+    from live_sessions.day_calendar import day_start
     
     # Get next 14 days
-    today = timezone.now().date()
+    today = timezone.localdate()
     days = [today + timedelta(days=i) for i in range(14)]
     
+    # Get teacher's available time slots within the displayed days only
+    available_slots = TimeSlot.objects.filter(
+        teacher=teacher, 
+        is_available=True,
+        start_time__gte=timezone.now(),
+        start_time__lt=day_start(days[-1] + timedelta(days=1))
+    ).order_by('start_time')
+    
     # Initialize slots by day dictionary
     slots_by_day = defaultdict(list)
     
     # Group slots by day
     for slot in available_slots:
-        slot_date = slot.start_time.date()
+        slot_date = timezone.localdate(slot.start_time)
         if slot_date in days:
             slots_by_day[slot_date].append(slot)
     
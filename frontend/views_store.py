@@ -6,9 +6,11 @@ from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 
 from courses.models import Course
+from payments.cart import add_item
 from payments.models import Order, Payment
+from payments.pricing import PricingError, content_types_by_name
+from enrollments.entitlements import can_access_content
 from enrollments.models import Enrollment
-import requests
 import json
 
 @login_required
@@ -159,15 +161,8 @@ def video_detail_view(request, video_id):
     has_access = False
     
     if request.user.is_authenticated:
-        # Check if user has purchased this video
-        # This uses the new content-type based enrollment model
-        video_content_type = ContentType.objects.get_for_model(Video)
-        has_access = Enrollment.objects.filter(
-            student=request.user,
-            content_type=video_content_type,
-            object_id=video.id,
-            status='active'
-        ).exists()
+        # Bought on its own or with its course
+        has_access = can_access_content(request.user, video)
     
     return render(request, 'frontend/video_detail.html', {
         'video': video,
@@ -210,33 +205,21 @@ def add_to_cart_api(request):
         if not content_type or not object_id:
             return JsonResponse({'error': 'Missing content_type or object_id'}, status=400)
         
-        # Create a draft order with one item
-        response = requests.post(
-            f'{request.build_absolute_uri("/").rstrip("/")}/api/payments/orders/',
-            json={
-                'items': [{
-                    'content_type': content_type,
-                    'object_id': int(object_id),
-                    'quantity': 1
-                }]
-            },
-            headers={'Authorization': f'Bearer {request.session.get("access_token")}'}
-        )
-        
-        if response.status_code == 201:
-            order_data = response.json()
-            return JsonResponse({
-                'success': True,
-                'order_id': order_data['id'],
-                'message': 'Item added to cart successfully!'
-            })
-        else:
-            error_data = response.json()
+        try:
+            content_types = content_types_by_name([content_type])
+            cart = add_item(request.user, content_types[content_type], int(object_id))
+        except PricingError as e:
             return JsonResponse({
                 'success': False,
-                'error': error_data.get('detail', 'Failed to add item to cart')
+                'error': str(e)
             }, status=400)
-            
+        
+        return JsonResponse({
+            'success': True,
+            'cart_count': cart.items.count(),
+            'message': 'Item added to cart successfully!'
+        })
+        
     except json.JSONDecodeError:
         return JsonResponse({'error': 'Invalid JSON'}, status=400)
     except Exception as e:
@@ -0,0 +1,250 @@
+"""
+In-memory availability index for cross-teacher slot search.
+
+Each teacher's available slots are kept as a list of (start, end, slot_id)
+tuples sorted by start time (POSIX timestamps), so a window query is a
+bisect per candidate teacher plus a scan over the slots that actually start
+inside the window. The index is loaded lazily from the database and then
+kept up to date incrementally by the TimeSlot signal handlers.
+
+Changes made by other processes are detected through a version counter
+in the cache shared by all processes (see core.cache_versions); a process
+whose local copy is behind rebuilds it on the next query.
+"""
+import threading
+from bisect import bisect_left, insort
+
+from django.utils import timezone
+
+from core.cache_versions import bump_version, get_version
+from .day_calendar import invalidate_teacher_calendar
+
+VERSION_CACHE_KEY = 'live_sessions_availability_version'
+
+
+class AvailabilityIndex:
+    """Per-teacher sorted interval arrays of available time slots"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """Drop the local copy; it is reloaded on the next query"""
+        with self._lock:
+            self._by_teacher = {}
+            self._slots = {}
+            self._loaded = False
+            self._version = None
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def __len__(self):
+        return len(self._slots)
+
+    def load(self, rows):
+        """
+        Replace the index contents with the given rows.
+
+        Args:
+            rows: iterable of (slot_id, teacher_id, start, end) where start
+                and end are timestamps, ideally ordered by teacher and start
+        """
+        by_teacher = {}
+        slots = {}
+        for slot_id, teacher_id, start, end in rows:
+            by_teacher.setdefault(teacher_id, []).append((start, end, slot_id))
+            slots[slot_id] = (teacher_id, start, end)
+        for keys in by_teacher.values():
+            keys.sort()
+
+        with self._lock:
+            self._by_teacher = by_teacher
+            self._slots = slots
+            self._loaded = True
+
+    def rebuild(self):
+        """Reload all future available slots from the database"""
+        from .models import TimeSlot
+
+        version = get_version(VERSION_CACHE_KEY)
+        rows = TimeSlot.objects.filter(
+            is_available=True,
+            end_time__gt=timezone.now()
+        ).order_by('teacher_id', 'start_time').values_list(
+            'id', 'teacher_id', 'start_time', 'end_time'
+        )
+        self.load(
+            (slot_id, teacher_id, start.timestamp(), end.timestamp())
+            for slot_id, teacher_id, start, end in rows.iterator(chunk_size=10000)
+        )
+        self._version = version
+
+    def ensure_loaded(self):
+        """Load the index, or reload it when another process has changed slots"""
+        if not self._loaded or get_version(VERSION_CACHE_KEY) != self._version:
+            with self._lock:
+                if not self._loaded or get_version(VERSION_CACHE_KEY) != self._version:
+                    self.rebuild()
+
+    def add(self, slot_id, teacher_id, start, end):
+        """Insert or move a single slot"""
+        with self._lock:
+            self._remove(slot_id)
+            insort(self._by_teacher.setdefault(teacher_id, []), (start, end, slot_id))
+            self._slots[slot_id] = (teacher_id, start, end)
+
+    def discard(self, slot_id):
+        """Remove a slot if it is present"""
+        with self._lock:
+            self._remove(slot_id)
+
+    def _remove(self, slot_id):
+        entry = self._slots.pop(slot_id, None)
+        if entry is None:
+            return
+        teacher_id, start, end = entry
+        keys = self._by_teacher[teacher_id]
+        i = bisect_left(keys, (start, end, slot_id))
+        if i < len(keys) and keys[i][2] == slot_id:
+            del keys[i]
+        if not keys:
+            del self._by_teacher[teacher_id]
+
+    def search(self, start, end, min_duration=0, teacher_ids=None, limit_per_teacher=None):
+        """
+        Find slots that lie entirely within [start, end].
+
+        Args:
+            start, end: window bounds as timestamps
+            min_duration: minimum slot length in seconds
+            teacher_ids: restrict the search to these teachers (all if None)
+            limit_per_teacher: stop after this many matches per teacher
+
+        Returns:
+            dict: teacher_id -> list of (start, end, slot_id) in start order
+        """
+        results = {}
+        latest_start = end - min_duration
+        with self._lock:
+            if teacher_ids is None:
+                candidates = self._by_teacher.items()
+            else:
+                candidates = (
+                    (teacher_id, self._by_teacher[teacher_id])
+                    for teacher_id in teacher_ids
+                    if teacher_id in self._by_teacher
+                )
+
+            for teacher_id, keys in candidates:
+                matches = []
+                i = bisect_left(keys, (start,))
+                while i < len(keys) and keys[i][0] <= latest_start:
+                    slot_start, slot_end, slot_id = keys[i]
+                    if slot_end <= end and slot_end - slot_start >= min_duration:
+                        matches.append(keys[i])
+                        if limit_per_teacher and len(matches) >= limit_per_teacher:
+                            break
+                    i += 1
+                if matches:
+                    results[teacher_id] = matches
+        return results
+
+    def mark_changed(self):
+        """
+        Bump the shared version after a local incremental update.
+
+        The local copy stays current only if no other process changed slots
+        since it was loaded; otherwise it is rebuilt on the next query.
+        """
+        new_version = bump_version(VERSION_CACHE_KEY)
+
+        with self._lock:
+            previous = self._version or 0
+            if self._loaded and new_version == previous + 1:
+                self._version = new_version
+            else:
+                self._loaded = False
+
+
+availability_index = AvailabilityIndex()
+
+
+def slot_changed(slot):
+    """Apply a single TimeSlot change to the index"""
+    if availability_index.loaded:
+        if slot.is_available:
+            availability_index.add(
+                slot.pk, slot.teacher_id,
+                slot.start_time.timestamp(), slot.end_time.timestamp()
+            )
+        else:
+            availability_index.discard(slot.pk)
+    availability_index.mark_changed()
+    invalidate_teacher_calendar(slot.teacher_id)
+
+
+def slots_created(slots):
+    """Add slots inserted with bulk_create, which sends no signals"""
+    if availability_index.loaded:
+        for slot in slots:
+            if slot.is_available:
+                availability_index.add(
+                    slot.pk, slot.teacher_id,
+                    slot.start_time.timestamp(), slot.end_time.timestamp()
+                )
+    availability_index.mark_changed()
+    for teacher_id in {slot.teacher_id for slot in slots}:
+        invalidate_teacher_calendar(teacher_id)
+
+
+def slot_removed(slot_id, teacher_id):
+    """Remove a deleted or booked slot from the index"""
+    if availability_index.loaded:
+        availability_index.discard(slot_id)
+    availability_index.mark_changed()
+    invalidate_teacher_calendar(teacher_id)
+
+
+def search_available_slots(start, end, min_duration_minutes=None, category_id=None,
+                           teacher_ids=None, limit_per_teacher=None):
+    """
+    Search available slots of verified teachers within a time window.
+
+    Teacher eligibility (verification status, course category) is resolved
+    with a single query on the teacher tables; the slot lookup itself never
+    touches the database.
+
+    Returns:
+        dict: teacher_id -> list of slot ids in start order
+    """
+    from accounts.models import TeacherProfile
+
+    teachers = TeacherProfile.objects.filter(
+        verification_status=TeacherProfile.VerificationStatus.VERIFIED
+    )
+    if category_id:
+        teachers = teachers.filter(
+            courses__category_id=category_id,
+            courses__published=True
+        )
+    if teacher_ids:
+        teachers = teachers.filter(id__in=teacher_ids)
+    eligible = set(teachers.values_list('id', flat=True))
+
+    availability_index.ensure_loaded()
+    window_start = max(start, timezone.now())
+    min_duration = (min_duration_minutes or 0) * 60
+    matches = availability_index.search(
+        window_start.timestamp(),
+        end.timestamp(),
+        min_duration=min_duration,
+        teacher_ids=eligible,
+        limit_per_teacher=limit_per_teacher
+    )
+    return {
+        teacher_id: [slot_id for _, _, slot_id in keys]
+        for teacher_id, keys in matches.items()
+    }
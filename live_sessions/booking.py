@@ -0,0 +1,154 @@
+"""
+Booking service for live sessions.
+
+A slot is claimed with a single conditional ``UPDATE ... WHERE is_available``
+so concurrent bookings of the same slot have exactly one winner, whatever
+the database. No lock is held while the meeting provider is called: the
+meeting is provisioned only after the claim succeeded, and it is deleted
+again (and the slot released) if the session cannot be stored.
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.services.notifications import NotificationService
+from .availability import slot_changed, slot_removed
+from .models import LiveSession, TimeSlot
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_PLATFORMS = ('zoom', 'meet')
+
+
+class BookingError(Exception):
+    """Raised when a session request is invalid"""
+    pass
+
+
+class SlotUnavailable(BookingError):
+    """Raised when the time slot was already booked or has started"""
+    pass
+
+
+def claim_slot(time_slot):
+    """
+    Mark a slot as booked if it is still free.
+
+    Returns:
+        bool: True if this caller won the slot
+    """
+    claimed = TimeSlot.objects.filter(
+        pk=time_slot.pk,
+        is_available=True,
+        start_time__gt=timezone.now()
+    ).update(is_available=False)
+
+    if claimed:
+        time_slot.is_available = False
+        slot_id, teacher_id = time_slot.pk, time_slot.teacher_id
+        transaction.on_commit(lambda: slot_removed(slot_id, teacher_id))
+    return bool(claimed)
+
+
+def release_slot(time_slot):
+    """Make a previously claimed slot bookable again"""
+    TimeSlot.objects.filter(pk=time_slot.pk).update(is_available=True)
+    time_slot.is_available = True
+    transaction.on_commit(lambda: slot_changed(time_slot))
+
+
+def provision_meeting(course, time_slot, student, meeting_platform):
+    """
+    Create the online meeting for a session.
+
+    Returns:
+        dict: meeting details with id, join_url, password and start_url
+    """
+    if meeting_platform == 'zoom':
+        from core.services.zoom import ZoomMeetingService
+
+        duration = int((time_slot.end_time - time_slot.start_time).total_seconds() / 60)
+        return ZoomMeetingService().create_meeting(
+            topic=f"{course.title} - Session with {student.get_full_name()}",
+            start_time=time_slot.start_time,
+            duration_minutes=duration,
+            teacher_email=course.teacher.user.email
+        )
+
+    # TODO: Implement actual Google Meet API integration
+    # This is a placeholder implementation
+    return {
+        'id': 'abc-defg-hij',
+        'join_url': 'https://meet.google.com/abc-defg-hij',
+        'password': ''
+    }
+
+
+def cancel_meeting(meeting_platform, meeting_id):
+    """Delete a provisioned meeting, logging rather than raising on failure"""
+    if meeting_platform != 'zoom' or not meeting_id:
+        return
+    from core.services.zoom import ZoomMeetingService
+    try:
+        ZoomMeetingService().delete_meeting(meeting_id)
+    except Exception as e:
+        logger.error(f"Failed to roll back meeting {meeting_id}: {str(e)}")
+
+
+def _notify_scheduled(session):
+    try:
+        NotificationService.send_session_scheduled_notification(session)
+    except Exception as e:
+        logger.error(f"Session {session.pk} booked but notification failed: {str(e)}")
+
+
+def book_session(student, course, time_slot, meeting_platform='zoom', student_notes=''):
+    """
+    Book a time slot for a student.
+
+    Raises:
+        BookingError: if the slot does not belong to the course teacher or
+            the meeting platform is not supported
+        SlotUnavailable: if another booking claimed the slot first
+        ZoomAPIError: if the meeting could not be created (slot is released)
+
+    Returns:
+        LiveSession: the newly scheduled session
+    """
+    if time_slot.teacher_id != course.teacher_id:
+        raise BookingError("Time slot teacher must match course teacher")
+    if meeting_platform not in SUPPORTED_PLATFORMS:
+        raise BookingError(f"Meetings on {meeting_platform} are not supported")
+
+    if not claim_slot(time_slot):
+        raise SlotUnavailable("This time slot is not available")
+
+    try:
+        meeting_info = provision_meeting(course, time_slot, student, meeting_platform)
+    except Exception:
+        release_slot(time_slot)
+        raise
+
+    # The claim makes this caller the only writer of sessions for the slot,
+    # so no transaction is needed around the insert.
+    try:
+        session = LiveSession(
+            course=course,
+            time_slot=time_slot,
+            student=student,
+            meeting_platform=meeting_platform,
+            meeting_url=meeting_info.get('join_url', ''),
+            meeting_id=str(meeting_info.get('id', '')),
+            meeting_password=meeting_info.get('password', ''),
+            student_notes=student_notes
+        )
+        session.meeting_start_url = meeting_info.get('start_url', '')
+        session.save()
+    except Exception:
+        cancel_meeting(meeting_platform, meeting_info.get('id'))
+        release_slot(time_slot)
+        raise
+
+    transaction.on_commit(lambda: _notify_scheduled(session))
+    return session
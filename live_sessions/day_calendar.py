@@ -0,0 +1,131 @@
+"""
+Per-day availability bitmaps for teacher calendars.
+
+A day is split into 96 buckets of 15 minutes in the site time zone. Bucket
+i is set when an available slot covers it completely. Bitmaps are stored
+with bucket 0 as the most significant bit, so the 24-digit hex encoding
+reads left to right through the day, one hex digit per hour.
+
+Bitmaps are cached per teacher and day under a per-teacher generation
+number; any slot change for the teacher bumps the generation, which
+invalidates all of that teacher's cached days at once. A generation
+missing from the cache starts again at a random number (see
+core.cache_versions), so days cached under an old generation are never
+served again.
+"""
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.cache_versions import bump_version, get_version
+
+BUCKET_MINUTES = 15
+BUCKETS_PER_DAY = 24 * 60 // BUCKET_MINUTES
+BUCKET = timedelta(minutes=BUCKET_MINUTES)
+CACHE_TIMEOUT = 60 * 60 * 24
+FULL_DAY = (1 << BUCKETS_PER_DAY) - 1
+
+
+def _generation_key(teacher_id):
+    return f'live_sessions_calendar_gen:{teacher_id}'
+
+
+def _day_key(teacher_id, generation, day):
+    return f'live_sessions_calendar:{teacher_id}:{generation}:{day.isoformat()}'
+
+
+def calendar_generation(teacher_id):
+    """Counter that changes whenever any of the teacher's slots change"""
+    return get_version(_generation_key(teacher_id))
+
+
+def invalidate_teacher_calendar(teacher_id):
+    """Drop every cached day of a teacher's calendar"""
+    bump_version(_generation_key(teacher_id))
+
+
+def day_start(day):
+    """Aware datetime for midnight at the start of a date"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def bucket_mask(first, last):
+    """Bitmap with buckets first..last-1 set"""
+    first = max(first, 0)
+    last = min(last, BUCKETS_PER_DAY)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << (BUCKETS_PER_DAY - last)
+
+
+def day_bitmap(intervals, midnight):
+    """Bitmap of the buckets fully covered by any of the intervals"""
+    bitmap = 0
+    for start, end in intervals:
+        # Round the start up and the end down to whole buckets
+        first = -((midnight - start) // BUCKET)
+        last = (end - midnight) // BUCKET
+        bitmap |= bucket_mask(first, last)
+    return bitmap
+
+
+def encode(bitmap):
+    """Hex encoding, one digit per hour"""
+    return format(bitmap, f'0{BUCKETS_PER_DAY // 4}x')
+
+
+def get_day_bitmaps(teacher_id, first_day, days):
+    """
+    Availability bitmaps for consecutive days.
+
+    Cached days are served from the cache; all missing days are computed
+    from a single slot query covering their span.
+
+    Returns:
+        list of (date, bitmap) in date order
+    """
+    from .models import TimeSlot
+
+    dates = [first_day + timedelta(days=i) for i in range(days)]
+    generation = calendar_generation(teacher_id)
+    keys = {day: _day_key(teacher_id, generation, day) for day in dates}
+    cached = cache.get_many(keys.values())
+
+    bitmaps = {day: cached[keys[day]] for day in dates if keys[day] in cached}
+    missing = [day for day in dates if day not in bitmaps]
+    if missing:
+        span_start = day_start(missing[0])
+        span_end = day_start(missing[-1] + timedelta(days=1))
+        intervals = list(TimeSlot.objects.filter(
+            teacher_id=teacher_id,
+            is_available=True,
+            start_time__lt=span_end,
+            end_time__gt=span_start
+        ).values_list('start_time', 'end_time'))
+
+        computed = {}
+        for day in missing:
+            midnight = day_start(day)
+            next_midnight = day_start(day + timedelta(days=1))
+            computed[day] = day_bitmap(
+                [(s, e) for s, e in intervals if s < next_midnight and e > midnight],
+                midnight
+            )
+        cache.set_many(
+            {keys[day]: bitmap for day, bitmap in computed.items()},
+            timeout=CACHE_TIMEOUT
+        )
+        bitmaps.update(computed)
+
+    return [(day, bitmaps[day]) for day in dates]
+
+
+def mask_past(day, bitmap, now=None):
+    """Clear the buckets of a day that have already started"""
+    now = now or timezone.now()
+    midnight = day_start(day)
+    if now <= midnight:
+        return bitmap
+    started = -((midnight - now) // BUCKET)
+    return bitmap & bucket_mask(started, BUCKETS_PER_DAY)
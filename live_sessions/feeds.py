@@ -0,0 +1,148 @@
+"""
+Subscribable iCalendar feeds of a user's live session schedule.
+
+Feeds are addressed by the user's secret CalendarFeedToken so calendar
+apps can poll them without logging in. The body is streamed from iterator
+querysets; the ETag is computed with one aggregate query, so the frequent
+polls of unchanged calendars are answered with a 304 without rendering
+anything. There is no Last-Modified: open slots and sessions leaving the
+feed window change the body without moving any timestamp.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.db.models import Count, Max
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.views.decorators.http import condition, require_GET
+
+from .day_calendar import calendar_generation
+from .ical import calendar_lines, event_lines
+from .models import CalendarFeedToken, LiveSession, TimeSlot
+
+# Sessions that ended longer ago than this are left out of the feeds
+FEED_HISTORY = timedelta(days=30)
+
+
+def _feed_state(request, token, role):
+    """Resolve the feed owner and its validators once per request"""
+    state = getattr(request, '_calendar_feed_state', None)
+    if state is not None:
+        return state
+
+    feed = get_object_or_404(
+        CalendarFeedToken.objects.select_related('user__teacher_profile'),
+        token=token
+    )
+    user = feed.user
+    teacher = getattr(user, 'teacher_profile', None)
+    if role == 'teacher' and teacher is None:
+        raise Http404("No teacher schedule for this feed")
+
+    sessions = LiveSession.objects.filter(
+        time_slot__end_time__gte=timezone.now() - FEED_HISTORY
+    )
+    if role == 'teacher':
+        sessions = sessions.filter(course__teacher=teacher)
+    else:
+        sessions = sessions.filter(student=user)
+
+    summary = sessions.aggregate(last_modified=Max('updated_at'), count=Count('id'))
+    parts = [role, str(summary['count']), str(summary['last_modified'])]
+    if role == 'teacher':
+        # Open slots carry no timestamp; their changes bump the generation
+        parts.append(str(calendar_generation(teacher.id)))
+
+    state = {
+        'user': user,
+        'teacher': teacher,
+        'sessions': sessions,
+        'etag': hashlib.md5(':'.join(parts).encode()).hexdigest(),
+    }
+    request._calendar_feed_state = state
+    return state
+
+
+def _feed_etag(request, token, role):
+    return _feed_state(request, token, role)['etag']
+
+
+def _session_events(sessions, role, host):
+    sessions = sessions.select_related(
+        'course__teacher__user', 'time_slot', 'student'
+    ).order_by('time_slot__start_time')
+
+    for session in sessions.iterator(chunk_size=500):
+        if role == 'teacher':
+            other = session.student.get_full_name() or session.student.username
+        else:
+            teacher_user = session.course.teacher.user
+            other = teacher_user.get_full_name() or teacher_user.username
+
+        description = session.get_status_display()
+        if session.meeting_url:
+            description += f"\nJoin: {session.meeting_url}"
+
+        yield event_lines(
+            uid=f'session-{session.pk}@{host}',
+            start=session.time_slot.start_time,
+            end=session.time_slot.end_time,
+            summary=f"{session.course.title} with {other}",
+            stamp=session.updated_at,
+            description=description,
+            url=session.meeting_url,
+            status='CANCELLED' if session.status == 'cancelled' else 'CONFIRMED'
+        )
+
+
+def _open_slot_events(teacher, host, now):
+    slots = TimeSlot.objects.filter(
+        teacher=teacher,
+        is_available=True,
+        end_time__gt=now
+    ).order_by('start_time')
+
+    for slot in slots.iterator(chunk_size=500):
+        yield event_lines(
+            uid=f'slot-{slot.pk}@{host}',
+            start=slot.start_time,
+            end=slot.end_time,
+            summary="Open for booking",
+            stamp=now,
+            transparent=True
+        )
+
+
+def _encoded(lines):
+    for line in lines:
+        yield line.encode('utf-8')
+
+
+@require_GET
+@condition(etag_func=_feed_etag)
+def schedule_feed(request, token, role):
+    """
+    Stream a schedule as text/calendar.
+
+    role is 'student' (sessions the user booked) or 'teacher' (sessions of
+    the teacher's courses plus their open time slots).
+    """
+    state = _feed_state(request, token, role)
+    host = request.get_host().split(':')[0]
+    now = timezone.now()
+
+    def events():
+        yield from _session_events(state['sessions'], role, host)
+        if role == 'teacher':
+            yield from _open_slot_events(state['teacher'], host, now)
+
+    name = state['user'].get_full_name() or state['user'].username
+    title = "Teaching schedule" if role == 'teacher' else "Sessions"
+    response = StreamingHttpResponse(
+        _encoded(calendar_lines(f"{title} - {name}", events())),
+        content_type='text/calendar; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'inline; filename="{role}.ics"'
+    response['Cache-Control'] = 'private, no-cache'
+    return response
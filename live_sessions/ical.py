@@ -0,0 +1,88 @@
+"""
+Minimal iCalendar (RFC 5545) writer.
+
+Only what the schedule feeds need: VEVENT components with text, time and
+status properties. Output is produced line by line so a feed can be
+streamed without building the whole document in memory.
+"""
+from datetime import timezone as dt_timezone
+
+CRLF = '\r\n'
+MAX_LINE_OCTETS = 75
+
+
+def escape_text(value):
+    """Escape a TEXT property value"""
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+    )
+
+
+def format_datetime(value):
+    """UTC DATE-TIME value, e.g. 20240131T090000Z"""
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def fold(line):
+    """Fold a content line at 75 octets without splitting UTF-8 sequences"""
+    if len(line.encode('utf-8')) <= MAX_LINE_OCTETS:
+        return line + CRLF
+
+    parts = []
+    current = ''
+    size = 0
+    limit = MAX_LINE_OCTETS
+    for char in line:
+        char_size = len(char.encode('utf-8'))
+        if size + char_size > limit:
+            parts.append(current)
+            # Continuation lines start with a space, which counts
+            current, size, limit = char, char_size, MAX_LINE_OCTETS - 1
+        else:
+            current += char
+            size += char_size
+    parts.append(current)
+    return (CRLF + ' ').join(parts) + CRLF
+
+
+def event_lines(uid, start, end, summary, stamp, description='', url='',
+                status='CONFIRMED', transparent=False):
+    """Yield the folded lines of one VEVENT"""
+    yield fold('BEGIN:VEVENT')
+    yield fold(f'UID:{uid}')
+    yield fold(f'DTSTAMP:{format_datetime(stamp)}')
+    yield fold(f'DTSTART:{format_datetime(start)}')
+    yield fold(f'DTEND:{format_datetime(end)}')
+    yield fold(f'SUMMARY:{escape_text(summary)}')
+    if description:
+        yield fold(f'DESCRIPTION:{escape_text(description)}')
+    if url:
+        yield fold(f'URL:{url}')
+    yield fold(f'STATUS:{status}')
+    if transparent:
+        yield fold('TRANSP:TRANSPARENT')
+    yield fold('END:VEVENT')
+
+
+def calendar_lines(name, events):
+    """
+    Yield a complete VCALENDAR.
+
+    Args:
+        name: calendar display name
+        events: iterable of iterables of lines, as returned by event_lines
+    """
+    yield fold('BEGIN:VCALENDAR')
+    yield fold('VERSION:2.0')
+    yield fold('PRODID:-//TutoringApp//Schedule//EN')
+    yield fold('CALSCALE:GREGORIAN')
+    yield fold('METHOD:PUBLISH')
+    yield fold(f'X-WR-CALNAME:{escape_text(name)}')
+    for lines in events:
+        yield from lines
+    yield fold('END:VCALENDAR')
@@ -0,0 +1,77 @@
+"""
+Sweep-line helpers for time intervals.
+
+Intervals are (start, end) pairs of comparable values (datetimes or
+timestamps) and are treated as half-open, so back-to-back intervals where
+one ends exactly when the next starts do not overlap. Every helper sorts
+its input once and makes a single pass, i.e. O(n log n).
+"""
+
+
+def find_overlaps(new_intervals, existing_intervals=()):
+    """
+    Find overlaps involving at least one new interval.
+
+    Args:
+        new_intervals: list of (start, end)
+        existing_intervals: iterable of (start, end) already stored
+
+    Returns:
+        list of (new_index, (start, end), is_existing) tuples, one for each
+        new interval that overlaps an earlier-starting interval; the tuple
+        names the interval it collides with
+    """
+    events = [(start, end, False, i) for i, (start, end) in enumerate(new_intervals)]
+    events.extend((start, end, True, None) for start, end in existing_intervals)
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    conflicts = []
+    reach = None  # the interval with the furthest end seen so far
+    for event in events:
+        start, end, is_existing, index = event
+        if reach is not None and start < reach[1]:
+            if not is_existing:
+                conflicts.append((index, (reach[0], reach[1]), reach[2]))
+            elif not reach[2]:
+                conflicts.append((reach[3], (start, end), True))
+        if reach is None or end > reach[1]:
+            reach = event
+    return conflicts
+
+
+def merge_intervals(intervals):
+    """Union overlapping intervals into a sorted list of disjoint intervals"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start < merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(intervals, blocked):
+    """
+    Remove the blocked time from disjoint, sorted intervals.
+
+    Returns:
+        list of the remaining (start, end) pieces in start order
+    """
+    blocked = merge_intervals(blocked)
+    pieces = []
+    j = 0
+    for start, end in intervals:
+        # Skip blocks that end before this interval starts
+        while j < len(blocked) and blocked[j][1] <= start:
+            j += 1
+        k = j
+        cursor = start
+        while k < len(blocked) and blocked[k][0] < end:
+            if blocked[k][0] > cursor:
+                pieces.append((cursor, blocked[k][0]))
+            cursor = max(cursor, blocked[k][1])
+            k += 1
+        if cursor < end:
+            pieces.append((cursor, end))
+    return pieces
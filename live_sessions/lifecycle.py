@@ -0,0 +1,95 @@
+"""
+Time-based status transitions for live sessions.
+
+sweep_sessions moves booked sessions to 'ongoing' once their slot has
+started and to 'completed' once it has ended. Sessions are moved in
+batches of primary keys, each with one UPDATE that repeats the source
+statuses, so a session the teacher cancelled after it was read keeps its
+status. Only the session rows are locked, not the time slots they are
+joined to. session_status_changed is sent for every moved session once
+its batch commits. 'missed' needs attendance data the app does not
+record, so it is left to the teacher.
+"""
+import logging
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import LiveSession
+from .signals import session_status_changed
+
+logger = logging.getLogger(__name__)
+
+BOOKED_STATUSES = ('scheduled', 'confirmed')
+
+
+def _transitions(now):
+    """(source statuses, target status, extra filters) in the order applied"""
+    return [
+        # Completed first so a session that ended between two sweeps goes
+        # straight to completed instead of passing through ongoing
+        (BOOKED_STATUSES + ('ongoing',), 'completed', {'time_slot__end_time__lte': now}),
+        (BOOKED_STATUSES, 'ongoing', {
+            'time_slot__start_time__lte': now,
+            'time_slot__end_time__gt': now
+        }),
+    ]
+
+
+def emit_status_changes(changes, new_status):
+    """Send session_status_changed for each (session_id, old_status) pair"""
+    for session_id, old_status in changes:
+        try:
+            session_status_changed.send(
+                sender=LiveSession,
+                session_id=session_id,
+                old_status=old_status,
+                new_status=new_status
+            )
+        except Exception as e:
+            logger.error(f"Status change handler failed for session {session_id}: {str(e)}")
+
+
+def _apply(statuses, new_status, filters, now, batch_size):
+    """Apply one transition in batches; returns the number of rows moved"""
+    features = connection.features
+    lock_options = {
+        'skip_locked': features.has_select_for_update_skip_locked,
+        # Lock the session rows only, not the joined time slots
+        'of': ('self',) if features.has_select_for_update_of else (),
+    }
+    moved = 0
+    while True:
+        with transaction.atomic():
+            candidates = LiveSession.objects.filter(
+                status__in=statuses, **filters
+            ).order_by('pk').select_for_update(**lock_options)
+            changes = list(candidates.values_list('pk', 'status')[:batch_size])
+            if not changes:
+                return moved
+
+            updated = LiveSession.objects.filter(
+                pk__in=[pk for pk, _ in changes],
+                status__in=statuses
+            ).update(status=new_status, updated_at=now)
+            moved += updated
+            transaction.on_commit(
+                lambda changes=changes: emit_status_changes(changes, new_status)
+            )
+
+        if len(changes) < batch_size:
+            return moved
+
+
+def sweep_sessions(now=None, batch_size=500):
+    """
+    Bring session statuses in line with their time slots.
+
+    Returns:
+        dict: number of sessions moved to each target status
+    """
+    now = now or timezone.now()
+    counts = {}
+    for statuses, new_status, filters in _transitions(now):
+        counts[new_status] = _apply(statuses, new_status, filters, now, batch_size)
+    return counts
@@ -0,0 +1,90 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from live_sessions.availability import AvailabilityIndex
+
+
+class Command(BaseCommand):
+    help = 'Benchmark availability index window queries against a linear scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--slots', type=int, default=1_000_000)
+        parser.add_argument('--teachers', type=int, default=2000)
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument('--baseline-queries', type=int, default=10)
+        parser.add_argument('--window-hours', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        slots = options['slots']
+        teachers = options['teachers']
+        window = options['window_hours'] * 3600
+
+        # One-hour slots with random gaps, spread evenly across teachers
+        self.stdout.write(f'Generating {slots} slots for {teachers} teachers...')
+        rows = []
+        per_teacher = max(1, slots // teachers)
+        origin = 1_700_000_000
+        slot_id = 0
+        for teacher_id in range(1, teachers + 1):
+            start = origin
+            for _ in range(per_teacher):
+                start += rng.choice((1, 2, 3, 6)) * 1800
+                slot_id += 1
+                duration = rng.choice((1800, 3600, 5400))
+                rows.append((slot_id, teacher_id, start, start + duration))
+                start += duration
+        horizon = max(row[3] for row in rows)
+
+        index = AvailabilityIndex()
+        started = time.perf_counter()
+        index.load(rows)
+        build_time = time.perf_counter() - started
+        self.stdout.write(f'Index built with {len(index)} slots in {build_time:.2f}s')
+
+        # Candidate teacher sets mimic a category filter (a tenth of all teachers)
+        windows = []
+        for _ in range(options['queries']):
+            start = rng.randrange(origin, horizon - window)
+            candidates = set(rng.sample(range(1, teachers + 1), max(1, teachers // 10)))
+            windows.append((start, start + window, candidates))
+
+        timings = []
+        for start, end, candidates in windows:
+            t0 = time.perf_counter()
+            index.search(start, end, min_duration=3600, teacher_ids=candidates)
+            timings.append(time.perf_counter() - t0)
+
+        baseline = []
+        for start, end, candidates in windows[:options['baseline_queries']]:
+            t0 = time.perf_counter()
+            expected = {}
+            for row_id, teacher_id, slot_start, slot_end in rows:
+                if (teacher_id in candidates and slot_start >= start
+                        and slot_end <= end and slot_end - slot_start >= 3600):
+                    expected.setdefault(teacher_id, []).append(row_id)
+            baseline.append(time.perf_counter() - t0)
+
+            found = index.search(start, end, min_duration=3600, teacher_ids=candidates)
+            found = {t: [key[2] for key in keys] for t, keys in found.items()}
+            if found != expected:
+                self.stdout.write(self.style.ERROR('Index results differ from linear scan'))
+                return
+
+        self.report('Index search', timings)
+        if baseline:
+            self.report('Linear scan', baseline)
+            speedup = statistics.mean(baseline) / statistics.mean(timings)
+            self.stdout.write(self.style.SUCCESS(f'Speedup: {speedup:.0f}x'))
+
+    def report(self, label, timings):
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+        self.stdout.write(
+            f'{label}: {len(timings)} queries, '
+            f'mean {statistics.mean(timings) * 1000:.3f}ms, p95 {p95 * 1000:.3f}ms'
+        )
@@ -0,0 +1,15 @@
+from core.management.base import PeriodicCommand
+from live_sessions.lifecycle import sweep_sessions
+
+
+class Command(PeriodicCommand):
+    help = 'Move live sessions to ongoing/completed based on their time slots'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def run_once(self, **options):
+        counts = sweep_sessions(batch_size=options['batch_size'])
+        summary = ', '.join(f'{count} {status}' for status, count in counts.items())
+        self.stdout.write(f'Swept sessions: {summary}')
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.14 on 2026-10-19 03:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import live_sessions.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('live_sessions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarFeedToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(default=live_sessions.models.generate_feed_token, max_length=64, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_feed', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
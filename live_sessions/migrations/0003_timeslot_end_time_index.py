@@ -0,0 +1,17 @@
+# Generated by Django 4.2.14 on 2026-10-19 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('live_sessions', '0002_calendarfeedtoken'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['end_time'], name='live_sessio_end_tim_d76dbe_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.14 on 2026-10-19 04:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('live_sessions', '0003_timeslot_end_time_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='livesession',
+            name='time_slot',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sessions', to='live_sessions.timeslot'),
+        ),
+        migrations.AddConstraint(
+            model_name='livesession',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'cancelled'), _negated=True), fields=('time_slot',), name='one_active_session_per_slot'),
+        ),
+    ]
@@ -2,6 +2,8 @@
 Models for managing live tutoring sessions.
 Handles teacher availability and session scheduling.
 """
+import secrets
+
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
@@ -34,7 +36,8 @@ class TimeSlot(models.Model):
         ordering = ["start_time"]
         indexes = [
             models.Index(fields=['start_time', 'is_available']),
-            models.Index(fields=['teacher', 'is_available'])
+            models.Index(fields=['teacher', 'is_available']),
+            models.Index(fields=['end_time'])
         ]
 
     def __str__(self):
@@ -64,18 +67,15 @@ class LiveSession(models.Model):
         ('missed', 'Missed')
     ]
 
-    from core.services.zoom import ZoomMeetingService
-    from core.services.notifications import NotificationService
-
     course = models.ForeignKey(
         'courses.Course', 
         on_delete=models.CASCADE,
         related_name="live_sessions"
     )
-    time_slot = models.OneToOneField(
+    time_slot = models.ForeignKey(
         TimeSlot,
         on_delete=models.CASCADE,
-        related_name="session"
+        related_name="sessions"
     )
     student = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -116,43 +116,46 @@ class LiveSession(models.Model):
             models.Index(fields=['student', 'status']),
             models.Index(fields=['course', 'status'])
         ]
+        constraints = [
+            # Cancelled sessions stay on record when their slot is booked again
+            models.UniqueConstraint(
+                fields=['time_slot'],
+                condition=~models.Q(status='cancelled'),
+                name='one_active_session_per_slot'
+            )
+        ]
 
     def __str__(self):
         return f"{self.course.title} - {self.time_slot.start_time.strftime('%Y-%m-%d %H:%M')}"
 
     def clean(self):
-        if not self.time_slot.is_available:
-            raise ValidationError("This time slot is not available")
-        if self.time_slot.teacher != self.course.teacher:
+        # Slot availability is enforced atomically by live_sessions.booking
+        if self.time_slot.teacher_id != self.course.teacher_id:
             raise ValidationError("Time slot teacher must match course teacher")
 
     def save(self, *args, **kwargs):
         self.full_clean()
-        is_new = not self.pk
-        
-        if is_new:
-            # Create Zoom meeting
-            zoom_service = ZoomMeetingService()
-            duration = int((self.time_slot.end_time - self.time_slot.start_time).total_seconds() / 60)
-            meeting_info = zoom_service.create_meeting(
-                topic=f"{self.course.title} - Session with {self.student.get_full_name()}",
-                start_time=self.time_slot.start_time,
-                duration_minutes=duration,
-                teacher_email=self.course.teacher.user.email
-            )
-            
-            # Save meeting details
-            self.meeting_url = meeting_info['join_url']
-            self.meeting_id = meeting_info['id']
-            self.meeting_password = meeting_info['password']
-            self.meeting_start_url = meeting_info['start_url']
-            
-            # Mark the time slot as unavailable
-            self.time_slot.is_available = False
-            self.time_slot.save()
-        
         super().save(*args, **kwargs)
 
-        if is_new:
-            # Send notifications
-            NotificationService.send_session_scheduled_notification(self)
+
+def generate_feed_token():
+    return secrets.token_urlsafe(24)
+
+
+class CalendarFeedToken(models.Model):
+    """Secret token that lets calendar apps subscribe to a user's .ics feeds"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="calendar_feed"
+    )
+    token = models.CharField(max_length=64, unique=True, default=generate_feed_token)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Calendar feed for {self.user.username}"
+
+    def rotate(self):
+        """Replace the token, invalidating previously shared feed URLs"""
+        self.token = generate_feed_token()
+        self.save(update_fields=['token'])
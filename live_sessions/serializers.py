@@ -1,5 +1,12 @@
+from bisect import bisect_right
+
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
 from .models import TimeSlot, LiveSession
+from .availability import slots_created
+from .intervals import find_overlaps, merge_intervals, subtract_intervals
+from accounts.models import TeacherProfile
 from courses.course_serializers import CourseSerializer
 from accounts.serializers import UserSerializer
 
@@ -16,15 +23,191 @@ class TimeSlotSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         """
-        Check that start time is before end time and not in past
+        Check that start time is before end time and that the slot does not
+        overlap another slot of the same teacher
         """
+        start_time = data.get('start_time', getattr(self.instance, 'start_time', None))
+        end_time = data.get('end_time', getattr(self.instance, 'end_time', None))
+        if end_time <= start_time:
+            raise serializers.ValidationError(
+                "End time must be after start time"
+            )
+
+        request = self.context.get('request')
+        teacher = getattr(request.user, 'teacher_profile', None) if request else None
+        if teacher is not None:
+            overlapping = TimeSlot.objects.filter(
+                teacher=teacher,
+                start_time__lt=end_time,
+                end_time__gt=start_time
+            )
+            if self.instance is not None:
+                overlapping = overlapping.exclude(pk=self.instance.pk)
+            if overlapping.exists():
+                raise serializers.ValidationError(
+                    "This slot overlaps one of your existing slots"
+                )
+        return data
+
+
+class TimeSlotIntervalSerializer(serializers.Serializer):
+    """A single interval in a bulk slot creation request"""
+    start_time = serializers.DateTimeField()
+    end_time = serializers.DateTimeField()
+    recurring = serializers.BooleanField(default=False)
+    recurrence_pattern = serializers.ChoiceField(
+        choices=TimeSlot._meta.get_field('recurrence_pattern').choices,
+        required=False,
+        allow_null=True
+    )
+
+    def validate(self, data):
+        # Same rules as TimeSlot.clean, which bulk_create does not run
         if data['end_time'] <= data['start_time']:
+            raise serializers.ValidationError("End time must be after start time")
+        if data['start_time'] < timezone.now():
+            raise serializers.ValidationError("Cannot create slots in the past")
+        if data['recurring'] and not data.get('recurrence_pattern'):
+            raise serializers.ValidationError("Recurring slots must have a recurrence pattern")
+        return data
+
+
+class TimeSlotBulkCreateSerializer(serializers.Serializer):
+    """
+    Create many slots for the requesting teacher in one transaction.
+
+    New intervals are checked against each other and against the teacher's
+    stored slots with a single sweep. With on_overlap='reject' any overlap
+    fails the whole request; with 'merge' overlapping new intervals are
+    joined and the time already covered by stored slots is cut out.
+    """
+    MAX_SLOTS = 200
+
+    slots = TimeSlotIntervalSerializer(many=True)
+    on_overlap = serializers.ChoiceField(choices=['reject', 'merge'], default='reject')
+
+    def validate_slots(self, value):
+        if not value:
+            raise serializers.ValidationError("At least one slot is required")
+        if len(value) > self.MAX_SLOTS:
+            raise serializers.ValidationError(
+                f"Cannot create more than {self.MAX_SLOTS} slots at once"
+            )
+        return value
+
+    def create(self, validated_data):
+        teacher = self.context['request'].user.teacher_profile
+        slots = validated_data['slots']
+        intervals = [(slot['start_time'], slot['end_time']) for slot in slots]
+
+        with transaction.atomic():
+            # Serialize bulk creation per teacher (no-op on SQLite, which
+            # already serializes writers)
+            TeacherProfile.objects.select_for_update().filter(pk=teacher.pk).exists()
+
+            existing = list(TimeSlot.objects.filter(
+                teacher=teacher,
+                start_time__lt=max(end for _, end in intervals),
+                end_time__gt=min(start for start, _ in intervals)
+            ).values_list('start_time', 'end_time'))
+
+            if validated_data['on_overlap'] == 'reject':
+                conflicts = find_overlaps(intervals, existing)
+                if conflicts:
+                    raise serializers.ValidationError({'slots': [
+                        {
+                            'index': index,
+                            'start_time': intervals[index][0],
+                            'end_time': intervals[index][1],
+                            'conflicts_with': {
+                                'start_time': other[0],
+                                'end_time': other[1],
+                                'existing': is_existing
+                            }
+                        }
+                        for index, other, is_existing in sorted(conflicts, key=lambda c: c[0])
+                    ]})
+                pieces = slots
+            else:
+                pieces = self._merge(slots, existing)
+
+            created = TimeSlot.objects.bulk_create([
+                TimeSlot(
+                    teacher=teacher,
+                    start_time=piece['start_time'],
+                    end_time=piece['end_time'],
+                    recurring=piece['recurring'],
+                    recurrence_pattern=piece.get('recurrence_pattern') if piece['recurring'] else None
+                )
+                for piece in pieces
+            ])
+            transaction.on_commit(lambda: slots_created(created))
+
+        return created
+
+    def _merge(self, slots, existing):
+        """
+        Join overlapping intervals and drop time covered by stored slots.
+        Each resulting piece keeps the recurrence settings of the request
+        interval that covers its start.
+        """
+        intervals = [(slot['start_time'], slot['end_time']) for slot in slots]
+        free = subtract_intervals(merge_intervals(intervals), existing)
+
+        order = sorted(range(len(slots)), key=lambda i: intervals[i])
+        starts = [intervals[i][0] for i in order]
+        pieces = []
+        reach = None
+        scanned = 0
+        for start, end in free:
+            # Among the intervals starting at or before this piece, the one
+            # reaching furthest is the one that covers its start
+            upto = bisect_right(starts, start)
+            for i in order[scanned:upto]:
+                if reach is None or intervals[i][1] > intervals[reach][1]:
+                    reach = i
+            scanned = max(scanned, upto)
+            source = slots[reach]
+            pieces.append({
+                'start_time': start,
+                'end_time': end,
+                'recurring': source['recurring'],
+                'recurrence_pattern': source.get('recurrence_pattern')
+            })
+        return pieces
+
+
+class AvailabilitySearchSerializer(serializers.Serializer):
+    """Query parameters for searching availability across teachers"""
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    duration = serializers.IntegerField(
+        required=False, min_value=1,
+        help_text="Minimum slot length in minutes"
+    )
+    category = serializers.IntegerField(required=False, min_value=1)
+    limit = serializers.IntegerField(
+        required=False, min_value=1, max_value=50,
+        help_text="Maximum number of slots returned per teacher"
+    )
+
+    def validate(self, data):
+        if data['end'] <= data['start']:
             raise serializers.ValidationError(
                 "End time must be after start time"
             )
         return data
 
 
+class AvailabilityCalendarSerializer(serializers.Serializer):
+    """Query parameters for a teacher's per-day availability calendar"""
+    MAX_DAYS = 62
+
+    teacher = serializers.IntegerField(required=False, min_value=1)
+    start = serializers.DateField(required=False)
+    days = serializers.IntegerField(required=False, default=14, min_value=1, max_value=MAX_DAYS)
+
+
 class LiveSessionSerializer(serializers.ModelSerializer):
     course_details = CourseSerializer(source='course', read_only=True)
     student_details = UserSerializer(source='student', read_only=True)
@@ -38,26 +221,10 @@ class LiveSessionSerializer(serializers.ModelSerializer):
             'meeting_id', 'meeting_password', 'status', 'student_notes',
             'teacher_notes', 'created_at', 'updated_at'
         ]
+        # Slot, course and student are set by live_sessions.booking, which
+        # claims the slot atomically; they cannot be changed afterwards
         read_only_fields = [
+            'course', 'time_slot', 'student',
             'meeting_url', 'meeting_id', 'meeting_password',
             'created_at', 'updated_at'
         ]
-
-    def validate(self, data):
-        """
-        Check that the time slot is available and matches the course teacher
-        """
-        time_slot = data.get('time_slot')
-        course = data.get('course')
-
-        if not time_slot.is_available:
-            raise serializers.ValidationError(
-                "This time slot is not available"
-            )
-
-        if time_slot.teacher != course.teacher:
-            raise serializers.ValidationError(
-                "Time slot teacher must match course teacher"
-            )
-
-        return data
@@ -0,0 +1,25 @@
+"""
+Signal handlers for the live_sessions app.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver, Signal
+from .models import TimeSlot
+from .availability import slot_changed, slot_removed
+
+# Sent after a session's status changed, with session_id, old_status and
+# new_status; bulk transitions only send it once their transaction commits
+session_status_changed = Signal()
+
+
+@receiver(post_save, sender=TimeSlot)
+def update_availability_index(sender, instance, **kwargs):
+    """Keep the availability index in sync once the slot change is committed"""
+    transaction.on_commit(lambda: slot_changed(instance))
+
+
+@receiver(post_delete, sender=TimeSlot)
+def remove_from_availability_index(sender, instance, **kwargs):
+    """Drop deleted slots from the availability index"""
+    slot_id, teacher_id = instance.pk, instance.teacher_id
+    transaction.on_commit(lambda: slot_removed(slot_id, teacher_id))
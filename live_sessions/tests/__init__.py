@@ -0,0 +1,3 @@
+"""
+Test suite for live_sessions app.
+"""
@@ -0,0 +1,143 @@
+"""
+Tests for the cross-teacher availability index and search endpoint
+"""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import TeacherProfile
+from courses.models import Course, CourseCategory
+from live_sessions.availability import AvailabilityIndex, availability_index
+from live_sessions.models import TimeSlot
+
+User = get_user_model()
+
+
+class AvailabilityIndexTests(TestCase):
+    def setUp(self):
+        self.index = AvailabilityIndex()
+        self.index.load([
+            (1, 10, 1000, 4600),
+            (2, 10, 5000, 6800),
+            (3, 20, 1200, 4800),
+            (4, 20, 9000, 12600),
+        ])
+
+    def test_search_returns_slots_inside_window(self):
+        results = self.index.search(0, 7000)
+        self.assertEqual([key[2] for key in results[10]], [1, 2])
+        self.assertEqual([key[2] for key in results[20]], [3])
+
+    def test_search_applies_min_duration_and_teacher_filter(self):
+        results = self.index.search(0, 7000, min_duration=3600, teacher_ids={10})
+        self.assertEqual(list(results), [10])
+        self.assertEqual([key[2] for key in results[10]], [1])
+
+    def test_add_and_discard_are_incremental(self):
+        self.index.add(5, 10, 2000, 2600)
+        self.assertEqual([key[2] for key in self.index.search(0, 7000)[10]], [1, 5, 2])
+
+        # Moving a slot replaces its previous position
+        self.index.add(5, 20, 300, 900)
+        self.assertEqual([key[2] for key in self.index.search(0, 7000)[10]], [1, 2])
+        self.assertEqual([key[2] for key in self.index.search(0, 7000)[20]], [5, 3])
+
+        self.index.discard(5)
+        self.index.discard(4)
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.search(8000, 13000), {})
+
+
+class AvailabilitySearchAPITests(TestCase):
+    def setUp(self):
+        cache.clear()
+        availability_index.reset()
+
+        self.category = CourseCategory.objects.create(name='Conversation')
+        self.other_category = CourseCategory.objects.create(name='Grammar')
+
+        self.teacher_a = self.create_teacher('alice', self.category)
+        self.teacher_b = self.create_teacher('bruno', self.other_category)
+        self.unverified = self.create_teacher(
+            'claire', self.category,
+            status=TeacherProfile.VerificationStatus.PENDING
+        )
+
+        self.base = (timezone.now() + timedelta(days=2)).replace(
+            hour=18, minute=0, second=0, microsecond=0
+        )
+        self.slot_a = self.create_slot(self.teacher_a, 0, 60)
+        self.slot_a_short = self.create_slot(self.teacher_a, 90, 30)
+        self.slot_b = self.create_slot(self.teacher_b, 30, 60)
+        self.create_slot(self.unverified, 0, 60)
+
+        self.student = User.objects.create_user(username='student', password='student123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+
+    def create_teacher(self, username, category, status=TeacherProfile.VerificationStatus.VERIFIED):
+        user = User.objects.create_user(username=username, password='teacher123')
+        teacher = TeacherProfile.objects.create(user=user, verification_status=status)
+        Course.objects.create(
+            teacher=teacher, category=category, title=f'{username} course',
+            price=50, published=True
+        )
+        return teacher
+
+    def create_slot(self, teacher, offset_minutes, length_minutes):
+        start = self.base + timedelta(minutes=offset_minutes)
+        return TimeSlot.objects.create(
+            teacher=teacher, start_time=start,
+            end_time=start + timedelta(minutes=length_minutes)
+        )
+
+    def search(self, **params):
+        params.setdefault('start', self.base.isoformat())
+        params.setdefault('end', (self.base + timedelta(hours=4)).isoformat())
+        return self.client.get('/api/live/slots/search/', params)
+
+    def test_search_across_verified_teachers(self):
+        response = self.search()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result['teacher'] for result in response.data['results']],
+            [self.teacher_a.id, self.teacher_b.id]
+        )
+        self.assertEqual(
+            [slot['id'] for slot in response.data['results'][0]['slots']],
+            [self.slot_a.id, self.slot_a_short.id]
+        )
+
+    def test_search_filters_by_duration_and_category(self):
+        response = self.search(duration=60, category=self.category.id)
+        self.assertEqual(response.data['count'], 1)
+        result = response.data['results'][0]
+        self.assertEqual(result['teacher'], self.teacher_a.id)
+        self.assertEqual([slot['id'] for slot in result['slots']], [self.slot_a.id])
+
+    def test_index_follows_slot_changes(self):
+        self.search()
+        self.assertTrue(availability_index.loaded)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new_slot = self.create_slot(self.teacher_b, 150, 60)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slot_b.is_available = False
+            self.slot_b.save()
+
+        response = self.search(category=self.other_category.id)
+        self.assertEqual(
+            [slot['id'] for slot in response.data['results'][0]['slots']],
+            [new_slot.id]
+        )
+
+    def test_search_rejects_inverted_window(self):
+        response = self.search(
+            start=(self.base + timedelta(hours=2)).isoformat(),
+            end=self.base.isoformat()
+        )
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,197 @@
+"""
+Tests for atomic slot booking, including a concurrent stress test
+"""
+import threading
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import TeacherProfile
+from core.services.zoom import ZoomAPIError
+from courses.models import Course
+from live_sessions.availability import availability_index
+from live_sessions.booking import book_session, BookingError, SlotUnavailable
+from live_sessions.models import LiveSession, TimeSlot
+
+User = get_user_model()
+
+MEETING = {
+    'id': 123456,
+    'join_url': 'https://zoom.us/j/123456',
+    'password': 'secret',
+    'start_url': 'https://zoom.us/s/123456'
+}
+
+
+class BookingSetupMixin:
+    def create_fixtures(self, slot_count=1):
+        cache.clear()
+        availability_index.reset()
+
+        teacher_user = User.objects.create_user(
+            username='teacher', email='teacher@example.com', password='teacher123'
+        )
+        self.teacher = TeacherProfile.objects.create(user=teacher_user)
+        self.course = Course.objects.create(
+            teacher=self.teacher, title='Conversation', price=50, published=True
+        )
+        start = timezone.now() + timedelta(days=1)
+        self.slots = [
+            TimeSlot.objects.create(
+                teacher=self.teacher,
+                start_time=start + timedelta(hours=i),
+                end_time=start + timedelta(hours=i, minutes=45)
+            )
+            for i in range(slot_count)
+        ]
+        self.student = User.objects.create_user(username='student', password='student123')
+
+
+@patch('core.services.zoom.ZoomMeetingService.delete_meeting')
+@patch('core.services.zoom.ZoomMeetingService.create_meeting', return_value=MEETING)
+class BookSessionTests(BookingSetupMixin, TestCase):
+    def setUp(self):
+        self.create_fixtures()
+        self.slot = self.slots[0]
+
+    def test_booking_claims_slot_and_stores_meeting(self, mock_create, mock_delete):
+        session = book_session(self.student, self.course, self.slot)
+
+        self.slot.refresh_from_db()
+        self.assertFalse(self.slot.is_available)
+        self.assertEqual(session.meeting_id, '123456')
+        self.assertEqual(session.meeting_url, MEETING['join_url'])
+        mock_create.assert_called_once()
+
+    def test_second_booking_loses_without_provisioning(self, mock_create, mock_delete):
+        book_session(self.student, self.course, self.slot)
+        other = User.objects.create_user(username='other', password='other123')
+
+        with self.assertRaises(SlotUnavailable):
+            book_session(other, self.course, TimeSlot.objects.get(pk=self.slot.pk))
+        self.assertEqual(mock_create.call_count, 1)
+        self.assertEqual(LiveSession.objects.count(), 1)
+
+    def test_provisioning_failure_releases_slot(self, mock_create, mock_delete):
+        mock_create.side_effect = ZoomAPIError('Failed to create Zoom meeting')
+
+        with self.assertRaises(ZoomAPIError):
+            book_session(self.student, self.course, self.slot)
+        self.slot.refresh_from_db()
+        self.assertTrue(self.slot.is_available)
+        self.assertFalse(LiveSession.objects.exists())
+
+    def test_storage_failure_rolls_back_meeting(self, mock_create, mock_delete):
+        with patch.object(LiveSession, 'save', side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError):
+                book_session(self.student, self.course, self.slot)
+
+        mock_delete.assert_called_once_with(MEETING['id'])
+        self.slot.refresh_from_db()
+        self.assertTrue(self.slot.is_available)
+
+    def test_slot_must_belong_to_course_teacher(self, mock_create, mock_delete):
+        other_user = User.objects.create_user(username='teacher2', password='teacher123')
+        other_course = Course.objects.create(
+            teacher=TeacherProfile.objects.create(user=other_user), title='Grammar', price=30
+        )
+        with self.assertRaises(BookingError):
+            book_session(self.student, other_course, self.slot)
+        mock_create.assert_not_called()
+
+    def test_cancelled_session_is_kept_when_slot_is_rebooked(self, mock_create, mock_delete):
+        cancelled = book_session(self.student, self.course, self.slot)
+        client = APIClient()
+        client.force_authenticate(user=self.student)
+        self.assertEqual(client.post(f'/api/live/sessions/{cancelled.pk}/cancel/').status_code, 200)
+
+        other = User.objects.create_user(username='other', password='other123')
+        session = book_session(other, self.course, TimeSlot.objects.get(pk=self.slot.pk))
+
+        self.assertEqual(
+            set(self.slot.sessions.values_list('pk', 'status')),
+            {(cancelled.pk, 'cancelled'), (session.pk, 'scheduled')}
+        )
+
+    def test_unsupported_platform_is_refused_before_claiming(self, mock_create, mock_delete):
+        with self.assertRaises(BookingError):
+            book_session(self.student, self.course, self.slot, meeting_platform='teams')
+        self.slot.refresh_from_db()
+        self.assertTrue(self.slot.is_available)
+
+    def test_meet_bookings_keep_the_placeholder_meeting(self, mock_create, mock_delete):
+        session = book_session(self.student, self.course, self.slot, meeting_platform='meet')
+
+        self.assertEqual(session.meeting_url, 'https://meet.google.com/abc-defg-hij')
+        mock_create.assert_not_called()
+
+    def test_api_returns_conflict_for_taken_slot(self, mock_create, mock_delete):
+        client = APIClient()
+        client.force_authenticate(user=self.student)
+        data = {'course_id': self.course.id, 'time_slot_id': self.slot.id}
+
+        response = client.post('/api/live/sessions/', data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['time_slot'], self.slot.id)
+
+        response = client.post('/api/live/sessions/', data, format='json')
+        self.assertEqual(response.status_code, 409)
+
+
+@patch('core.services.zoom.ZoomMeetingService.delete_meeting')
+@patch('core.services.zoom.ZoomMeetingService.create_meeting', return_value=MEETING)
+class ConcurrentBookingTests(BookingSetupMixin, TransactionTestCase):
+    threads_per_slot = 8
+
+    def setUp(self):
+        self.create_fixtures(slot_count=5)
+        self.students = [
+            User.objects.create_user(username=f'student{i}', password='student123')
+            for i in range(self.threads_per_slot)
+        ]
+
+    def test_each_slot_is_booked_exactly_once(self, mock_create, mock_delete):
+        barrier = threading.Barrier(len(self.slots) * self.threads_per_slot)
+        outcomes = []
+        lock = threading.Lock()
+
+        def attempt(student, slot_id):
+            try:
+                slot = TimeSlot.objects.get(pk=slot_id)
+                barrier.wait()
+                try:
+                    book_session(student, self.course, slot)
+                    result = 'booked'
+                except SlotUnavailable:
+                    result = 'lost'
+                with lock:
+                    outcomes.append((slot_id, result))
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=attempt, args=(student, slot.pk))
+            for slot in self.slots
+            for student in self.students
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(outcomes), len(threads))
+        for slot in self.slots:
+            booked = [r for slot_id, r in outcomes if slot_id == slot.pk and r == 'booked']
+            self.assertEqual(len(booked), 1)
+            self.assertEqual(LiveSession.objects.filter(time_slot=slot).count(), 1)
+            self.assertFalse(TimeSlot.objects.get(pk=slot.pk).is_available)
+
+        # Losers never reach the meeting provider
+        self.assertEqual(mock_create.call_count, len(self.slots))
+        mock_delete.assert_not_called()
@@ -0,0 +1,120 @@
+"""
+Tests for bulk time slot creation and sweep-line overlap detection
+"""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, SimpleTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import TeacherProfile
+from live_sessions.availability import availability_index
+from live_sessions.intervals import find_overlaps, merge_intervals, subtract_intervals
+from live_sessions.models import TimeSlot
+
+User = get_user_model()
+
+
+class IntervalHelperTests(SimpleTestCase):
+    def test_back_to_back_intervals_do_not_overlap(self):
+        self.assertEqual(find_overlaps([(0, 10), (10, 20)], [(20, 30)]), [])
+
+    def test_overlaps_between_new_and_existing_intervals(self):
+        conflicts = find_overlaps([(0, 10), (5, 8), (40, 50)], [(45, 60), (70, 80)])
+        self.assertEqual(
+            sorted(conflicts),
+            [(1, (0, 10), False), (2, (45, 60), True)]
+        )
+
+    def test_existing_overlaps_are_ignored(self):
+        self.assertEqual(find_overlaps([(100, 110)], [(0, 10), (5, 20)]), [])
+
+    def test_merge_and_subtract(self):
+        merged = merge_intervals([(5, 15), (0, 10), (20, 30), (30, 40)])
+        self.assertEqual(merged, [(0, 15), (20, 30), (30, 40)])
+        self.assertEqual(
+            subtract_intervals(merged, [(2, 4), (12, 25), (35, 50)]),
+            [(0, 2), (4, 12), (25, 30), (30, 35)]
+        )
+
+
+class BulkSlotAPITests(TestCase):
+    def setUp(self):
+        cache.clear()
+        availability_index.reset()
+
+        user = User.objects.create_user(username='teacher', password='teacher123')
+        self.teacher = TeacherProfile.objects.create(user=user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+
+        self.base = (timezone.now() + timedelta(days=3)).replace(
+            hour=9, minute=0, second=0, microsecond=0
+        )
+        self.existing = TimeSlot.objects.create(
+            teacher=self.teacher,
+            start_time=self.at(120),
+            end_time=self.at(180)
+        )
+
+    def at(self, minutes):
+        return self.base + timedelta(minutes=minutes)
+
+    def interval(self, start, end, **extra):
+        return {'start_time': self.at(start).isoformat(), 'end_time': self.at(end).isoformat(), **extra}
+
+    def post(self, slots, **extra):
+        return self.client.post(
+            '/api/live/slots/bulk/', {'slots': slots, **extra}, format='json'
+        )
+
+    def test_creates_week_of_slots_in_one_request(self):
+        slots = [self.interval(day * 1440, day * 1440 + 60) for day in range(1, 8)]
+        slots.append(self.interval(60, 120, recurring=True, recurrence_pattern='weekly'))
+
+        with self.assertNumQueries(5):
+            response = self.post(slots)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['count'], 8)
+        self.assertEqual(TimeSlot.objects.filter(teacher=self.teacher).count(), 9)
+        self.assertTrue(TimeSlot.objects.get(start_time=self.at(60)).recurring)
+
+    def test_rejects_overlaps_atomically(self):
+        response = self.post([
+            self.interval(0, 60),
+            self.interval(30, 90),
+            self.interval(150, 200),
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([int(c['index']) for c in response.data['slots']], [1, 2])
+        self.assertEqual(response.data['slots'][1]['conflicts_with']['existing'], 'True')
+        self.assertEqual(TimeSlot.objects.count(), 1)
+
+    def test_merge_joins_new_intervals_around_existing_slots(self):
+        response = self.post([
+            self.interval(0, 60),
+            self.interval(30, 150),
+            self.interval(170, 240),
+        ], on_overlap='merge')
+        self.assertEqual(response.status_code, 201)
+
+        created = TimeSlot.objects.exclude(pk=self.existing.pk).order_by('start_time')
+        self.assertEqual(
+            [(slot.start_time, slot.end_time) for slot in created],
+            [(self.at(0), self.at(120)), (self.at(180), self.at(240))]
+        )
+
+    def test_single_create_checks_overlap(self):
+        response = self.client.post('/api/live/slots/', self.interval(150, 210), format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_past_slots_and_students(self):
+        response = self.post([self.interval(-5 * 1440, -5 * 1440 + 60)])
+        self.assertEqual(response.status_code, 400)
+
+        student = User.objects.create_user(username='student', password='student123')
+        self.client.force_authenticate(user=student)
+        self.assertEqual(self.post([self.interval(0, 60)]).status_code, 403)
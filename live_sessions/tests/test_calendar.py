@@ -0,0 +1,132 @@
+"""
+Tests for the per-day availability calendar bitmaps
+"""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, SimpleTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import TeacherProfile
+from live_sessions.availability import availability_index
+from live_sessions.day_calendar import (
+    BUCKETS_PER_DAY, FULL_DAY, _generation_key, bucket_mask, day_bitmap, day_start, encode,
+    invalidate_teacher_calendar, mask_past
+)
+from live_sessions.models import TimeSlot
+
+User = get_user_model()
+
+
+class DayBitmapTests(SimpleTestCase):
+    def setUp(self):
+        self.midnight = day_start(timezone.localdate() + timedelta(days=1))
+
+    def at(self, minutes):
+        return self.midnight + timedelta(minutes=minutes)
+
+    def test_only_fully_covered_buckets_are_set(self):
+        # 09:10-10:05 covers 09:15-10:00, i.e. buckets 37-39
+        bitmap = day_bitmap([(self.at(550), self.at(605))], self.midnight)
+        self.assertEqual(bitmap, bucket_mask(37, 40))
+        self.assertEqual(bitmap.bit_count(), 3)
+
+    def test_encoding_reads_chronologically(self):
+        bitmap = day_bitmap([(self.at(0), self.at(60))], self.midnight)
+        self.assertEqual(encode(bitmap), 'f' + '0' * 23)
+        self.assertEqual(encode(FULL_DAY), 'f' * (BUCKETS_PER_DAY // 4))
+
+    def test_slots_are_clipped_to_the_day(self):
+        bitmap = day_bitmap(
+            [(self.at(-120), self.at(30)), (self.at(23 * 60 + 30), self.at(26 * 60))],
+            self.midnight
+        )
+        self.assertEqual(bitmap, bucket_mask(0, 2) | bucket_mask(94, 96))
+
+    def test_mask_past(self):
+        day = timezone.localdate(self.midnight)
+        self.assertEqual(mask_past(day, FULL_DAY, now=self.at(-5)), FULL_DAY)
+        self.assertEqual(mask_past(day, FULL_DAY, now=self.at(61)), bucket_mask(5, 96))
+
+
+class CalendarAPITests(TestCase):
+    def setUp(self):
+        cache.clear()
+        availability_index.reset()
+
+        user = User.objects.create_user(username='teacher', password='teacher123')
+        self.teacher = TeacherProfile.objects.create(user=user)
+        self.student = User.objects.create_user(username='student', password='student123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+
+        self.day = timezone.localdate() + timedelta(days=2)
+        self.midnight = day_start(self.day)
+        self.slot = TimeSlot.objects.create(
+            teacher=self.teacher,
+            start_time=self.midnight + timedelta(hours=9),
+            end_time=self.midnight + timedelta(hours=10)
+        )
+
+    def get_calendar(self):
+        return self.client.get('/api/live/slots/calendar/', {
+            'teacher': self.teacher.id,
+            'start': self.day.isoformat(),
+            'days': 3
+        })
+
+    def test_calendar_days(self):
+        response = self.get_calendar()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['bucket_minutes'], 15)
+        days = response.data['days']
+        self.assertEqual([d['date'] for d in days], [
+            (self.day + timedelta(days=i)).isoformat() for i in range(3)
+        ])
+        self.assertEqual(days[0]['available'], '0' * 9 + 'f' + '0' * 14)
+        self.assertEqual(days[0]['free_minutes'], 60)
+        self.assertEqual(days[1]['free_minutes'], 0)
+
+    def test_cached_days_need_no_queries(self):
+        self.get_calendar()
+        with self.assertNumQueries(0):
+            response = self.get_calendar()
+        self.assertEqual(response.data['days'][0]['free_minutes'], 60)
+
+    def test_slot_changes_invalidate_the_cache(self):
+        self.get_calendar()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TimeSlot.objects.create(
+                teacher=self.teacher,
+                start_time=self.midnight + timedelta(days=1, hours=14),
+                end_time=self.midnight + timedelta(days=1, hours=14, minutes=30)
+            )
+        self.assertEqual(self.get_calendar().data['days'][1]['free_minutes'], 30)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slot.delete()
+        self.assertEqual(self.get_calendar().data['days'][0]['free_minutes'], 0)
+
+    def test_evicted_generation_does_not_revive_old_days(self):
+        invalidate_teacher_calendar(self.teacher.id)
+        self.get_calendar()
+        cache.delete(_generation_key(self.teacher.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slot.delete()
+        self.assertEqual(self.get_calendar().data['days'][0]['free_minutes'], 0)
+
+    def test_teacher_defaults_to_requesting_teacher(self):
+        self.client.force_authenticate(user=self.teacher.user)
+        response = self.client.get('/api/live/slots/calendar/', {'start': self.day.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['teacher'], self.teacher.id)
+        self.assertEqual(len(response.data['days']), 14)
+
+        self.client.force_authenticate(user=self.student)
+        response = self.client.get('/api/live/slots/calendar/')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,133 @@
+"""
+Tests for the iCalendar schedule feeds
+"""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, SimpleTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import TeacherProfile
+from courses.models import Course
+from live_sessions.availability import availability_index
+from live_sessions.ical import escape_text, fold
+from live_sessions.models import CalendarFeedToken, LiveSession, TimeSlot
+
+User = get_user_model()
+
+
+class ICalWriterTests(SimpleTestCase):
+    def test_escape_text(self):
+        self.assertEqual(escape_text('a,b;c\\d\ne'), 'a\\,b\\;c\\\\d\\ne')
+
+    def test_long_lines_are_folded(self):
+        folded = fold('SUMMARY:' + 'é' * 80)
+        lines = folded.split('\r\n')
+        self.assertEqual(lines[-1], '')
+        self.assertTrue(all(len(line.encode('utf-8')) <= 75 for line in lines))
+        self.assertTrue(lines[1].startswith(' '))
+        self.assertEqual(''.join(line[1:] if i else line for i, line in enumerate(lines)),
+                         'SUMMARY:' + 'é' * 80)
+
+
+class ScheduleFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        availability_index.reset()
+
+        teacher_user = User.objects.create_user(
+            username='teacher', first_name='Ada', last_name='Teacher', password='teacher123'
+        )
+        self.teacher = TeacherProfile.objects.create(user=teacher_user)
+        self.student = User.objects.create_user(username='student', password='student123')
+        course = Course.objects.create(
+            teacher=self.teacher, title='Conversation, level 2', price=50, published=True
+        )
+
+        start = timezone.now() + timedelta(days=1)
+        booked = TimeSlot.objects.create(
+            teacher=self.teacher, start_time=start, end_time=start + timedelta(hours=1),
+            is_available=False
+        )
+        TimeSlot.objects.create(
+            teacher=self.teacher,
+            start_time=start + timedelta(hours=2),
+            end_time=start + timedelta(hours=3)
+        )
+        self.session = LiveSession.objects.create(
+            course=course, time_slot=booked, student=self.student,
+            meeting_platform='meet', meeting_url='https://meet.google.com/abc'
+        )
+
+        self.student_feed = CalendarFeedToken.objects.create(user=self.student)
+        self.teacher_feed = CalendarFeedToken.objects.create(user=teacher_user)
+        self.client = APIClient()
+
+    def feed(self, feed, role, **headers):
+        return self.client.get(f'/api/live/feeds/{feed.token}/{role}.ics', **headers)
+
+    def body(self, response):
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_student_feed(self):
+        response = self.feed(self.student_feed, 'student')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = self.body(response)
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+        self.assertIn('SUMMARY:Conversation\\, level 2 with Ada Teacher', body)
+        self.assertIn(f'UID:session-{self.session.pk}@', body)
+
+    def test_teacher_feed_includes_open_slots(self):
+        body = self.body(self.feed(self.teacher_feed, 'teacher'))
+
+        self.assertEqual(body.count('BEGIN:VEVENT'), 2)
+        self.assertIn('SUMMARY:Open for booking', body)
+        self.assertIn('TRANSP:TRANSPARENT', body)
+
+    def test_unchanged_feed_returns_not_modified(self):
+        response = self.feed(self.student_feed, 'student')
+        etag = response['ETag']
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        response = self.feed(self.student_feed, 'student', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Without an ETag to compare, the feed is always sent
+        response = self.feed(
+            self.student_feed, 'student', HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT'
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.session.status = 'cancelled'
+        self.session.save()
+        response = self.feed(self.student_feed, 'student', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('STATUS:CANCELLED', self.body(response))
+
+    def test_slot_changes_change_the_teacher_etag(self):
+        etag = self.feed(self.teacher_feed, 'teacher')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TimeSlot.objects.filter(sessions__isnull=True).get().delete()
+        response = self.feed(self.teacher_feed, 'teacher', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response).count('BEGIN:VEVENT'), 1)
+
+    def test_invalid_token_and_role(self):
+        self.assertEqual(self.client.get('/api/live/feeds/nope/student.ics').status_code, 404)
+        self.assertEqual(self.feed(self.student_feed, 'teacher').status_code, 404)
+
+    def test_feed_urls_and_rotation(self):
+        self.client.force_authenticate(user=self.teacher.user)
+        urls = self.client.get('/api/live/calendar-feed/').data
+        self.assertTrue(urls['teacher'].endswith(f'/{self.teacher_feed.token}/teacher.ics'))
+
+        rotated = self.client.post('/api/live/calendar-feed/').data
+        self.assertNotEqual(rotated['student'], urls['student'])
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.feed(self.teacher_feed, 'teacher').status_code, 404)
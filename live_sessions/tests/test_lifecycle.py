@@ -0,0 +1,104 @@
+"""
+Tests for the session lifecycle sweeper
+"""
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import TeacherProfile
+from courses.models import Course
+from live_sessions.availability import availability_index
+from live_sessions.lifecycle import sweep_sessions
+from live_sessions.models import LiveSession, TimeSlot
+from live_sessions.signals import session_status_changed
+
+User = get_user_model()
+
+
+class SweepSessionsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        availability_index.reset()
+
+        teacher_user = User.objects.create_user(username='teacher', password='teacher123')
+        self.teacher = TeacherProfile.objects.create(user=teacher_user)
+        self.course = Course.objects.create(
+            teacher=self.teacher, title='Conversation', price=50, published=True
+        )
+        self.student = User.objects.create_user(username='student', password='student123')
+        self.now = timezone.now()
+
+        self.events = []
+        session_status_changed.connect(self.record, sender=LiveSession)
+        self.addCleanup(session_status_changed.disconnect, self.record, sender=LiveSession)
+
+    def record(self, sender, session_id, old_status, new_status, **kwargs):
+        self.events.append((session_id, old_status, new_status))
+
+    def make_session(self, start_offset, minutes=60, status='scheduled'):
+        """A session whose slot starts start_offset minutes from now"""
+        start = self.now + timedelta(days=1)
+        slot = TimeSlot.objects.create(
+            teacher=self.teacher, start_time=start,
+            end_time=start + timedelta(minutes=minutes), is_available=False
+        )
+        # Slots cannot be saved in the past, so move them afterwards
+        start = self.now + timedelta(minutes=start_offset)
+        TimeSlot.objects.filter(pk=slot.pk).update(
+            start_time=start, end_time=start + timedelta(minutes=minutes)
+        )
+        return LiveSession.objects.create(
+            course=self.course, time_slot=slot, student=self.student,
+            meeting_platform='meet', status=status
+        )
+
+    def test_transitions_follow_slot_times(self):
+        upcoming = self.make_session(30)
+        running = self.make_session(-10, status='confirmed')
+        ended = self.make_session(-120)
+        finishing = self.make_session(-90, status='ongoing')
+        cancelled = self.make_session(-120, status='cancelled')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            counts = sweep_sessions(now=self.now)
+
+        self.assertEqual(counts, {'completed': 2, 'ongoing': 1})
+        statuses = dict(LiveSession.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[upcoming.pk], 'scheduled')
+        self.assertEqual(statuses[running.pk], 'ongoing')
+        self.assertEqual(statuses[ended.pk], 'completed')
+        self.assertEqual(statuses[finishing.pk], 'completed')
+        self.assertEqual(statuses[cancelled.pk], 'cancelled')
+        self.assertCountEqual(self.events, [
+            (running.pk, 'confirmed', 'ongoing'),
+            (ended.pk, 'scheduled', 'completed'),
+            (finishing.pk, 'ongoing', 'completed'),
+        ])
+
+    def test_sweeping_again_changes_nothing(self):
+        for offset in (-300, -200, -100):
+            self.make_session(offset)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(sweep_sessions(now=self.now, batch_size=2)['completed'], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(sweep_sessions(now=self.now), {'completed': 0, 'ongoing': 0})
+        self.assertEqual(len(self.events), 3)
+
+    def test_updated_at_is_bumped(self):
+        session = self.make_session(-120)
+        sweep_sessions(now=self.now + timedelta(seconds=1))
+
+        session.refresh_from_db()
+        self.assertEqual(session.updated_at, self.now + timedelta(seconds=1))
+
+    def test_command(self):
+        self.make_session(-10)
+        out = StringIO()
+        call_command('sweep_sessions', stdout=out)
+        self.assertIn('1 ongoing', out.getvalue())
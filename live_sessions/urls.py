@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import views, feeds
 
 app_name = 'live_sessions'
 
@@ -9,5 +9,8 @@ router.register(r'slots', views.TimeSlotViewSet, basename='time-slot')
 router.register(r'sessions', views.LiveSessionViewSet, basename='live-session')
 
 urlpatterns = [
+    path('calendar-feed/', views.CalendarFeedView.as_view(), name='calendar-feed'),
+    path('feeds/<str:token>/student.ics', feeds.schedule_feed, {'role': 'student'}, name='student-feed'),
+    path('feeds/<str:token>/teacher.ics', feeds.schedule_feed, {'role': 'teacher'}, name='teacher-feed'),
     path('', include(router.urls)),
 ]
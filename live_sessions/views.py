@@ -1,11 +1,20 @@
 from rest_framework import viewsets, permissions, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.utils import timezone
 from django.conf import settings
+from django.urls import reverse
 from core.throttling import LiveSessionThrottle
-from .models import TimeSlot, LiveSession
-from .serializers import TimeSlotSerializer, LiveSessionSerializer
+from .models import TimeSlot, LiveSession, CalendarFeedToken
+from .serializers import (
+    TimeSlotSerializer, TimeSlotBulkCreateSerializer, LiveSessionSerializer,
+    AvailabilitySearchSerializer, AvailabilityCalendarSerializer
+)
+from .availability import search_available_slots
+from .day_calendar import BUCKET_MINUTES, encode, get_day_bitmaps, mask_past
+from .booking import book_session, BookingError, SlotUnavailable
+from .lifecycle import emit_status_changes
 import requests
 from datetime import timedelta
 import json
@@ -40,6 +49,25 @@ class TimeSlotViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(teacher=self.request.user.teacher_profile)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Create many availability slots at once.
+
+        Body: {"slots": [{"start_time", "end_time", "recurring",
+        "recurrence_pattern"}, ...], "on_overlap": "reject" | "merge"}
+        """
+        serializer = TimeSlotBulkCreateSerializer(
+            data=request.data, context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+        created = serializer.save()
+
+        return Response({
+            'count': len(created),
+            'slots': self.get_serializer(created, many=True).data
+        }, status=status.HTTP_201_CREATED)
+
     @action(detail=False, methods=['get'])
     def available(self, request):
         """
@@ -61,6 +89,95 @@ class TimeSlotViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Find verified teachers with free slots inside a time window.
+
+        Query params: start, end (ISO datetimes), duration (minutes),
+        category (course category id), limit (slots per teacher).
+        """
+        params = AvailabilitySearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+
+        matches = search_available_slots(
+            data['start'],
+            data['end'],
+            min_duration_minutes=data.get('duration'),
+            category_id=data.get('category'),
+            limit_per_teacher=data.get('limit')
+        )
+
+        slot_ids = [slot_id for ids in matches.values() for slot_id in ids]
+        slots = {
+            slot.id: slot
+            for slot in TimeSlot.objects.filter(
+                id__in=slot_ids, is_available=True
+            ).select_related('teacher__user')
+        }
+
+        # Teachers with the earliest free slot come first
+        grouped = []
+        for ids in matches.values():
+            teacher_slots = [slots[slot_id] for slot_id in ids if slot_id in slots]
+            if teacher_slots:
+                grouped.append(teacher_slots)
+        grouped.sort(key=lambda teacher_slots: teacher_slots[0].start_time)
+
+        results = []
+        for teacher_slots in grouped:
+            teacher = teacher_slots[0].teacher
+            results.append({
+                'teacher': teacher.id,
+                'teacher_name': teacher.user.get_full_name() or teacher.user.username,
+                'avg_rating': teacher.avg_rating,
+                'slots': self.get_serializer(teacher_slots, many=True).data
+            })
+
+        return Response({'count': len(results), 'results': results})
+
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """
+        Per-day availability of one teacher as 15-minute bucket bitmaps.
+
+        Query params: teacher (defaults to the requesting teacher),
+        start (date, defaults to today), days (1-62, default 14).
+        Each day's "available" value is 24 hex digits, one per hour, with
+        the most significant bit being the earliest quarter hour.
+        """
+        params = AvailabilityCalendarSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+
+        teacher_id = data.get('teacher')
+        if teacher_id is None:
+            teacher = getattr(request.user, 'teacher_profile', None)
+            if teacher is None:
+                return Response(
+                    {'detail': 'teacher is required'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            teacher_id = teacher.id
+
+        now = timezone.now()
+        first_day = data.get('start') or timezone.localdate(now)
+        days = []
+        for day, bitmap in get_day_bitmaps(teacher_id, first_day, data['days']):
+            bitmap = mask_past(day, bitmap, now)
+            days.append({
+                'date': day.isoformat(),
+                'available': encode(bitmap),
+                'free_minutes': bitmap.bit_count() * BUCKET_MINUTES
+            })
+
+        return Response({
+            'teacher': teacher_id,
+            'bucket_minutes': BUCKET_MINUTES,
+            'days': days
+        })
+
 
 class LiveSessionViewSet(viewsets.ModelViewSet):
     serializer_class = LiveSessionSerializer
@@ -81,84 +198,50 @@ class LiveSessionViewSet(viewsets.ModelViewSet):
         # Students see their booked sessions
         return queryset.filter(student=self.request.user)
 
-    def perform_create(self, serializer):
-        # Get the course and time slot from the request
+    def create(self, request, *args, **kwargs):
+        """
+        Book a time slot. The slot is claimed atomically, so concurrent
+        requests for the same slot get exactly one success and 409s.
+        """
         from courses.models import Course
-        from .models import TimeSlot
-        
-        course_id = self.request.data.get('course_id')
-        time_slot_id = self.request.data.get('time_slot_id')
-        
+        from core.services.zoom import ZoomAPIError
+
+        course_id = request.data.get('course_id') or request.data.get('course')
+        time_slot_id = request.data.get('time_slot_id') or request.data.get('time_slot')
+
         if not course_id or not time_slot_id:
             raise serializers.ValidationError({
                 'detail': 'Course ID and Time Slot ID are required'
             })
-            
+
         try:
-            course = Course.objects.get(pk=course_id)
+            course = Course.objects.select_related('teacher__user').get(pk=course_id)
             time_slot = TimeSlot.objects.get(pk=time_slot_id)
-        except (Course.DoesNotExist, TimeSlot.DoesNotExist):
+        except (Course.DoesNotExist, TimeSlot.DoesNotExist, ValueError):
             raise serializers.ValidationError({
                 'detail': 'Invalid Course or Time Slot'
             })
-            
-        # Create Zoom/Meet meeting
-        meeting_platform = self.request.data.get('meeting_platform', 'zoom')
-        meeting_info = self.create_meeting({
-            'course': course,
-            'time_slot': time_slot,
-            'meeting_platform': meeting_platform
-        })
-        
-        # Save session with meeting details
-        serializer.save(
-            student=self.request.user,
-            course=course,
-            time_slot=time_slot,
-            meeting_platform=meeting_platform,
-            meeting_url=meeting_info.get('join_url', ''),
-            meeting_id=meeting_info.get('id', ''),
-            meeting_password=meeting_info.get('password', ''),
-            student_notes=self.request.data.get('student_notes', '')
-        )
-
-    def create_meeting(self, data):
-        """
-        Create a Zoom/Meet meeting for the session
-        """
-        if data.get('meeting_platform') == 'zoom':
-            return self.create_zoom_meeting(data)
-        return self.create_meet_meeting(data)
 
-    def create_zoom_meeting(self, data):
-        """
-        Create a Zoom meeting using our ZoomMeetingService
-        """
-        from core.services.zoom import ZoomMeetingService
-        
-        time_slot = data['time_slot']
-        course = data['course']
-        duration = int((time_slot.end_time - time_slot.start_time).total_seconds() / 60)
-        
-        zoom = ZoomMeetingService()
-        return zoom.create_meeting(
-            topic=f"{course.title} - Session with {self.request.user.get_full_name()}",
-            start_time=time_slot.start_time,
-            duration_minutes=duration,
-            teacher_email=course.teacher.user.email
-        )
+        try:
+            session = book_session(
+                student=request.user,
+                course=course,
+                time_slot=time_slot,
+                meeting_platform=request.data.get('meeting_platform', 'zoom'),
+                student_notes=request.data.get('student_notes', '')
+            )
+        except SlotUnavailable as e:
+            return Response({'detail': str(e)}, status=status.HTTP_409_CONFLICT)
+        except BookingError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ZoomAPIError as e:
+            return Response(
+                {'detail': f'Could not create meeting: {str(e)}'},
+                status=status.HTTP_502_BAD_GATEWAY
+            )
 
-    def create_meet_meeting(self, data):
-        """
-        Create a Google Meet meeting using Google Calendar API
-        """
-        # TODO: Implement actual Google Meet API integration
-        # This is a placeholder implementation
-        return {
-            'id': 'abc-defg-hij',
-            'join_url': f'https://meet.google.com/abc-defg-hij',
-            'password': ''
-        }
+        serializer = self.get_serializer(session)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
@@ -180,14 +263,16 @@ class LiveSessionViewSet(viewsets.ModelViewSet):
                 zoom = ZoomMeetingService()
                 zoom.end_meeting(session.meeting_id)
 
+            # Update session status before the slot can be booked again
+            old_status = session.status
+            session.status = 'cancelled'
+            session.save()
+            emit_status_changes([(session.pk, old_status)], 'cancelled')
+
             # Make the time slot available again
             session.time_slot.is_available = True
             session.time_slot.save()
 
-            # Update session status
-            session.status = 'cancelled'
-            session.save()
-
             return Response({"status": "Session cancelled successfully"})
             
         except Exception as e:
@@ -219,6 +304,7 @@ class LiveSessionViewSet(viewsets.ModelViewSet):
             # Update session status
             session.status = 'completed'
             session.save()
+            emit_status_changes([(session.pk, 'ongoing')], 'completed')
 
             return Response({"status": "Session marked as completed"})
             
@@ -227,3 +313,35 @@ class LiveSessionViewSet(viewsets.ModelViewSet):
                 {"detail": f"Error completing session: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class CalendarFeedView(APIView):
+    """
+    Subscription URLs of the user's iCalendar feeds.
+
+    GET returns the URLs, creating the feed token on first use; POST
+    replaces the token so previously shared URLs stop working.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        feed, _ = CalendarFeedToken.objects.get_or_create(user=request.user)
+        return Response(self.feed_urls(request, feed))
+
+    def post(self, request):
+        feed, created = CalendarFeedToken.objects.get_or_create(user=request.user)
+        if not created:
+            feed.rotate()
+        return Response(self.feed_urls(request, feed))
+
+    def feed_urls(self, request, feed):
+        urls = {
+            'student': request.build_absolute_uri(
+                reverse('live_sessions:student-feed', args=[feed.token])
+            )
+        }
+        if hasattr(request.user, 'teacher_profile'):
+            urls['teacher'] = request.build_absolute_uri(
+                reverse('live_sessions:teacher-feed', args=[feed.token])
+            )
+        return urls
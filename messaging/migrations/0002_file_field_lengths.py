@@ -0,0 +1,18 @@
+# Generated by Django 4.2.14 on 2026-10-19 04:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='attachment',
+            field=models.FileField(blank=True, max_length=255, null=True, upload_to='message_attachments/'),
+        ),
+    ]
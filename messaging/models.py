@@ -67,6 +67,7 @@ class Message(models.Model):
     # Optional attachment
     attachment = models.FileField(
         upload_to='message_attachments/',
+        max_length=255,
         null=True,
         blank=True
     )
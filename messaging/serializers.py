@@ -2,6 +2,7 @@
 Serializers for the messaging app.
 """
 from rest_framework import serializers
+from core.signed_urls import signed_media_url
 from .models import Conversation, Message
 from django.contrib.auth import get_user_model
 
@@ -24,18 +25,25 @@ class MessageSerializer(serializers.ModelSerializer):
     """Serializer for individual messages"""
     sender_details = UserMessageSerializer(source='sender', read_only=True)
     is_read = serializers.SerializerMethodField()
+    attachment_url = serializers.SerializerMethodField()
     
     class Meta:
         model = Message
         fields = [
             'id', 'conversation', 'sender', 'sender_details', 
             'content', 'sent_at', 'read_at', 'is_read',
-            'attachment'
+            'attachment', 'attachment_url'
         ]
         read_only_fields = ['sent_at', 'read_at']
+        # Clients get the file through attachment_url only
+        extra_kwargs = {'attachment': {'write_only': True}}
     
     def get_is_read(self, obj):
         return obj.read_at is not None
+    
+    def get_attachment_url(self, obj):
+        """Signed, expiring URL of the attachment for the current user"""
+        return signed_media_url(self.context.get('request'), obj.attachment)
 
 
 class ConversationSerializer(serializers.ModelSerializer):
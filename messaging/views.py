@@ -8,6 +8,8 @@ from django.db.models import Q, Count, Max, OuterRef, Subquery
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
 
+from core.file_serving import serve_protected_file
+
 from .models import Conversation, Message
 from .serializers import (
     ConversationSerializer, 
@@ -21,7 +23,8 @@ class IsParticipantPermission(permissions.BasePermission):
     Custom permission to only allow participants of a conversation to view and modify it.
     """
     def has_object_permission(self, request, view, obj):
-        return request.user in obj.participants.all()
+        conversation = obj.conversation if isinstance(obj, Message) else obj
+        return conversation.participants.filter(pk=request.user.pk).exists()
 
 
 class ConversationViewSet(viewsets.ModelViewSet):
@@ -107,3 +110,8 @@ class MessageViewSet(viewsets.ModelViewSet):
             message.mark_as_read()
         serializer = self.get_serializer(message)
         return Response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def attachment(self, request, pk=None):
+        """Download the attachment of a message in one of the user's conversations"""
+        return serve_protected_file(request, self.get_object().attachment, as_attachment=True)
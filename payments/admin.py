@@ -1,3 +1,21 @@
 from django.contrib import admin
+from .models import Coupon, CouponUsageShard
 
-# Register your models here.
+
+class CouponUsageShardInline(admin.TabularInline):
+    model = CouponUsageShard
+    extra = 0
+    readonly_fields = ['shard', 'capacity', 'used']
+    can_delete = False
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Coupon)
+class CouponAdmin(admin.ModelAdmin):
+    list_display = ['code', 'discount_type', 'value', 'course', 'teacher', 'valid_until', 'max_uses', 'is_active']
+    list_filter = ['discount_type', 'is_active']
+    search_fields = ['code', 'description']
+    readonly_fields = ['created_at', 'updated_at']
+    inlines = [CouponUsageShardInline]
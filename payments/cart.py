@@ -0,0 +1,75 @@
+"""
+Server-side shopping carts.
+
+A cart only stores what was added; prices are looked up through
+payments.pricing whenever the cart is shown or checked out, so a cart
+never shows a stale price.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Cart, CartItem
+from .pricing import PricingError, create_order, price_lines, price_order
+
+
+def get_cart(user):
+    cart, _ = Cart.objects.get_or_create(user=user)
+    return cart
+
+
+def add_item(user, content_type, object_id, quantity=1):
+    """
+    Add content to a user's cart, or raise the quantity if it is there.
+
+    Raises:
+        PricingError: when the content cannot be sold
+    """
+    price_lines([(content_type, object_id, quantity)])
+    cart = get_cart(user)
+    item, created = CartItem.objects.get_or_create(
+        cart=cart,
+        content_type=content_type,
+        object_id=object_id,
+        defaults={'quantity': quantity}
+    )
+    if not created:
+        CartItem.objects.filter(pk=item.pk).update(quantity=F('quantity') + quantity)
+    Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now())
+    return cart
+
+
+def price_cart(cart):
+    """
+    Priced contents of a cart.
+
+    Content that was deleted or can no longer be bought is left out.
+
+    Returns:
+        PricedOrder
+    """
+    items = cart.items.select_related('content_type')
+    lines = price_lines(
+        ((item.content_type, item.object_id, item.quantity) for item in items),
+        strict=False
+    )
+    return price_order(lines, cart.coupon_code)
+
+
+def checkout_cart(user):
+    """
+    Turn a user's cart into a draft order and empty it.
+
+    Raises:
+        PricingError: when nothing in the cart can be bought
+    """
+    with transaction.atomic():
+        cart = Cart.objects.select_for_update().filter(user=user).first()
+        priced = price_cart(cart) if cart else None
+        if not priced or not priced.lines:
+            raise PricingError(["Your cart is empty"])
+        order = create_order(user, priced)
+        cart.items.all().delete()
+        cart.coupon_code = ''
+        cart.save(update_fields=['coupon_code', 'updated_at'])
+    return order
@@ -0,0 +1,316 @@
+"""
+Coupon lookup, discount calculation and usage counting.
+
+Active coupons are compiled into a dict of code -> CouponRule, a small
+immutable record of everything needed to price an order. The compiled
+index is stored in the cache under a version token, and each process keeps
+the last index it loaded; a lookup costs one cache read of the version
+token. Saving or deleting a Coupon replaces the token, so every process
+recompiles on its next lookup.
+
+Uses are counted on CouponUsageShard rows. A redemption increments a
+randomly chosen shard that still has capacity with a conditional UPDATE,
+so concurrent checkouts rarely touch the same row and max_uses is never
+exceeded. With a per-user cap, each redemption also takes one of the
+user's numbered uses (1 to max_uses_per_user), which a unique constraint
+hands to one checkout only. A checkout that is not paid (payment failed
+or cancelled) gives its use back with release_coupon.
+"""
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Optional
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Coupon, CouponRedemption, CouponUsageShard
+from .rollups import resolve_attribution
+
+USAGE_SHARDS = 8
+CACHE_TIMEOUT = 60 * 60 * 24
+VERSION_KEY = 'payments_coupons_version'
+CENT = Decimal('0.01')
+
+# Index loaded by this process, with the version it was loaded for
+_loaded = {'version': None, 'index': {}}
+
+
+class CouponError(Exception):
+    """A coupon cannot be used for an order"""
+
+
+@dataclass(frozen=True)
+class CouponRule:
+    id: int
+    code: str
+    discount_type: str
+    value: Decimal
+    course_id: Optional[int]
+    teacher_id: Optional[int]
+    valid_from: Optional[datetime]
+    valid_until: Optional[datetime]
+    max_uses_per_user: Optional[int]
+
+    def is_valid_at(self, now):
+        if self.valid_from and now < self.valid_from:
+            return False
+        return not (self.valid_until and now >= self.valid_until)
+
+    def applies_to(self, teacher_id, course_id):
+        if self.course_id is not None:
+            return course_id == self.course_id
+        if self.teacher_id is not None:
+            return teacher_id == self.teacher_id
+        return True
+
+
+def normalize_code(code):
+    return (code or '').strip().upper()
+
+
+def coupons_version():
+    """Token that changes whenever any coupon changes"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate_coupons():
+    """Make every process recompile the coupon index"""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def compile_index():
+    """Rules of all active, unexpired coupons, keyed by code"""
+    coupons = Coupon.objects.filter(is_active=True).filter(
+        Q(valid_until__isnull=True) | Q(valid_until__gt=timezone.now())
+    )
+    return {
+        coupon.code: CouponRule(
+            id=coupon.id,
+            code=coupon.code,
+            discount_type=coupon.discount_type,
+            value=coupon.value,
+            course_id=coupon.course_id,
+            teacher_id=coupon.teacher_id,
+            valid_from=coupon.valid_from,
+            valid_until=coupon.valid_until,
+            max_uses_per_user=coupon.max_uses_per_user
+        )
+        for coupon in coupons
+    }
+
+
+def get_index():
+    """The compiled coupon index, recompiled only when coupons change"""
+    version = coupons_version()
+    if _loaded['version'] == version:
+        return _loaded['index']
+
+    key = f'payments_coupons:{version}'
+    index = cache.get(key)
+    if index is None:
+        index = compile_index()
+        cache.set(key, index, CACHE_TIMEOUT)
+    _loaded.update(version=version, index=index)
+    return index
+
+
+def get_rule(code, now=None):
+    """
+    The rule for a code, if the coupon exists and is currently valid.
+
+    Raises:
+        CouponError: for unknown, inactive or expired codes
+    """
+    rule = get_index().get(normalize_code(code))
+    if rule is None or not rule.is_valid_at(now or timezone.now()):
+        raise CouponError("Invalid or expired coupon code")
+    return rule
+
+
+def calculate_discount(rule, items):
+    """
+    Discount a rule gives on order items.
+
+    Percentages apply to each eligible item; fixed amounts apply once per
+    order, up to the eligible subtotal.
+
+    Raises:
+        CouponError: when no item is eligible
+    """
+    items = list(items)
+    if rule.course_id is None and rule.teacher_id is None:
+        eligible = items
+    else:
+        attribution = resolve_attribution((item.content_type_id, item.object_id) for item in items)
+        eligible = [
+            item for item in items
+            if rule.applies_to(*attribution.get((item.content_type_id, item.object_id), (None, None)))
+        ]
+    if not eligible:
+        raise CouponError("Coupon does not apply to any item in this order")
+
+    eligible_total = sum((item.price * item.quantity for item in eligible), Decimal('0.00'))
+    if rule.discount_type == 'percentage':
+        discount = eligible_total * rule.value / 100
+    else:
+        discount = min(rule.value, eligible_total)
+    return discount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def sync_usage_shards(coupon):
+    """Create the coupon's usage shards and split max_uses between them"""
+    shards = {shard.shard: shard for shard in coupon.usage_shards.all()}
+    for index in range(USAGE_SHARDS):
+        if coupon.max_uses is None:
+            capacity = None
+        else:
+            capacity = coupon.max_uses // USAGE_SHARDS + (1 if index < coupon.max_uses % USAGE_SHARDS else 0)
+        shard = shards.get(index)
+        if shard is None:
+            CouponUsageShard.objects.create(coupon=coupon, shard=index, capacity=capacity)
+        elif shard.capacity != capacity:
+            shard.capacity = capacity
+            shard.save(update_fields=['capacity'])
+
+
+def _claim_shard(coupon_id):
+    """Count one use on a shard with capacity left; returns its index or None"""
+    has_capacity = Q(capacity__isnull=True) | Q(used__lt=F('capacity'))
+    shards = list(range(USAGE_SHARDS))
+    random.shuffle(shards)
+    for shard in shards:
+        if CouponUsageShard.objects.filter(
+            has_capacity, coupon_id=coupon_id, shard=shard
+        ).update(used=F('used') + 1):
+            return shard
+    return None
+
+
+def _give_back(coupon_id, shard):
+    CouponUsageShard.objects.filter(coupon_id=coupon_id, shard=shard).update(used=F('used') - 1)
+
+
+def _free_use_numbers(coupon_id, max_uses_per_user, user_id):
+    """Use numbers the user has left on a coupon ([None] without a per-user cap)"""
+    if max_uses_per_user is None:
+        return [None]
+    taken = set(CouponRedemption.objects.filter(
+        coupon_id=coupon_id, user_id=user_id
+    ).values_list('use_number', flat=True))
+    return [number for number in range(1, max_uses_per_user + 1) if number not in taken]
+
+
+def _create_redemption(coupon_id, order, shard, use_numbers):
+    """
+    Record a use counted on shard under the first use number still free.
+
+    The shard use is given back if the order was redeemed concurrently (the
+    existing redemption is returned) or no number is left (None).
+    """
+    for use_number in use_numbers:
+        try:
+            with transaction.atomic():
+                return CouponRedemption.objects.create(
+                    coupon_id=coupon_id,
+                    order_id=order.pk,
+                    user_id=order.user_id,
+                    shard=shard,
+                    use_number=use_number,
+                    discount_amount=order.discount_amount
+                )
+        except IntegrityError:
+            existing = CouponRedemption.objects.filter(order_id=order.pk).first()
+            if existing is not None:
+                _give_back(coupon_id, shard)
+                return existing
+            # Another checkout of this user took the number; try the next
+    _give_back(coupon_id, shard)
+    return None
+
+
+def redeem_coupon(order):
+    """
+    Count the use of an order's coupon.
+
+    Safe to call again for the same order. Call it in a short transaction
+    of its own, before contacting the payment provider, and call
+    release_coupon() if the order is then not paid.
+
+    Raises:
+        CouponError: when the coupon is no longer valid or its usage caps
+            are reached
+    """
+    if not order.coupon_code:
+        return None
+    if CouponRedemption.objects.filter(order=order).exists():
+        return order.coupon_redemption
+
+    rule = get_rule(order.coupon_code)
+    if order.discount_amount <= 0:
+        raise CouponError("Coupon does not apply to any item in this order")
+    use_numbers = _free_use_numbers(rule.id, rule.max_uses_per_user, order.user_id)
+    if not use_numbers:
+        raise CouponError("You have already used this coupon")
+
+    shard = _claim_shard(rule.id)
+    if shard is None:
+        raise CouponError("Coupon usage limit reached")
+    redemption = _create_redemption(rule.id, order, shard, use_numbers)
+    if redemption is None:
+        raise CouponError("You have already used this coupon")
+    return redemption
+
+
+def release_coupon(order):
+    """
+    Give back the coupon use of an order that will not be paid.
+
+    Returns:
+        bool: whether a use was given back (False when there was none)
+    """
+    if not order.coupon_code:
+        return False
+    with transaction.atomic():
+        redemption = CouponRedemption.objects.select_for_update().filter(order_id=order.pk).first()
+        if redemption is None:
+            return False
+        redemption.delete()
+        _give_back(redemption.coupon_id, redemption.shard)
+    return True
+
+
+def count_paid_use(order):
+    """
+    Count the coupon use of a paid order whose use was given back, e.g.
+    after a failed attempt the customer then retried successfully.
+
+    The payment has gone through, so validity and caps are not checked.
+    """
+    if not order.coupon_code or order.discount_amount <= 0:
+        return
+    if CouponRedemption.objects.filter(order_id=order.pk).exists():
+        return
+    coupon = Coupon.objects.filter(code=normalize_code(order.coupon_code)).values_list(
+        'pk', 'max_uses_per_user'
+    ).first()
+    if coupon is None:
+        return
+    coupon_id, max_uses_per_user = coupon
+
+    shard = _claim_shard(coupon_id)
+    if shard is None:
+        shard = random.randrange(USAGE_SHARDS)
+        CouponUsageShard.objects.filter(coupon_id=coupon_id, shard=shard).update(used=F('used') + 1)
+    use_numbers = _free_use_numbers(coupon_id, max_uses_per_user, order.user_id)
+    if None not in use_numbers:
+        use_numbers.append(None)
+    _create_redemption(coupon_id, order, shard, use_numbers)
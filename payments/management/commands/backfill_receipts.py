@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from payments.models import Order
+from payments.receipts import RECEIPT_STATUSES, generate_receipt
+
+
+class Command(BaseCommand):
+    help = 'Generate stored receipts for completed orders that do not have one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate existing receipts as well')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.filter(status__in=RECEIPT_STATUSES)
+        if not options['force']:
+            orders = orders.filter(receipt__isnull=True)
+        orders = orders.select_related('payment', 'user').prefetch_related('items')
+
+        generated = failed = 0
+        last_pk = 0
+        while True:
+            # Keyset pagination keeps each batch query cheap on large tables
+            batch = list(orders.filter(pk__gt=last_pk).order_by('pk')[:options['batch_size']])
+            if not batch:
+                break
+            for order in batch:
+                try:
+                    generate_receipt(order)
+                    generated += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'Order {order.pk}: {str(e)}')
+            last_pk = batch[-1].pk
+
+        self.stdout.write(f'Generated {generated} receipts ({failed} failed)')
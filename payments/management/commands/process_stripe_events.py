@@ -0,0 +1,14 @@
+from core.management.base import PeriodicCommand
+from payments.webhooks import process_pending_events
+
+
+class Command(PeriodicCommand):
+    help = 'Apply pending Stripe webhook events in order per payment'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--limit', type=int, default=100)
+
+    def run_once(self, **options):
+        processed = process_pending_events(limit=options['limit'])
+        self.stdout.write(f'Processed {processed} Stripe events')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from payments.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily sales rollups from completed and refunded orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First day to rebuild (YYYY-MM-DD); defaults to all days')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError(f"Invalid date: {options['since']}")
+
+        count = rebuild_rollups(since)
+        scope = f'since {since}' if since else 'for all days'
+        self.stdout.write(f'Rebuilt {count} rollup rows {scope}')
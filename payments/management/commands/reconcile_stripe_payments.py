@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from payments.reconciliation import reconcile_payments
+
+
+class Command(BaseCommand):
+    help = 'Settle open payments by comparing them with Stripe PaymentIntents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=48,
+                            help='Check payments created in the last N hours')
+        parser.add_argument('--since', help='Start of the window (ISO datetime), overrides --hours')
+        parser.add_argument('--until', help='End of the window (ISO datetime), defaults to now')
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def parse(self, value):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f'Invalid datetime: {value}')
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    def handle(self, *args, **options):
+        until = self.parse(options['until']) if options['until'] else timezone.now()
+        if options['since']:
+            since = self.parse(options['since'])
+        else:
+            since = until - timedelta(hours=options['hours'])
+
+        result = reconcile_payments(
+            since, until,
+            dry_run=options['dry_run'],
+            page_size=options['page_size']
+        )
+
+        transitions = ', '.join(
+            f'{count} {status}' for status, count in result['transitions'].items()
+        ) or 'none'
+        prefix = '[dry run] ' if options['dry_run'] else ''
+        self.stdout.write(
+            f"{prefix}Checked {result['checked']} open payments: "
+            f"transitions: {transitions}; missing in Stripe: {result['missing']}"
+        )
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from payments.models import StripeEvent
+from payments.webhooks import EVENT_HANDLERS, process_events_for_payment
+
+
+class Command(BaseCommand):
+    help = 'Re-run stored Stripe webhook events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='*', help='Stripe event ids (evt_...)')
+        parser.add_argument('--status', choices=['processed', 'failed'],
+                            help='Replay all events with this status')
+        parser.add_argument('--since', help='Only events created by Stripe after this ISO datetime')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        events = StripeEvent.objects.filter(event_type__in=EVENT_HANDLERS)
+        if options['event_ids']:
+            events = events.filter(event_id__in=options['event_ids'])
+        elif options['status']:
+            events = events.filter(status=options['status'])
+        else:
+            raise CommandError('Give event ids or --status')
+
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(f"Invalid datetime: {options['since']}")
+            events = events.filter(stripe_created__gte=since)
+
+        keys = sorted(set(events.values_list('payment_key', flat=True)))
+        count = events.count()
+        if options['dry_run']:
+            self.stdout.write(f'{count} events for {len(keys)} payments would be replayed')
+            return
+
+        # Handlers are idempotent, so processed events can safely run again
+        events.update(status='pending', attempts=0, last_error='')
+        processed = sum(process_events_for_payment(key) for key in keys)
+        self.stdout.write(f'Replayed {processed} of {count} events')
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.14 on 2026-10-19 03:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_remove_order_amount_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='provider_payment_id',
+            field=models.CharField(blank=True, db_index=True, help_text='Payment ID from provider', max_length=255),
+        ),
+        migrations.CreateModel(
+            name='StripeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=255, unique=True)),
+                ('event_type', models.CharField(max_length=100)),
+                ('payment_key', models.CharField(blank=True, help_text='Payment intent the event belongs to; events are processed in order per key', max_length=255)),
+                ('payload', models.JSONField(help_text='Raw event as sent by Stripe')),
+                ('stripe_created', models.DateTimeField(help_text='When Stripe created the event')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processed', 'Processed'), ('failed', 'Failed'), ('ignored', 'Ignored')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['stripe_created', 'id'],
+                'indexes': [models.Index(fields=['status', 'stripe_created'], name='payments_st_status_8c9464_idx'), models.Index(fields=['payment_key', 'status'], name='payments_st_payment_39bd36_idx')],
+            },
+        ),
+    ]
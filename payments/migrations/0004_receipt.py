@@ -0,0 +1,25 @@
+# Generated by Django 4.2.14 on 2026-10-19 03:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_stripeevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Receipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.JSONField(help_text='Receipt contents as returned by the API')),
+                ('file', models.FileField(upload_to='receipts/')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('generated_at', models.DateTimeField(auto_now=True)),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='receipt', to='payments.order')),
+            ],
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.14 on 2026-10-19 03:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('courses', '0006_merge_20250904_1555'),
+        ('payments', '0004_receipt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='refunded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('currency', models.CharField(max_length=3)),
+                ('gross', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('refunds', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('sales_count', models.PositiveIntegerField(default=0)),
+                ('refund_count', models.PositiveIntegerField(default=0)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_rollups', to='courses.course')),
+                ('teacher', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_rollups', to='accounts.teacherprofile')),
+            ],
+            options={
+                'ordering': ['day'],
+                'indexes': [models.Index(fields=['teacher', 'day'], name='payments_sa_teacher_df6aab_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='salesrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'teacher', 'course', 'content_type', 'currency'), name='unique_sales_rollup'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.14 on 2026-10-19 04:22
+
+from django.db import migrations, models
+
+
+def number_existing_uses(apps, schema_editor):
+    """Number each user's earlier uses of coupons with a per-user cap"""
+    CouponRedemption = apps.get_model('payments', 'CouponRedemption')
+    redemptions = CouponRedemption.objects.filter(
+        coupon__max_uses_per_user__isnull=False
+    ).order_by('coupon_id', 'user_id', 'created_at', 'pk')
+    numbered = []
+    previous, use_number = None, 0
+    for redemption in redemptions:
+        key = (redemption.coupon_id, redemption.user_id)
+        use_number = use_number + 1 if key == previous else 1
+        previous = key
+        redemption.use_number = use_number
+        numbered.append(redemption)
+    CouponRedemption.objects.bulk_update(numbered, ['use_number'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0007_cart'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='couponredemption',
+            name='use_number',
+            field=models.PositiveIntegerField(blank=True, help_text="Which of the user's allowed uses this is, for coupons with a per-user cap", null=True),
+        ),
+        migrations.RunPython(number_existing_uses, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='couponredemption',
+            constraint=models.UniqueConstraint(fields=('coupon', 'user', 'use_number'), name='unique_coupon_use_per_user'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.14 on 2026-10-19 04:25
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_refunded_amount(apps, schema_editor):
+    """Orders refunded so far were booked as refunded in full"""
+    Order = apps.get_model('payments', 'Order')
+    Order.objects.filter(status='refunded').update(refunded_amount=F('total_amount'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0008_coupon_use_number'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='refunded_amount',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Amount refunded so far, as reported by the payment provider', max_digits=10),
+        ),
+        migrations.RunPython(fill_refunded_amount, migrations.RunPython.noop),
+    ]
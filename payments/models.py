@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
@@ -68,6 +68,7 @@ class Payment(models.Model):
     provider_payment_id = models.CharField(
         max_length=255, 
         blank=True,
+        db_index=True,
         help_text="Payment ID from provider"
     )
     provider_reference = models.CharField(max_length=255, blank=True)
@@ -177,11 +178,18 @@ class Order(models.Model):
         default=0,
         help_text="Final order amount"
     )
+    refunded_amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        help_text="Amount refunded so far, as reported by the payment provider"
+    )
     
     # Timing
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    refunded_at = models.DateTimeField(null=True, blank=True)
     
     # Discount code
     coupon_code = models.CharField(max_length=50, blank=True)
@@ -207,10 +215,17 @@ class Order(models.Model):
     def calculate_totals(self):
         """Calculate order totals based on items"""
         items = self.items.all()
-        self.subtotal = sum(item.price for item in items)
+        self.subtotal = sum(item.subtotal for item in items)
         
         # Apply coupon if exists
-        # TODO: Implement coupon handling
+        self.discount_amount = Decimal('0.00')
+        if self.coupon_code:
+            from .coupons import CouponError, calculate_discount, get_rule
+            try:
+                self.discount_amount = calculate_discount(get_rule(self.coupon_code), items)
+            except CouponError:
+                # The code stays on the order; checkout rejects it
+                pass
         
         # Calculate tax (simplified for now)
         self.tax_amount = Decimal('0.00')
@@ -221,54 +236,146 @@ class Order(models.Model):
     
     def mark_as_completed(self):
         """
-        Mark order as completed and create enrollments
+        Mark order as completed and create enrollments.
+
+        Content objects are fetched once per content type and enrollments
+        are written with bulk_create, so the query count does not grow with
+        the number of items. Items that already have an enrollment, or whose
+        content the user is already actively enrolled in, are linked rather
+        than enrolled twice, which makes repeated calls safe.
         """
+        from django.db import transaction
         from django.utils import timezone
-        from enrollments.models import Enrollment, VideoEnrollment
         
-        if self.status != 'completed':
-            # Process each item in the order
-            for item in self.items.all():
-                # Determine content type
-                content_type = item.content_type
-                content_object = item.content_object
-                
-                # Create appropriate enrollment based on content type
-                if content_type.model == 'course':
-                    # Create course enrollment
-                    enrollment = Enrollment.objects.create(
-                        student=self.user,
-                        course=content_object,
-                        status='active',
-                        payment=self.payment
-                    )
-                    
-                elif content_type.model == 'video':
-                    # Create video enrollment
-                    enrollment = Enrollment.objects.create(
-                        student=self.user,
-                        content_type=content_type,
-                        object_id=content_object.id,
-                        status='active',
-                        payment=self.payment
-                    )
-                    
-                    # Create video-specific enrollment details
-                    VideoEnrollment.objects.create(
-                        enrollment=enrollment,
-                        video=content_object
-                    )
-                    
-                # Add more content types as needed
-                
-                # Save reference to enrollment in item
-                item.enrollment_id = enrollment.id
-                item.save(update_fields=['enrollment_id'])
+        with transaction.atomic():
+            # Serialize concurrent completions (webhook vs. client confirm)
+            locked = Order.objects.select_for_update().only('status').get(pk=self.pk)
+            if locked.status == 'completed':
+                self.status = locked.status
+                return
+            
+            items = list(
+                self.items.filter(enrollment_id__isnull=True)
+                .select_related('content_type')
+                .prefetch_related('content_object')
+            )
+            self._create_enrollments(items)
             
             # Update order status
             self.status = 'completed'
             self.completed_at = timezone.now()
             self.save()
+            
+            from .rollups import record_sale
+            record_sale(self)
+            
+            # A use given back after a failed attempt counts once paid
+            from .coupons import count_paid_use
+            count_paid_use(self)
+            
+            from .receipts import generate_receipt_safely
+            order_id = self.pk
+            transaction.on_commit(lambda: generate_receipt_safely(order_id))
+    
+    def _create_enrollments(self, items):
+        """
+        Enroll the order's user in the content of the given items.
+
+        Bundles are expanded into the courses and videos they contain,
+        nested bundles included, with one query; the user is also enrolled
+        in the bundle itself, which is what its order item links to. Content
+        the user is already actively enrolled in is skipped.
+        """
+        from courses.models import Video
+        from enrollments.bundles import expand_bundles
+        from enrollments.content_models import ContentBundle
+        from enrollments.entitlements import invalidate_entitlements
+        from enrollments.models import Enrollment, VideoEnrollment
+        
+        course_type = ContentType.objects.get_for_model(Course)
+        video_type = ContentType.objects.get_for_model(Video)
+        bundle_type = ContentType.objects.get_for_model(ContentBundle)
+        # Only these content types grant access; add more as needed
+        granting = {course_type.id: Course, video_type.id: Video}
+        
+        items = [
+            item for item in items
+            if (item.content_type_id in granting or item.content_type_id == bundle_type.id)
+            and item.content_object is not None
+        ]
+        if not items:
+            return
+        
+        # Content to enroll in -> id of the bundle it was bought with
+        wanted = {}
+        for item in items:
+            is_bundle = item.content_type_id == bundle_type.id
+            wanted[(item.content_type_id, item.object_id)] = item.object_id if is_bundle else None
+        bought_bundles = [object_id for (type_id, object_id) in wanted if type_id == bundle_type.id]
+        for bundle_id, contents in expand_bundles(bought_bundles).items():
+            for key in contents:
+                if key[0] in granting:
+                    wanted.setdefault(key, bundle_id)
+        
+        existing = {}
+        for enrollment in Enrollment.objects.active().filter(
+            student=self.user,
+            content_type__in={key[0] for key in wanted},
+            object_id__in={key[1] for key in wanted}
+        ):
+            existing.setdefault((enrollment.content_type_id, enrollment.object_id), enrollment)
+        missing = set(wanted) - set(existing)
+        
+        # Bundles only hold ids, so drop bundled content deleted since
+        from_bundles = {key for key in missing if key[0] in granting and wanted[key] is not None}
+        found = set()
+        for type_id, model in granting.items():
+            object_ids = {object_id for (key_type, object_id) in from_bundles if key_type == type_id}
+            if object_ids:
+                found.update(
+                    (type_id, pk)
+                    for pk in model.objects.filter(pk__in=object_ids).values_list('pk', flat=True)
+                )
+        missing -= from_bundles - found
+        
+        new_enrollments = {
+            key: Enrollment(
+                student=self.user,
+                course_id=key[1] if key[0] == course_type.id else None,
+                content_type_id=key[0],
+                object_id=key[1],
+                bundle_id=wanted[key],
+                status='active',
+                payment=self.payment
+            )
+            for key in sorted(missing)
+        }
+        created = Enrollment.objects.bulk_create(new_enrollments.values())
+        # bulk_create sends no signals
+        invalidate_entitlements(self.user_id)
+        if any(enrollment.pk is None for enrollment in created):
+            # Backends that cannot return ids from bulk inserts
+            for enrollment in Enrollment.objects.filter(
+                student=self.user,
+                payment=self.payment,
+                object_id__in={key[1] for key in new_enrollments}
+            ):
+                key = (enrollment.content_type_id, enrollment.object_id)
+                if key in new_enrollments:
+                    new_enrollments[key] = enrollment
+        
+        # Create video-specific enrollment details
+        VideoEnrollment.objects.bulk_create([
+            VideoEnrollment(enrollment=enrollment, video_id=key[1])
+            for key, enrollment in new_enrollments.items()
+            if key[0] == video_type.id
+        ])
+        
+        # Save reference to enrollment in item
+        for item in items:
+            key = (item.content_type_id, item.object_id)
+            item.enrollment_id = (new_enrollments.get(key) or existing[key]).pk
+        OrderItem.objects.bulk_update(items, ['enrollment_id'])
 
 
 class OrderItem(models.Model):
@@ -324,3 +431,313 @@ class OrderItem(models.Model):
         if self.original_price:
             return (self.original_price - self.price) * self.quantity
         return Decimal('0.00')
+
+
+class StripeEvent(models.Model):
+    """
+    A webhook event received from Stripe, stored before processing.
+
+    The unique event_id makes redelivered events no-ops; a worker processes
+    pending events in order per payment (see payments.webhooks).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+        ('ignored', 'Ignored')
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    payment_key = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Payment intent the event belongs to; events are processed in order per key"
+    )
+    payload = models.JSONField(help_text="Raw event as sent by Stripe")
+    stripe_created = models.DateTimeField(help_text="When Stripe created the event")
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending'
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['stripe_created', 'id']
+        indexes = [
+            models.Index(fields=['status', 'stripe_created']),
+            models.Index(fields=['payment_key', 'status'])
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} ({self.event_id})"
+
+
+class Receipt(models.Model):
+    """
+    Receipt of a completed order, rendered once and stored.
+
+    Regenerated only when the order is refunded; content_hash identifies
+    the current document for caching (see payments.receipts).
+    """
+    order = models.OneToOneField(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='receipt'
+    )
+    data = models.JSONField(help_text="Receipt contents as returned by the API")
+    file = models.FileField(upload_to='receipts/')
+    content_hash = models.CharField(max_length=64)
+    generated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Receipt for order {self.order_id}"
+
+
+class SalesRollup(models.Model):
+    """
+    Daily sales totals per teacher, course, content type and currency.
+
+    Maintained incrementally when orders complete or are refunded and
+    rebuildable from orders with the rebuild_sales_rollups command (see
+    payments.rollups). Reports read only this table.
+    """
+    day = models.DateField()
+    teacher = models.ForeignKey(
+        'accounts.TeacherProfile',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='sales_rollups'
+    )
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='sales_rollups'
+    )
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    currency = models.CharField(max_length=3)
+    gross = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    refunds = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    sales_count = models.PositiveIntegerField(default=0)
+    refund_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['day']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'teacher', 'course', 'content_type', 'currency'],
+                name='unique_sales_rollup'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['teacher', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - {self.content_type.model} {self.course_id} - {self.gross} {self.currency}"
+
+    @property
+    def net(self):
+        return self.gross - self.refunds
+
+
+class Coupon(models.Model):
+    """
+    A discount code, optionally limited to one course or teacher.
+
+    Codes are looked up through a compiled in-memory index and uses are
+    counted on sharded counters (see payments.coupons).
+    """
+    DISCOUNT_TYPE_CHOICES = [
+        ('percentage', 'Percentage'),
+        ('fixed', 'Fixed Amount')
+    ]
+
+    code = models.CharField(max_length=50, unique=True)
+    description = models.CharField(max_length=255, blank=True)
+    discount_type = models.CharField(
+        max_length=20,
+        choices=DISCOUNT_TYPE_CHOICES,
+        default='percentage'
+    )
+    value = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        help_text="Percentage off, or amount off the eligible items"
+    )
+
+    # Scope; a coupon with neither applies to every item
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='coupons'
+    )
+    teacher = models.ForeignKey(
+        'accounts.TeacherProfile',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='coupons'
+    )
+
+    # Validity and usage caps
+    valid_from = models.DateTimeField(null=True, blank=True)
+    valid_until = models.DateTimeField(null=True, blank=True)
+    max_uses = models.PositiveIntegerField(null=True, blank=True, help_text="Leave empty for unlimited")
+    max_uses_per_user = models.PositiveIntegerField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.code
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        if self.course_id and self.teacher_id:
+            raise ValidationError("A coupon is limited to a course or a teacher, not both")
+        if self.discount_type == 'percentage' and not 0 < self.value <= 100:
+            raise ValidationError("Percentage must be between 0 and 100")
+
+    def save(self, *args, **kwargs):
+        from .coupons import invalidate_coupons, sync_usage_shards
+        self.code = self.code.strip().upper()
+        super().save(*args, **kwargs)
+        sync_usage_shards(self)
+        # Once committed, or another process could cache the old rows
+        # under the new version
+        transaction.on_commit(invalidate_coupons)
+
+    def delete(self, *args, **kwargs):
+        from .coupons import invalidate_coupons
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(invalidate_coupons)
+        return result
+
+    @property
+    def times_used(self):
+        return self.usage_shards.aggregate(total=models.Sum('used'))['total'] or 0
+
+
+class CouponUsageShard(models.Model):
+    """
+    One of a coupon's usage counters.
+
+    Uses are spread over several rows so that concurrent checkouts with a
+    popular code do not all wait on the same row lock. max_uses is divided
+    between the shards, so each shard enforces its part of the cap.
+    """
+    coupon = models.ForeignKey(
+        Coupon,
+        on_delete=models.CASCADE,
+        related_name='usage_shards'
+    )
+    shard = models.PositiveSmallIntegerField()
+    capacity = models.PositiveIntegerField(null=True, blank=True)
+    used = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['coupon', 'shard']
+        constraints = [
+            models.UniqueConstraint(fields=['coupon', 'shard'], name='unique_coupon_shard')
+        ]
+
+    def __str__(self):
+        return f"{self.coupon.code} shard {self.shard}: {self.used}/{self.capacity}"
+
+
+class CouponRedemption(models.Model):
+    """A coupon use, recorded when an order using it is checked out"""
+    coupon = models.ForeignKey(
+        Coupon,
+        on_delete=models.CASCADE,
+        related_name='redemptions'
+    )
+    order = models.OneToOneField(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='coupon_redemption'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='coupon_redemptions'
+    )
+    shard = models.PositiveSmallIntegerField()
+    use_number = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Which of the user's allowed uses this is, for coupons with a per-user cap"
+    )
+    discount_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['coupon', 'user']),
+        ]
+        constraints = [
+            # Two checkouts cannot take the same one of a user's uses
+            models.UniqueConstraint(
+                fields=['coupon', 'user', 'use_number'],
+                name='unique_coupon_use_per_user'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.coupon.code} on order {self.order_id}"
+
+
+class Cart(models.Model):
+    """A user's shopping cart, kept until it is checked out as an order"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='cart'
+    )
+    coupon_code = models.CharField(max_length=50, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Cart of {self.user.username}"
+
+
+class CartItem(models.Model):
+    """Content in a cart; priced when the cart is shown or checked out"""
+    cart = models.ForeignKey(
+        Cart,
+        on_delete=models.CASCADE,
+        related_name='items'
+    )
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+    quantity = models.PositiveIntegerField(default=1)
+    added_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['added_at', 'id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['cart', 'content_type', 'object_id'],
+                name='unique_cart_content'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.content_type.model} {self.object_id} in cart {self.cart_id}"
@@ -0,0 +1,198 @@
+"""
+Pricing of carts and order requests, and order creation from them.
+
+Requested items are resolved in bulk: content types by name in one query,
+then the content objects with one query per content type. Totals are
+computed in one pass over the priced lines, and an order is written as
+one INSERT for the order plus one bulk INSERT for its items.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Optional
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from .coupons import CouponError, calculate_discount, get_rule
+from .models import Order, OrderItem
+
+
+class PricingError(Exception):
+    """Some requested items cannot be sold"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(errors))
+
+
+@dataclass
+class PricedLine:
+    content_type: ContentType
+    object_id: int
+    content_object: Any
+    quantity: int
+    price: Decimal
+    original_price: Optional[Decimal]
+
+    @property
+    def content_type_id(self):
+        return self.content_type.id
+
+    @property
+    def subtotal(self):
+        return self.price * self.quantity
+
+    @property
+    def name(self):
+        # Bundles have a name rather than a title
+        return (
+            getattr(self.content_object, 'title', None)
+            or getattr(self.content_object, 'name', None)
+            or 'Untitled'
+        )
+
+    @property
+    def description(self):
+        return getattr(self.content_object, 'description', '')
+
+
+@dataclass
+class PricedOrder:
+    lines: list
+    subtotal: Decimal
+    discount_amount: Decimal
+    tax_amount: Decimal
+    total_amount: Decimal
+    coupon_code: str = ''
+
+
+def content_types_by_name(names):
+    """
+    ContentTypes for model names, in one query.
+
+    Raises:
+        PricingError: for unknown names
+    """
+    names = set(names)
+    content_types = {ct.model: ct for ct in ContentType.objects.filter(model__in=names)}
+    unknown = sorted(names - set(content_types))
+    if unknown:
+        raise PricingError([f"Content type '{name}' does not exist" for name in unknown])
+    return content_types
+
+
+def price_lines(requests, strict=True):
+    """
+    Resolve and price requested items.
+
+    Args:
+        requests: iterable of (ContentType, object_id, quantity); repeated
+            content is merged into one line
+        strict: raise for content that cannot be sold; when False it is
+            left out instead
+
+    Returns:
+        list of PricedLine, in request order
+
+    Raises:
+        PricingError: when content does not exist or has no price
+    """
+    quantities = {}
+    content_types = {}
+    for content_type, object_id, quantity in requests:
+        key = (content_type.id, object_id)
+        quantities[key] = quantities.get(key, 0) + quantity
+        content_types[content_type.id] = content_type
+
+    ids_by_type = defaultdict(set)
+    for content_type_id, object_id in quantities:
+        ids_by_type[content_type_id].add(object_id)
+    objects = {}
+    for content_type_id, object_ids in ids_by_type.items():
+        model = content_types[content_type_id].model_class()
+        for obj in model._default_manager.filter(pk__in=object_ids):
+            objects[(content_type_id, obj.pk)] = obj
+
+    lines, errors = [], []
+    for (content_type_id, object_id), quantity in quantities.items():
+        content_type = content_types[content_type_id]
+        obj = objects.get((content_type_id, object_id))
+        if obj is None:
+            errors.append(f"{content_type.model} with id {object_id} does not exist")
+        elif getattr(obj, 'price', None) is None:
+            errors.append(f"{content_type.model} with id {object_id} does not have a price attribute")
+        else:
+            lines.append(PricedLine(
+                content_type=content_type,
+                object_id=object_id,
+                content_object=obj,
+                quantity=quantity,
+                price=obj.price,
+                original_price=getattr(obj, 'original_price', None)
+            ))
+    if errors and strict:
+        raise PricingError(errors)
+    return lines
+
+
+def price_order(lines, coupon_code=''):
+    """
+    Totals for priced lines, with the coupon applied if it is valid.
+
+    A coupon that is unknown, expired or does not apply to the lines is
+    dropped rather than rejected.
+    """
+    subtotal = sum((line.subtotal for line in lines), Decimal('0.00'))
+    discount = Decimal('0.00')
+    if coupon_code and lines:
+        try:
+            rule = get_rule(coupon_code)
+            discount = calculate_discount(rule, lines)
+            coupon_code = rule.code
+        except CouponError:
+            coupon_code = ''
+    # Tax is simplified to zero for now, as in Order.calculate_totals
+    tax = Decimal('0.00')
+    return PricedOrder(
+        lines=lines,
+        subtotal=subtotal,
+        discount_amount=discount,
+        tax_amount=tax,
+        total_amount=subtotal - discount + tax,
+        coupon_code=coupon_code or ''
+    )
+
+
+def create_order(user, priced, **fields):
+    """
+    Write a draft order and its items.
+
+    Returns:
+        Order
+    """
+    with transaction.atomic():
+        order = Order.objects.create(
+            user=user,
+            status='draft',
+            subtotal=priced.subtotal,
+            discount_amount=priced.discount_amount,
+            tax_amount=priced.tax_amount,
+            total_amount=priced.total_amount,
+            coupon_code=priced.coupon_code,
+            **fields
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                content_type=line.content_type,
+                object_id=line.object_id,
+                name=line.name,
+                description=line.description,
+                price=line.price,
+                original_price=line.original_price,
+                quantity=line.quantity
+            )
+            for line in priced.lines
+        ])
+    return order
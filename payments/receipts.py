@@ -0,0 +1,117 @@
+"""
+Receipt generation for completed orders.
+
+A receipt is built once, when the order completes, and stored as a
+Receipt row (the JSON returned by the API) plus a rendered HTML document.
+The document's SHA-256 hash serves as its ETag and is part of the file
+name, so a given URL's content never changes and can be cached for a long
+time. Receipts are only rebuilt when the order is refunded.
+"""
+import hashlib
+import logging
+
+from django.core.files.base import ContentFile
+from django.template.loader import render_to_string
+
+from .models import Order, Receipt
+
+logger = logging.getLogger(__name__)
+
+RECEIPT_STATUSES = ('completed', 'refunded')
+
+
+def build_receipt_data(order):
+    """Receipt contents of an order as JSON-serializable data"""
+    item_details = []
+    for item in order.items.all():
+        item_details.append({
+            'name': item.name,
+            'description': item.description,
+            'quantity': item.quantity,
+            'price': str(item.price),
+            'subtotal': str(item.subtotal)
+        })
+
+    # Basic receipt data
+    receipt_data = {
+        'order_id': order.id,
+        'date': order.created_at.strftime('%Y-%m-%d'),
+        'completed_date': order.completed_at.strftime('%Y-%m-%d') if order.completed_at else None,
+        'items': item_details,
+        'subtotal': str(order.subtotal),
+        'discount': str(order.discount_amount),
+        'tax': str(order.tax_amount),
+        'total': str(order.total_amount),
+        'status': order.status
+    }
+
+    # Add payment details if available
+    if order.payment:
+        receipt_data['payment'] = {
+            'id': order.payment.id,
+            'method': order.payment.payment_method,
+            'provider': order.payment.provider,
+            'transaction_id': order.payment.transaction_id,
+            'receipt_url': order.payment.receipt_url
+        }
+    return receipt_data
+
+
+def render_receipt(order, data):
+    """Render the receipt document"""
+    payment = order.payment
+    return render_to_string('payments/receipt.html', {
+        'receipt': data,
+        'customer_name': order.user.get_full_name() or order.user.username,
+        'currency': payment.currency if payment else 'EUR',
+        'payment_method': payment.get_payment_method_display() if payment else '',
+    })
+
+
+def generate_receipt(order):
+    """
+    Build and store the receipt of an order, replacing any previous one.
+
+    Returns:
+        Receipt
+    """
+    data = build_receipt_data(order)
+    document = render_receipt(order, data).encode('utf-8')
+    content_hash = hashlib.sha256(document).hexdigest()
+
+    receipt = Receipt.objects.filter(order=order).first()
+    if receipt is not None and receipt.content_hash == content_hash:
+        return receipt
+
+    old_name = receipt.file.name if receipt is not None else None
+    if receipt is None:
+        receipt = Receipt(order=order)
+    receipt.data = data
+    receipt.content_hash = content_hash
+    receipt.file.save(
+        f'order_{order.id}_{content_hash[:16]}.html',
+        ContentFile(document),
+        save=False
+    )
+    receipt.save()
+
+    if old_name and old_name != receipt.file.name:
+        receipt.file.storage.delete(old_name)
+    return receipt
+
+
+def get_receipt(order):
+    """Stored receipt of an order, generating it for orders that predate receipts"""
+    try:
+        return order.receipt
+    except Receipt.DoesNotExist:
+        return generate_receipt(order)
+
+
+def generate_receipt_safely(order_id):
+    """Generate a receipt from a commit hook, logging rather than raising"""
+    try:
+        order = Order.objects.select_related('payment', 'user').get(pk=order_id)
+        generate_receipt(order)
+    except Exception as e:
+        logger.error(f"Failed to generate receipt for order {order_id}: {str(e)}")
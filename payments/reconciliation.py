@@ -0,0 +1,176 @@
+"""
+Reconciliation of local payments against Stripe.
+
+Instead of retrieving PaymentIntents one by one, the intents created in a
+time window are listed page by page, matched in memory to the open Payment
+rows of the same window by provider_payment_id, and the resulting status
+changes are written with one UPDATE per target status.
+"""
+import logging
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .coupons import release_coupon
+from .models import Order, Payment
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ('pending', 'processing')
+
+# Local payment status for each PaymentIntent status that settles it
+INTENT_STATUS_MAP = {
+    'succeeded': 'completed',
+    'canceled': 'cancelled',
+    'processing': 'processing',
+}
+
+# Intents are listed with this margin around the window to allow for
+# clock skew between payment and intent creation
+WINDOW_MARGIN = timedelta(hours=1)
+
+
+def list_payment_intents(since, until, page_size=100):
+    """Iterate over all PaymentIntents created in [since, until]"""
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    stripe.api_base = settings.STRIPE_API_BASE
+    intents = stripe.PaymentIntent.list(
+        created={'gte': int(since.timestamp()), 'lte': int(until.timestamp())},
+        limit=page_size
+    )
+    return intents.auto_paging_iter()
+
+
+def target_status(intent):
+    """Local status an intent maps to, or None if it does not settle the payment"""
+    if intent.status == 'requires_payment_method' and intent.get('last_payment_error'):
+        return 'failed'
+    return INTENT_STATUS_MAP.get(intent.status)
+
+
+def plan_transitions(payments, intents):
+    """
+    Match intents to open payments.
+
+    Args:
+        payments: dict of provider_payment_id -> Payment
+        intents: iterable of PaymentIntents
+
+    Returns:
+        tuple: (dict of new status -> list of (Payment, intent), set of
+        provider ids seen in Stripe)
+    """
+    transitions = {}
+    seen = set()
+    for intent in intents:
+        seen.add(intent.id)
+        payment = payments.get(intent.id)
+        if payment is None:
+            continue
+        new_status = target_status(intent)
+        if new_status and new_status != payment.status:
+            transitions.setdefault(new_status, []).append((payment, intent))
+    return transitions, seen
+
+
+def _receipt_url(intent):
+    charges = intent.get('charges')
+    if charges and charges.get('data'):
+        return charges['data'][0].get('receipt_url') or ''
+    return ''
+
+
+def apply_transitions(transitions):
+    """
+    Write planned transitions and complete or cancel the affected orders.
+
+    Payments are re-read under a lock first: one a webhook settled since
+    the plan was made keeps its status, and its order is left alone.
+    """
+    now = timezone.now()
+    counts = {}
+    changed = {}
+    with transaction.atomic():
+        for new_status, pairs in transitions.items():
+            still_open = list(
+                Payment.objects.filter(
+                    pk__in=[payment.pk for payment, _ in pairs], status__in=OPEN_STATUSES
+                ).select_for_update().values_list('pk', flat=True)
+            )
+            fields = {'status': new_status, 'updated_at': now}
+            if new_status == 'completed':
+                fields['completed_at'] = now
+            counts[new_status] = Payment.objects.filter(pk__in=still_open).update(**fields)
+            changed[new_status] = set(still_open)
+
+        completed = [
+            (payment, intent) for payment, intent in transitions.get('completed', [])
+            if payment.pk in changed['completed']
+        ]
+        receipt_urls = {
+            payment.pk: _receipt_url(intent)
+            for payment, intent in completed if _receipt_url(intent)
+        }
+        if receipt_urls:
+            updates = list(Payment.objects.filter(pk__in=receipt_urls))
+            for payment in updates:
+                payment.receipt_url = receipt_urls[payment.pk]
+            Payment.objects.bulk_update(updates, ['receipt_url'])
+
+        for order in Order.objects.filter(
+            payment_id__in=[payment.pk for payment, _ in completed]
+        ).exclude(status='completed').select_related('user', 'payment'):
+            order.mark_as_completed()
+
+        cancelled = changed.get('cancelled')
+        if cancelled:
+            Order.objects.filter(
+                payment_id__in=cancelled, status='pending_payment'
+            ).update(status='cancelled', updated_at=now)
+
+        unpaid = changed.get('cancelled', set()) | changed.get('failed', set())
+        for order in Order.objects.filter(payment_id__in=unpaid).exclude(coupon_code=''):
+            release_coupon(order)
+    return counts
+
+
+def reconcile_payments(since, until=None, dry_run=False, page_size=100):
+    """
+    Bring open payments created in a time window in line with Stripe.
+
+    Returns:
+        dict: 'checked' (open local payments), 'missing' (of those, not
+        found in Stripe), 'transitions' (new status -> count)
+    """
+    until = until or timezone.now()
+    payments = {
+        payment.provider_payment_id: payment
+        for payment in Payment.objects.filter(
+            provider='stripe',
+            status__in=OPEN_STATUSES,
+            created_at__gte=since,
+            created_at__lte=until
+        ).exclude(provider_payment_id='')
+    }
+
+    intents = list_payment_intents(
+        since - WINDOW_MARGIN, until + WINDOW_MARGIN, page_size=page_size
+    )
+    transitions, seen = plan_transitions(payments, intents)
+    if dry_run:
+        counts = {new_status: len(pairs) for new_status, pairs in transitions.items()}
+    else:
+        counts = apply_transitions(transitions)
+
+    missing = [key for key in payments if key not in seen]
+    if missing:
+        logger.error(f"{len(missing)} open payments not found in Stripe: {', '.join(missing[:20])}")
+
+    return {
+        'checked': len(payments),
+        'missing': len(missing),
+        'transitions': counts,
+    }
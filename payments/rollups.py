@@ -0,0 +1,326 @@
+"""
+Daily sales rollups per teacher, course, content type and currency.
+
+Order items point at their content through a generic foreign key, so
+attributing revenue to a course and teacher means resolving every item.
+This is done once, when an order completes or is refunded, and the result
+is added to the SalesRollup row of that day. Reports then read only
+SalesRollup. rebuild_rollups() recomputes the table from orders, e.g.
+after a bug fix or for orders completed before rollups existed.
+
+Gross amounts are what was paid for each item: its subtotal (price x
+quantity) less its share of the order discount, which is spread over the
+items in proportion to their subtotals. Refunds are spread the same way
+over what was paid, so a partial refund books only the refunded amount.
+Taxes are not allocated to items.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import ROUND_DOWN, Decimal
+from itertools import islice
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from courses.models import Course
+from .models import Order, SalesRollup
+
+DEFAULT_CURRENCY = 'EUR'
+CENT = Decimal('0.01')
+
+COUNTERS = ('gross', 'refunds', 'sales_count', 'refund_count')
+
+
+def _field_names(model):
+    return {field.name for field in model._meta.get_fields()}
+
+
+def resolve_attribution(pairs):
+    """
+    Course and teacher of purchased content.
+
+    Courses are attributed to themselves, content with a course (videos,
+    PDFs, ...) to its course, and content with a teacher but no course to
+    that teacher. One query per content type.
+
+    Args:
+        pairs: iterable of (content_type_id, object_id)
+
+    Returns:
+        dict: (content_type_id, object_id) -> (teacher_id, course_id)
+    """
+    ids_by_type = defaultdict(set)
+    for content_type_id, object_id in pairs:
+        ids_by_type[content_type_id].add(object_id)
+
+    attribution = {}
+    for content_type_id, object_ids in ids_by_type.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        if model is None:
+            continue
+        if model is Course:
+            rows = model.objects.filter(pk__in=object_ids).values_list('pk', 'teacher_id', 'pk')
+        elif 'course' in _field_names(model):
+            rows = model.objects.filter(pk__in=object_ids).values_list(
+                'pk', 'course__teacher_id', 'course_id'
+            )
+        elif 'teacher' in _field_names(model):
+            rows = [
+                (pk, teacher_id, None)
+                for pk, teacher_id in model.objects.filter(pk__in=object_ids).values_list('pk', 'teacher_id')
+            ]
+        else:
+            continue
+        for pk, teacher_id, course_id in rows:
+            attribution[(content_type_id, pk)] = (teacher_id, course_id)
+    return attribution
+
+
+def _order_currency(order):
+    return (order.payment.currency if order.payment_id else DEFAULT_CURRENCY).upper()
+
+
+def allocate(amount, weights):
+    """
+    Split an amount over weights in proportion to them.
+
+    Shares are rounded down to the cent and the remainder goes to the
+    largest weight, so the shares always add up to the amount.
+
+    Returns:
+        list of Decimal shares, one per weight
+    """
+    total = sum(weights)
+    if not total:
+        return [Decimal('0.00')] * len(weights)
+    shares = [(amount * weight / total).quantize(CENT, rounding=ROUND_DOWN) for weight in weights]
+    largest = max(range(len(weights)), key=weights.__getitem__)
+    shares[largest] += amount - sum(shares)
+    return shares
+
+
+def paid_amounts(order, items):
+    """What was paid for each item: its subtotal less its share of the discount"""
+    subtotals = [item.price * item.quantity for item in items]
+    discounts = allocate(order.discount_amount, subtotals)
+    return [subtotal - discount for subtotal, discount in zip(subtotals, discounts)]
+
+
+def _new_deltas():
+    return defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+
+
+def _add_items(deltas, attribution, items, amounts, amount_field, count_field=None):
+    """Add item amounts, and quantities unless count_field is None, per rollup key"""
+    for item, amount in zip(items, amounts):
+        teacher_id, course_id = attribution.get((item.content_type_id, item.object_id), (None, None))
+        delta = deltas[(teacher_id, course_id, item.content_type_id)]
+        delta[amount_field] += amount
+        if count_field:
+            delta[count_field] += item.quantity
+
+
+def _attribute(items):
+    return resolve_attribution((item.content_type_id, item.object_id) for item in items)
+
+
+def apply_deltas(day, currency, deltas):
+    """
+    Add counter deltas to the rollup rows of one day and currency.
+
+    Existing rows are locked and updated with one bulk_update, missing rows
+    inserted with one bulk_create. If a concurrent transaction inserted one
+    of the rows first, the deltas are applied row by row instead.
+
+    Args:
+        deltas: dict of (teacher_id, course_id, content_type_id) -> dict of
+            counter name -> amount to add
+    """
+    if not deltas:
+        return
+    with transaction.atomic():
+        rows = {
+            (row.teacher_id, row.course_id, row.content_type_id): row
+            for row in SalesRollup.objects.select_for_update().filter(
+                day=day,
+                currency=currency,
+                content_type_id__in={key[2] for key in deltas}
+            )
+        }
+        updated, created = [], []
+        for key, delta in deltas.items():
+            row = rows.get(key)
+            if row is None:
+                teacher_id, course_id, content_type_id = key
+                row = SalesRollup(
+                    day=day, currency=currency, teacher_id=teacher_id,
+                    course_id=course_id, content_type_id=content_type_id
+                )
+                created.append(row)
+            else:
+                updated.append(row)
+            for counter in COUNTERS:
+                setattr(row, counter, getattr(row, counter) + delta[counter])
+
+        if updated:
+            SalesRollup.objects.bulk_update(updated, COUNTERS)
+        if created:
+            try:
+                with transaction.atomic():
+                    SalesRollup.objects.bulk_create(created)
+            except IntegrityError:
+                for row in created:
+                    _add_to_row(day, currency, row, deltas)
+
+
+def _add_to_row(day, currency, row, deltas):
+    key = (row.teacher_id, row.course_id, row.content_type_id)
+    delta = deltas[key]
+    rollups = SalesRollup.objects.filter(
+        day=day, currency=currency, teacher_id=row.teacher_id,
+        course_id=row.course_id, content_type_id=row.content_type_id
+    )
+    if not rollups.update(**{counter: F(counter) + delta[counter] for counter in COUNTERS}):
+        SalesRollup.objects.create(
+            day=day, currency=currency, teacher_id=row.teacher_id,
+            course_id=row.course_id, content_type_id=row.content_type_id, **delta
+        )
+
+
+def record_sale(order):
+    """Add a completed order to the rollups of its completion day"""
+    items = list(order.items.all())
+    deltas = _new_deltas()
+    _add_items(deltas, _attribute(items), items, paid_amounts(order, items), 'gross', 'sales_count')
+    apply_deltas(timezone.localdate(order.completed_at), _order_currency(order), deltas)
+
+
+def record_refund(order, amount):
+    """
+    Add a refund to the rollups of the day the order was first refunded.
+
+    order.refunded_amount must already include the refund. Its items count
+    as refunded with the first refund of the order only.
+
+    Args:
+        amount: newly refunded amount (Decimal)
+    """
+    if order.completed_at is None or amount <= 0:
+        # Never counted as a sale, or nothing new refunded
+        return
+    items = list(order.items.all())
+    amounts = allocate(amount, paid_amounts(order, items))
+    count_field = 'refund_count' if order.refunded_amount == amount else None
+    deltas = _new_deltas()
+    _add_items(deltas, _attribute(items), items, amounts, 'refunds', count_field)
+    apply_deltas(timezone.localdate(order.refunded_at), _order_currency(order), deltas)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def rebuild_rollups(since=None):
+    """
+    Recompute the rollups from orders.
+
+    Orders are read in chunks and summed per day and rollup key, so memory
+    use grows with the number of rollup rows, not with orders. Refunded
+    orders from before refunded_at was recorded are counted on their last
+    update, and those from before refunded_amount was recorded as refunded
+    in full.
+
+    Args:
+        since: first day to rebuild (date); all days when None
+
+    Returns:
+        int: number of rollup rows written
+    """
+    orders = (
+        Order.objects.filter(status__in=('completed', 'refunded'), completed_at__isnull=False)
+        .annotate(refunded_on=Coalesce('refunded_at', 'updated_at'))
+        .select_related('payment')
+        .prefetch_related('items')
+    )
+    start = None
+    if since is not None:
+        start = timezone.make_aware(datetime.combine(since, time.min), timezone.get_current_timezone())
+        orders = orders.filter(Q(completed_at__gte=start) | Q(status='refunded', refunded_on__gte=start))
+
+    totals = defaultdict(_new_deltas)
+    for chunk in _chunks(orders.iterator(chunk_size=500), 500):
+        attribution = _attribute([item for order in chunk for item in order.items.all()])
+        for order in chunk:
+            items = list(order.items.all())
+            paid = paid_amounts(order, items)
+            deltas = totals[(timezone.localdate(order.completed_at), _order_currency(order))]
+            if start is None or order.completed_at >= start:
+                _add_items(deltas, attribution, items, paid, 'gross', 'sales_count')
+            if order.status == 'refunded' and (start is None or order.refunded_on >= start):
+                refunded = order.refunded_amount or order.total_amount
+                deltas = totals[(timezone.localdate(order.refunded_on), _order_currency(order))]
+                _add_items(deltas, attribution, items, allocate(refunded, paid), 'refunds', 'refund_count')
+
+    rows = [
+        SalesRollup(
+            day=day, teacher_id=teacher_id, course_id=course_id,
+            content_type_id=content_type_id, currency=currency, **counters
+        )
+        for (day, currency), deltas in totals.items()
+        for (teacher_id, course_id, content_type_id), counters in deltas.items()
+    ]
+    with transaction.atomic():
+        stale = SalesRollup.objects.all()
+        if since is not None:
+            stale = stale.filter(day__gte=since)
+        stale.delete()
+        SalesRollup.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def _amount(value):
+    return str(Decimal(value).quantize(CENT))
+
+
+def summarize(rollups, group_by=()):
+    """
+    Sum rollup rows per currency and the given fields.
+
+    Returns:
+        list of dicts with the group fields, currency, gross, refunds, net,
+        sales_count and refund_count; amounts as strings
+    """
+    fields = [*group_by, 'currency']
+    rows = (
+        rollups.values(*fields)
+        .annotate(
+            total_gross=Sum('gross'),
+            total_refunds=Sum('refunds'),
+            total_sales=Sum('sales_count'),
+            total_refund_count=Sum('refund_count')
+        )
+        .order_by(*fields)
+    )
+    results = []
+    for row in rows:
+        result = {field: row[field] for field in fields}
+        result.update({
+            'gross': _amount(row['total_gross']),
+            'refunds': _amount(row['total_refunds']),
+            'net': _amount(row['total_gross'] - row['total_refunds']),
+            'sales_count': row['total_sales'],
+            'refund_count': row['total_refund_count'],
+        })
+        results.append(result)
+    return results
+
+
+def default_period(today=None, days=30):
+    """The last `days` days up to and including today"""
+    today = today or timezone.localdate()
+    return today - timedelta(days=days - 1), today
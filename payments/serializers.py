@@ -1,6 +1,10 @@
 from rest_framework import serializers
 from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
 from .models import Payment, Order, OrderItem
+from .coupons import CouponError, get_rule
+from .pricing import PricingError, content_types_by_name, create_order, price_lines, price_order
+from .rollups import default_period
 from courses.models import Course
 
 class PaymentSerializer(serializers.ModelSerializer):
@@ -30,46 +34,32 @@ class OrderItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'subtotal']
     
     def get_content_type_name(self, obj):
-        return f"{obj.content_type.model}"
+        # Served from the ContentType cache rather than a query per item
+        return ContentType.objects.get_for_id(obj.content_type_id).model
 
 
 class OrderItemCreateSerializer(serializers.Serializer):
     content_type = serializers.CharField(required=True)
     object_id = serializers.IntegerField(required=True)
-    quantity = serializers.IntegerField(default=1)
-    
-    def validate(self, data):
-        """
-        Validate content_type and object_id combination.
-        """
-        content_type_name = data.get('content_type')
-        object_id = data.get('object_id')
-        
-        try:
-            # Get the Django ContentType
-            content_type = ContentType.objects.get(model=content_type_name)
-            
-            # Get the actual object
-            model_class = content_type.model_class()
-            content_object = model_class.objects.get(id=object_id)
-            
-            # Add validated data
-            data['content_type_obj'] = content_type
-            data['content_object'] = content_object
-            
-            # Check if the content is purchasable
-            if not hasattr(content_object, 'price'):
-                raise serializers.ValidationError(
-                    f"{content_type_name} with id {object_id} does not have a price attribute"
-                )
-            
-            return data
-        except ContentType.DoesNotExist:
-            raise serializers.ValidationError(f"Content type '{content_type_name}' does not exist")
-        except model_class.DoesNotExist:
-            raise serializers.ValidationError(
-                f"{content_type_name} with id {object_id} does not exist"
-            )
+    quantity = serializers.IntegerField(default=1, min_value=1)
+
+
+def price_requested_items(items):
+    """
+    Price validated OrderItemCreateSerializer data with batched lookups.
+
+    Raises:
+        ValidationError: for unknown content types, missing content or
+            content without a price
+    """
+    try:
+        content_types = content_types_by_name(item['content_type'] for item in items)
+        return price_lines(
+            (content_types[item['content_type']], item['object_id'], item['quantity'])
+            for item in items
+        )
+    except PricingError as e:
+        raise serializers.ValidationError(e.errors)
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -80,12 +70,12 @@ class OrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = [
             'id', 'user', 'status', 'subtotal', 'discount_amount',
-            'tax_amount', 'total_amount', 'created_at', 'completed_at',
+            'tax_amount', 'total_amount', 'coupon_code', 'created_at', 'completed_at',
             'items', 'payment_details', 'item_count', 'course'  # Include course for backward compatibility
         ]
         read_only_fields = [
-            'id', 'subtotal', 'total_amount', 'created_at',
-            'completed_at', 'items', 'payment_details', 'item_count'
+            'id', 'subtotal', 'discount_amount', 'total_amount', 'coupon_code',
+            'created_at', 'completed_at', 'items', 'payment_details', 'item_count'
         ]
     
     def get_payment_details(self, obj):
@@ -112,33 +102,29 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         model = Order
         fields = ['items', 'coupon_code']
     
+    def validate_coupon_code(self, value):
+        if not value:
+            return ''
+        try:
+            return get_rule(value).code
+        except CouponError as e:
+            raise serializers.ValidationError(str(e))
+    
+    def validate_items(self, value):
+        if not value:
+            raise serializers.ValidationError("An order needs at least one item")
+        return price_requested_items(value)
+    
     def create(self, validated_data):
-        items_data = validated_data.pop('items', [])
-        user = self.context['request'].user
-        
-        # Create order
-        order = Order.objects.create(user=user, **validated_data)
-        
-        # Create order items
-        for item_data in items_data:
-            content_type = item_data.pop('content_type_obj')
-            content_object = item_data.pop('content_object')
-            
-            # Create order item
-            OrderItem.objects.create(
-                order=order,
-                content_type=content_type,
-                object_id=content_object.id,
-                name=getattr(content_object, 'title', 'Untitled'),
-                description=getattr(content_object, 'description', ''),
-                price=content_object.price,
-                original_price=getattr(content_object, 'original_price', None),
-                quantity=item_data.get('quantity', 1)
-            )
-        
-        # Calculate order totals
-        order.calculate_totals()
-        return order
+        priced = price_order(validated_data['items'], validated_data.get('coupon_code', ''))
+        return create_order(self.context['request'].user, priced)
+    
+    def to_representation(self, instance):
+        return OrderSerializer(instance, context=self.context).data
+
+
+class ApplyCouponSerializer(serializers.Serializer):
+    code = serializers.CharField(max_length=50, allow_blank=True)
 
 
 class CheckoutSerializer(serializers.Serializer):
@@ -169,3 +155,26 @@ class CourseOrderSerializer(serializers.Serializer):
             return value
         except Course.DoesNotExist:
             raise serializers.ValidationError("Course does not exist")
+
+
+class SalesReportQuerySerializer(serializers.Serializer):
+    """Query parameters for earnings and sales reports"""
+    MAX_DAYS = 366
+    GROUP_BY_CHOICES = ['day', 'teacher', 'course', 'content_type']
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    group_by = serializers.ChoiceField(choices=GROUP_BY_CHOICES, required=False)
+    teacher = serializers.IntegerField(required=False, min_value=1)
+    currency = serializers.CharField(required=False, max_length=3)
+
+    def validate(self, data):
+        data.setdefault('end', timezone.localdate())
+        data.setdefault('start', default_period(data['end'])[0])
+        if data['start'] > data['end']:
+            raise serializers.ValidationError("start must not be after end")
+        if (data['end'] - data['start']).days >= self.MAX_DAYS:
+            raise serializers.ValidationError(f"Reports cover at most {self.MAX_DAYS} days")
+        if 'currency' in data:
+            data['currency'] = data['currency'].upper()
+        return data
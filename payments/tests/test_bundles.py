@@ -0,0 +1,102 @@
+"""
+Tests for fulfilling bundle purchases, nested bundles included
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase
+
+from accounts.models import TeacherProfile
+from courses.models import Course, Video
+from enrollments.bundles import expand_bundles
+from enrollments.content_models import ContentBundle, ContentType as ContentItem
+from enrollments.models import Enrollment, VideoEnrollment
+from payments.models import Order, OrderItem, Payment
+
+User = get_user_model()
+
+
+class BundleFulfillmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        teacher_user = User.objects.create_user(username='teacher', password='teacher123')
+        teacher = TeacherProfile.objects.create(user=teacher_user)
+        self.courses = Course.objects.bulk_create([
+            Course(teacher=teacher, title=f'Course {i}', price=20, published=True)
+            for i in range(200)
+        ])
+        self.videos = Video.objects.bulk_create([
+            Video(course=self.courses[0], title=f'Video {i}', video_url=f'https://example.com/{i}.mp4')
+            for i in range(150)
+        ])
+        self.student = User.objects.create_user(username='student', password='student123')
+
+        # outer: 200 courses + inner; inner: 150 videos + outer again
+        self.outer = ContentBundle.objects.create(name='Everything', price=500)
+        self.inner = ContentBundle.objects.create(name='All videos', price=100)
+        self.outer.content_items.set(
+            self.items(self.courses) + self.items([self.inner], type='bundle')
+        )
+        self.inner.content_items.set(
+            self.items(self.videos, type='video') + self.items([self.outer], type='bundle')
+        )
+
+    def items(self, contents, type='course'):
+        return ContentItem.objects.bulk_create([
+            ContentItem(
+                name=str(content),
+                type=type,
+                price=content.price if hasattr(content, 'price') else 5,
+                content_type=ContentType.objects.get_for_model(content),
+                object_id=content.pk,
+                is_bundle=type == 'bundle'
+            )
+            for content in contents
+        ])
+
+    def make_order(self, bundle):
+        payment = Payment.objects.create(user=self.student, amount=bundle.price)
+        order = Order.objects.create(user=self.student, payment=payment, status='pending_payment')
+        OrderItem.objects.create(
+            order=order,
+            content_type=ContentType.objects.get_for_model(ContentBundle),
+            object_id=bundle.id,
+            name=bundle.name,
+            price=bundle.price
+        )
+        return order
+
+    def test_nested_bundles_are_expanded_in_one_query(self):
+        ContentType.objects.get_for_model(ContentBundle)
+        course_type, video_type = (
+            ContentType.objects.get_for_model(Course), ContentType.objects.get_for_model(Video)
+        )
+
+        with self.assertNumQueries(1):
+            expanded = expand_bundles([self.outer.id, self.inner.id])
+
+        expected = {(course_type.id, course.id) for course in self.courses}
+        expected |= {(video_type.id, video.id) for video in self.videos}
+        self.assertEqual(expanded[self.outer.id], expected)
+        self.assertEqual(expanded[self.inner.id], expected)
+
+    def test_bundle_purchase_enrolls_in_every_item_once(self):
+        Enrollment.objects.create(student=self.student, course=self.courses[0])
+        self.courses[1].delete()
+        order = self.make_order(self.outer)
+
+        order.mark_as_completed()
+
+        created = Enrollment.objects.filter(student=self.student, payment=order.payment)
+        # 198 remaining new courses, 150 videos and the bundle itself
+        self.assertEqual(created.count(), 349)
+        self.assertEqual(created.filter(bundle=self.outer).count(), 349)
+        self.assertEqual(VideoEnrollment.objects.filter(enrollment__in=created).count(), 150)
+        self.assertEqual(Enrollment.objects.filter(student=self.student).count(), 350)
+
+        item = order.items.get()
+        bundle_enrollment = Enrollment.objects.get(pk=item.enrollment_id)
+        self.assertEqual(bundle_enrollment.object_id, self.outer.id)
+
+        Order.objects.get(pk=order.pk).mark_as_completed()
+        self.assertEqual(Enrollment.objects.filter(student=self.student).count(), 350)
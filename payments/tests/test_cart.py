@@ -0,0 +1,115 @@
+"""
+Tests for the server-side cart and batched order pricing
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import TeacherProfile
+from courses.models import Course, Video
+from payments.models import Cart, Coupon, Order
+
+User = get_user_model()
+
+
+class CartTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        teacher_user = User.objects.create_user(username='teacher', password='teacher123')
+        teacher = TeacherProfile.objects.create(user=teacher_user)
+        self.courses = [
+            Course.objects.create(teacher=teacher, title=f'Course {i}', price=10 * (i + 1), published=True)
+            for i in range(4)
+        ]
+        self.student = User.objects.create_user(username='student', password='student123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+
+    def add(self, course, quantity=1):
+        return self.client.post('/api/payments/cart/items/', {
+            'content_type': 'course', 'object_id': course.id, 'quantity': quantity
+        })
+
+    def test_cart_is_priced_with_current_prices(self):
+        self.add(self.courses[0])
+        self.add(self.courses[1])
+        response = self.add(self.courses[1])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [(item['object_id'], item['quantity']) for item in response.data['items']],
+            [(self.courses[0].id, 1), (self.courses[1].id, 2)]
+        )
+        self.assertEqual(response.data['total_amount'], '50.00')
+
+        Course.objects.filter(pk=self.courses[0].pk).update(price=15)
+        self.courses[1].delete()
+        response = self.client.get('/api/payments/cart/')
+        self.assertEqual(len(response.data['items']), 1)
+        self.assertEqual(response.data['total_amount'], '15.00')
+
+    def test_adding_unknown_content_is_rejected(self):
+        response = self.client.post('/api/payments/cart/items/', {'content_type': 'course', 'object_id': 999})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/payments/cart/items/', {'content_type': 'nothing', 'object_id': 1})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Cart.objects.filter(user=self.student, items__isnull=False).exists())
+
+    def test_checkout_creates_order_and_empties_cart(self):
+        Coupon.objects.create(code='TEN', value=10)
+        for course in self.courses:
+            self.add(course)
+        self.client.post('/api/payments/cart/coupon/', {'code': 'ten'})
+        self.client.delete(f'/api/payments/cart/items/course/{self.courses[3].id}/')
+
+        response = self.client.post('/api/payments/cart/checkout/')
+
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.data['id'])
+        self.assertEqual(order.status, 'draft')
+        self.assertEqual(order.items.count(), 3)
+        self.assertEqual(order.subtotal, Decimal('60.00'))
+        self.assertEqual(order.discount_amount, Decimal('6.00'))
+        self.assertEqual(order.total_amount, Decimal('54.00'))
+        self.assertEqual(order.coupon_code, 'TEN')
+        self.assertEqual(self.client.get('/api/payments/cart/').data['items'], [])
+
+        response = self.client.post('/api/payments/cart/checkout/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_order_creation_query_count_does_not_grow_with_items(self):
+        def create(courses):
+            return self.client.post('/api/payments/orders/', {
+                'items': [
+                    {'content_type': 'course', 'object_id': course.id, 'quantity': 1}
+                    for course in courses
+                ]
+            }, format='json')
+
+        ContentType.objects.get_for_model(Course)
+        with self.assertNumQueries(8) as small:
+            response = create(self.courses[:1])
+        self.assertEqual(response.status_code, 201)
+        with self.assertNumQueries(len(small)):
+            response = create(self.courses)
+
+        self.assertEqual(response.data['total_amount'], '100.00')
+        self.assertEqual(len(response.data['items']), 4)
+
+    def test_order_creation_reports_missing_content(self):
+        video = Video.objects.create(
+            course=self.courses[0], title='Lesson', video_url='https://example.com/1.mp4'
+        )
+        response = self.client.post('/api/payments/orders/', {
+            'items': [
+                {'content_type': 'course', 'object_id': 999},
+                {'content_type': 'video', 'object_id': video.id},
+            ]
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data['items']), 2)
+        self.assertFalse(Order.objects.exists())
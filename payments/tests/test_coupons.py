@@ -0,0 +1,213 @@
+"""
+Tests for coupon pricing, the compiled coupon index and sharded usage caps
+"""
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+import stripe
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import TeacherProfile
+from courses.models import Course, Video
+from payments import coupons
+from payments.coupons import CouponError, USAGE_SHARDS, get_index, get_rule, redeem_coupon
+from payments.models import Coupon, CouponRedemption, Order, OrderItem, Payment
+from payments.webhooks import handle_payment_intent_failed
+
+User = get_user_model()
+
+
+class CouponTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        teacher_user = User.objects.create_user(username='teacher', password='teacher123')
+        self.teacher = TeacherProfile.objects.create(user=teacher_user)
+        other_user = User.objects.create_user(username='other', password='other123')
+        self.other_teacher = TeacherProfile.objects.create(user=other_user)
+        self.course = Course.objects.create(
+            teacher=self.teacher, title='Conversation', price=50, published=True
+        )
+        self.video = Video.objects.create(
+            course=self.course, title='Lesson 1', video_url='https://example.com/1.mp4'
+        )
+        self.other_course = Course.objects.create(
+            teacher=self.other_teacher, title='Grammar', price=30, published=True
+        )
+        self.student = User.objects.create_user(username='student', password='student123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+
+    def make_order(self, contents, code='', user=None):
+        order = Order.objects.create(user=user or self.student, coupon_code=code)
+        for content, price in contents:
+            OrderItem.objects.create(
+                order=order,
+                content_type=ContentType.objects.get_for_model(content),
+                object_id=content.id,
+                name=content.title,
+                price=price
+            )
+        order.calculate_totals()
+        return order
+
+    def test_discounts_by_type_and_scope(self):
+        Coupon.objects.create(code='ten', value=10)
+        Coupon.objects.create(code='TEACHER', value=20, teacher=self.teacher)
+        Coupon.objects.create(code='FIVE', discount_type='fixed', value=5, course=self.other_course)
+        Coupon.objects.create(code='BIG', discount_type='fixed', value=100, course=self.other_course)
+        contents = [(self.course, 50), (self.video, 5), (self.other_course, 30)]
+
+        expected = {'TEN': '8.50', 'TEACHER': '11.00', 'FIVE': '5.00', 'BIG': '30.00'}
+        for code, discount in expected.items():
+            order = self.make_order(contents, code)
+            self.assertEqual(order.discount_amount, Decimal(discount), code)
+            self.assertEqual(order.total_amount, Decimal('85.00') - Decimal(discount))
+
+    def test_index_is_compiled_once_per_version(self):
+        Coupon.objects.create(code='TEN', value=10)
+        get_index()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_rule('ten').value, Decimal('10.00'))
+
+        Coupon.objects.filter(code='TEN').update(is_active=False)
+        self.assertEqual(get_rule('TEN').code, 'TEN')
+
+        coupon = Coupon.objects.get(code='TEN')
+        with self.captureOnCommitCallbacks(execute=True):
+            coupon.save()
+            # Not before the change is committed
+            self.assertEqual(get_rule('TEN').code, 'TEN')
+        with self.assertRaises(CouponError):
+            get_rule('TEN')
+
+    def test_validity_window(self):
+        now = timezone.now()
+        Coupon.objects.create(code='SOON', value=10, valid_from=now + timedelta(days=1))
+        Coupon.objects.create(code='GONE', value=10, valid_until=now - timedelta(days=1))
+
+        for code in ('SOON', 'GONE', 'MISSING'):
+            with self.assertRaises(CouponError):
+                get_rule(code)
+        self.assertEqual(get_rule('SOON', now=now + timedelta(days=2)).code, 'SOON')
+
+    def test_usage_cap_is_enforced_across_shards(self):
+        coupon = Coupon.objects.create(code='LIMITED', value=10, max_uses=USAGE_SHARDS + 3)
+        self.assertEqual(
+            sum(coupon.usage_shards.values_list('capacity', flat=True)), USAGE_SHARDS + 3
+        )
+
+        for i in range(USAGE_SHARDS + 3):
+            user = User.objects.create_user(username=f'buyer{i}', password='buyer123')
+            redeem_coupon(self.make_order([(self.course, 50)], 'LIMITED', user=user))
+        self.assertEqual(coupon.times_used, USAGE_SHARDS + 3)
+
+        with self.assertRaisesMessage(CouponError, 'usage limit'):
+            redeem_coupon(self.make_order([(self.course, 50)], 'LIMITED'))
+
+        coupon.max_uses = USAGE_SHARDS + 4
+        coupon.save()
+        redeem_coupon(self.make_order([(self.course, 50)], 'LIMITED'))
+        self.assertEqual(coupon.times_used, USAGE_SHARDS + 4)
+
+    def test_redemption_is_idempotent_and_capped_per_user(self):
+        coupon = Coupon.objects.create(code='ONCE', value=10, max_uses_per_user=1)
+        order = self.make_order([(self.course, 50)], 'ONCE')
+
+        first = redeem_coupon(order)
+        self.assertEqual(redeem_coupon(order), first)
+        self.assertEqual(coupon.times_used, 1)
+        self.assertEqual(first.discount_amount, Decimal('5.00'))
+
+        with self.assertRaisesMessage(CouponError, 'already used'):
+            redeem_coupon(self.make_order([(self.course, 50)], 'ONCE'))
+
+    def test_apply_coupon_endpoint(self):
+        Coupon.objects.create(code='GRAMMAR', value=50, course=self.other_course)
+        order = self.make_order([(self.course, 50)])
+        url = f'/api/payments/orders/{order.pk}/coupon/'
+
+        response = self.client.post(url, {'code': 'grammar'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('does not apply', response.data['error'])
+
+        OrderItem.objects.create(
+            order=order,
+            content_type=ContentType.objects.get_for_model(Course),
+            object_id=self.other_course.id,
+            name=self.other_course.title,
+            price=30
+        )
+        response = self.client.post(url, {'code': 'grammar'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['coupon_code'], 'GRAMMAR')
+        self.assertEqual(Decimal(response.data['total_amount']), Decimal('65.00'))
+
+        response = self.client.post(url, {'code': ''})
+        self.assertEqual(Decimal(response.data['total_amount']), Decimal('80.00'))
+
+    @patch('payments.views.stripe.PaymentIntent.create')
+    def test_checkout_redeems_coupon(self, create_intent):
+        create_intent.return_value = type('Intent', (), {'id': 'pi_1', 'client_secret': 'secret'})
+        Coupon.objects.create(code='TEN', value=10, max_uses=1)
+        order = self.make_order([(self.course, 50)], 'TEN')
+
+        response = self.client.post('/api/payments/checkout/', {'order_id': order.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(create_intent.call_args.kwargs['amount'], 4500)
+        self.assertTrue(CouponRedemption.objects.filter(order=order).exists())
+
+        second = self.make_order([(self.course, 50)], 'TEN')
+        response = self.client.post('/api/payments/checkout/', {'order_id': second.pk})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Coupon usage limit reached')
+
+    def test_per_user_cap_holds_when_a_use_number_is_taken_meanwhile(self):
+        coupon = Coupon.objects.create(code='ONCE', value=10, max_uses_per_user=1)
+        redeem_coupon(self.make_order([(self.course, 50)], 'ONCE'))
+
+        # A concurrent checkout read the user's free numbers before the first
+        with patch.object(coupons, '_free_use_numbers', return_value=[1]):
+            with self.assertRaisesMessage(CouponError, 'already used'):
+                redeem_coupon(self.make_order([(self.course, 50)], 'ONCE'))
+        self.assertEqual(coupon.times_used, 1)
+
+    @patch('payments.views.stripe.PaymentIntent.create')
+    def test_failed_checkout_gives_the_use_back(self, create_intent):
+        create_intent.side_effect = stripe.error.APIConnectionError('Stripe is down')
+        coupon = Coupon.objects.create(code='TEN', value=10, max_uses=1)
+        order = self.make_order([(self.course, 50)], 'TEN')
+
+        response = self.client.post('/api/payments/checkout/', {'order_id': order.pk})
+
+        self.assertEqual(response.status_code, 400)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'draft')
+        self.assertIsNone(order.payment)
+        self.assertEqual(coupon.times_used, 0)
+        self.assertFalse(CouponRedemption.objects.exists())
+
+    def test_failed_payment_gives_the_use_back_until_paid(self):
+        coupon = Coupon.objects.create(code='ONCE', value=10, max_uses=5, max_uses_per_user=1)
+        order = self.make_order([(self.course, 50)], 'ONCE')
+        redeem_coupon(order)
+        order.payment = Payment.objects.create(
+            user=self.student, amount=order.total_amount, provider_payment_id='pi_1'
+        )
+        order.status = 'pending_payment'
+        order.save()
+
+        handle_payment_intent_failed(stripe.util.convert_to_stripe_object({'id': 'pi_1'}))
+        self.assertEqual(coupon.times_used, 0)
+        self.assertFalse(CouponRedemption.objects.exists())
+
+        # The customer retries with another card and the payment succeeds
+        Order.objects.get(pk=order.pk).mark_as_completed()
+        self.assertEqual(coupon.times_used, 1)
+        self.assertEqual(CouponRedemption.objects.get().use_number, 1)
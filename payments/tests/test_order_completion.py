@@ -0,0 +1,89 @@
+"""
+Tests for batched enrollment creation when an order completes
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+
+from accounts.models import TeacherProfile
+from courses.models import Course, Video
+from enrollments.models import Enrollment, VideoEnrollment
+from payments.models import Order, OrderItem, Payment
+
+User = get_user_model()
+
+
+class OrderCompletionTests(TestCase):
+    def setUp(self):
+        teacher_user = User.objects.create_user(username='teacher', password='teacher123')
+        teacher = TeacherProfile.objects.create(user=teacher_user)
+        self.courses = [
+            Course.objects.create(teacher=teacher, title=f'Course {i}', price=50, published=True)
+            for i in range(3)
+        ]
+        self.videos = [
+            Video.objects.create(
+                course=self.courses[i], title=f'Video {i}',
+                video_url=f'https://example.com/{i}.mp4'
+            )
+            for i in range(3)
+        ]
+        self.student = User.objects.create_user(username='student', password='student123')
+
+    def make_order(self, contents):
+        payment = Payment.objects.create(user=self.student, amount=10 * len(contents))
+        order = Order.objects.create(
+            user=self.student, payment=payment, status='pending_payment'
+        )
+        for content in contents:
+            OrderItem.objects.create(
+                order=order,
+                content_type=ContentType.objects.get_for_model(content),
+                object_id=content.id,
+                name=content.title,
+                price=10
+            )
+        return order
+
+    def test_enrollments_are_created_for_every_item(self):
+        order = self.make_order(self.courses + self.videos)
+
+        order.mark_as_completed()
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'completed')
+        self.assertIsNotNone(order.completed_at)
+        enrollments = Enrollment.objects.filter(student=self.student)
+        self.assertEqual(enrollments.count(), 6)
+        self.assertEqual(enrollments.filter(course__isnull=False).count(), 3)
+        self.assertEqual(VideoEnrollment.objects.filter(enrollment__student=self.student).count(), 3)
+        for item in order.items.all():
+            enrollment = Enrollment.objects.get(pk=item.enrollment_id)
+            self.assertEqual(
+                (enrollment.content_type_id, enrollment.object_id),
+                (item.content_type_id, item.object_id)
+            )
+
+    def test_query_count_does_not_grow_with_items(self):
+        ContentType.objects.get_for_models(Course, Video)
+        small = self.make_order(self.courses[:1] + self.videos[:1])
+        large = self.make_order(self.courses[1:] + self.videos[1:])
+
+        with self.assertNumQueries(20) as small_queries:
+            small.mark_as_completed()
+        with self.assertNumQueries(len(small_queries)):
+            large.mark_as_completed()
+
+    def test_existing_enrollments_are_reused(self):
+        Enrollment.objects.create(student=self.student, course=self.courses[0], status='active')
+        order = self.make_order(self.courses[:2])
+
+        order.mark_as_completed()
+        order.mark_as_completed()
+        Order.objects.get(pk=order.pk).mark_as_completed()
+
+        self.assertEqual(Enrollment.objects.filter(student=self.student).count(), 2)
+        self.assertEqual(
+            Enrollment.objects.filter(student=self.student, payment=order.payment).count(), 1
+        )
+        self.assertFalse(order.items.filter(enrollment_id__isnull=True).exists())
@@ -0,0 +1,119 @@
+"""
+Tests for stored order receipts
+"""
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import TeacherProfile
+from courses.models import Course
+from payments.models import Order, OrderItem, Payment, Receipt
+from payments.webhooks import handle_refund
+
+User = get_user_model()
+
+
+class ReceiptTests(TestCase):
+    def setUp(self):
+        teacher_user = User.objects.create_user(username='teacher', password='teacher123')
+        teacher = TeacherProfile.objects.create(user=teacher_user)
+        self.course = Course.objects.create(
+            teacher=teacher, title='Conversation', price=50, published=True
+        )
+        self.student = User.objects.create_user(username='student', password='student123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+
+    def make_order(self, intent_id='pi_1'):
+        payment = Payment.objects.create(
+            user=self.student, amount=50, provider_payment_id=intent_id
+        )
+        order = Order.objects.create(
+            user=self.student, payment=payment, status='pending_payment',
+            subtotal=50, total_amount=50
+        )
+        OrderItem.objects.create(
+            order=order,
+            content_type=ContentType.objects.get_for_model(Course),
+            object_id=self.course.id,
+            name=self.course.title,
+            price=50
+        )
+        return order
+
+    def complete(self, order):
+        with self.captureOnCommitCallbacks(execute=True):
+            order.mark_as_completed()
+        return Receipt.objects.get(order=order)
+
+    def test_receipt_is_stored_on_completion(self):
+        order = self.make_order()
+        receipt = self.complete(order)
+
+        self.assertEqual(receipt.data['total'], '50.00')
+        self.assertIn(receipt.content_hash[:16], receipt.file.name)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/payments/orders/{order.pk}/receipt/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['items'][0]['name'], 'Conversation')
+        self.assertTrue(response.data['document_url'].endswith(f'?v={receipt.content_hash}'))
+
+    def test_document_caching_and_ranges(self):
+        order = self.make_order()
+        receipt = self.complete(order)
+        url = f'/api/payments/orders/{order.pk}/receipt/document/'
+
+        response = self.client.get(url, {'v': receipt.content_hash})
+        body = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Order #', body)
+        self.assertEqual(response['ETag'], f'"{receipt.content_hash}"')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=f'"{receipt.content_hash}"')
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(url, HTTP_RANGE='bytes=0-14')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), body[:15])
+        self.assertEqual(response['Content-Range'], f'bytes 0-14/{len(body)}')
+
+        response = self.client.get(url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), body[-10:])
+
+        response = self.client.get(url, HTTP_RANGE=f'bytes={len(body)}-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_refund_regenerates_receipt(self):
+        order = self.make_order()
+        original = self.complete(order)
+
+        charge = type('Charge', (), {
+            'id': 'ch_1', 'payment_intent': 'pi_1', 'refunded': True,
+            'amount_refunded': int(order.total_amount * 100)
+        })
+        with self.captureOnCommitCallbacks(execute=True):
+            handle_refund(charge)
+
+        receipt = Receipt.objects.get(order=order)
+        self.assertEqual(receipt.data['status'], 'refunded')
+        self.assertNotEqual(receipt.content_hash, original.content_hash)
+        self.assertFalse(receipt.file.storage.exists(original.file.name))
+
+    def test_backfill_command(self):
+        orders = [self.make_order(f'pi_{i}') for i in range(3)]
+        Order.objects.filter(pk__in=[o.pk for o in orders]).update(status='completed')
+
+        out = StringIO()
+        call_command('backfill_receipts', '--batch-size=2', stdout=out)
+
+        self.assertIn('Generated 3 receipts', out.getvalue())
+        self.assertEqual(Receipt.objects.count(), 3)
+        call_command('backfill_receipts', stdout=out)
+        self.assertIn('Generated 0 receipts', out.getvalue())
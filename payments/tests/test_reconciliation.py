@@ -0,0 +1,186 @@
+"""
+Tests for Stripe reconciliation, run against a local stub Stripe server
+"""
+import json
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from urllib.parse import parse_qs, urlparse
+
+import stripe
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import TeacherProfile
+from courses.models import Course
+from enrollments.models import Enrollment
+from payments.models import Order, OrderItem, Payment
+from payments.reconciliation import apply_transitions, plan_transitions, reconcile_payments
+
+User = get_user_model()
+
+
+class StubStripeHandler(BaseHTTPRequestHandler):
+    """Serves GET /v1/payment_intents from the server's intents list"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/v1/payment_intents':
+            self.send_error(404)
+            return
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self.server.requests.append(params)
+
+        intents = [
+            intent for intent in self.server.intents
+            if int(params['created[gte]']) <= intent['created'] <= int(params['created[lte]'])
+        ]
+        if 'starting_after' in params:
+            ids = [intent['id'] for intent in intents]
+            intents = intents[ids.index(params['starting_after']) + 1:]
+        limit = int(params.get('limit', 10))
+
+        body = json.dumps({
+            'object': 'list',
+            'url': '/v1/payment_intents',
+            'has_more': len(intents) > limit,
+            'data': intents[:limit],
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReconciliationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubStripeHandler)
+        cls.server.intents = []
+        cls.server.requests = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.api_base = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        stripe.api_base = settings.STRIPE_API_BASE
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.intents = []
+        self.server.requests = []
+        overrides = override_settings(STRIPE_API_BASE=self.api_base, STRIPE_SECRET_KEY='sk_test_stub')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        teacher_user = User.objects.create_user(username='teacher', password='teacher123')
+        teacher = TeacherProfile.objects.create(user=teacher_user)
+        self.course = Course.objects.create(
+            teacher=teacher, title='Conversation', price=50, published=True
+        )
+        self.student = User.objects.create_user(username='student', password='student123')
+        self.now = timezone.now()
+
+    def make_payment(self, intent_id, intent_status=None, **intent_fields):
+        payment = Payment.objects.create(
+            user=self.student, amount=50, provider_payment_id=intent_id
+        )
+        order = Order.objects.create(
+            user=self.student, payment=payment, status='pending_payment'
+        )
+        OrderItem.objects.create(
+            order=order,
+            content_type=ContentType.objects.get_for_model(Course),
+            object_id=self.course.id,
+            name=self.course.title,
+            price=50
+        )
+        if intent_status:
+            self.server.intents.append({
+                'id': intent_id,
+                'object': 'payment_intent',
+                'status': intent_status,
+                'created': int(self.now.timestamp()),
+                **intent_fields
+            })
+        return payment
+
+    def test_transitions_are_applied_in_bulk(self):
+        succeeded = self.make_payment('pi_ok', 'succeeded', charges={
+            'object': 'list', 'data': [{'object': 'charge', 'receipt_url': 'https://pay.stripe.com/r/1'}]
+        })
+        canceled = self.make_payment('pi_cancel', 'canceled')
+        failed = self.make_payment('pi_fail', 'requires_payment_method',
+                                   last_payment_error={'message': 'declined'})
+        waiting = self.make_payment('pi_wait', 'requires_payment_method')
+        missing = self.make_payment('pi_missing')
+        for i in range(3):
+            self.server.intents.append({
+                'id': f'pi_other_{i}', 'object': 'payment_intent',
+                'status': 'succeeded', 'created': int(self.now.timestamp())
+            })
+
+        result = reconcile_payments(self.now - timedelta(hours=1), page_size=2)
+
+        self.assertEqual(result['checked'], 5)
+        self.assertEqual(result['missing'], 1)
+        self.assertEqual(result['transitions'], {'completed': 1, 'cancelled': 1, 'failed': 1})
+        # 7 intents in pages of 2
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertEqual(self.server.requests[1]['starting_after'], 'pi_cancel')
+
+        statuses = dict(Payment.objects.values_list('provider_payment_id', 'status'))
+        self.assertEqual(statuses, {
+            'pi_ok': 'completed', 'pi_cancel': 'cancelled', 'pi_fail': 'failed',
+            'pi_wait': 'pending', 'pi_missing': 'pending'
+        })
+        succeeded.refresh_from_db()
+        self.assertEqual(succeeded.receipt_url, 'https://pay.stripe.com/r/1')
+        self.assertEqual(succeeded.order.status, 'completed')
+        self.assertEqual(Enrollment.objects.filter(student=self.student).count(), 1)
+        self.assertEqual(Order.objects.get(payment=canceled).status, 'cancelled')
+        self.assertEqual(Order.objects.get(payment=failed).status, 'pending_payment')
+        self.assertEqual(Order.objects.get(payment=waiting).status, 'pending_payment')
+        self.assertEqual(Order.objects.get(payment=missing).status, 'pending_payment')
+
+    def test_payment_settled_meanwhile_is_left_alone(self):
+        payment = self.make_payment('pi_ok', 'succeeded')
+        transitions, _ = plan_transitions(
+            {'pi_ok': payment}, [stripe.util.convert_to_stripe_object(self.server.intents[0])]
+        )
+        # A webhook refunds the payment between listing and applying
+        Payment.objects.filter(pk=payment.pk).update(status='refunded')
+
+        self.assertEqual(apply_transitions(transitions), {'completed': 0})
+
+        self.assertEqual(Order.objects.get(payment=payment).status, 'pending_payment')
+        self.assertFalse(Enrollment.objects.exists())
+
+    def test_rerun_is_a_no_op(self):
+        self.make_payment('pi_ok', 'succeeded')
+        reconcile_payments(self.now - timedelta(hours=1))
+
+        result = reconcile_payments(self.now - timedelta(hours=1))
+        self.assertEqual(result, {'checked': 0, 'missing': 0, 'transitions': {}})
+
+    def test_command_dry_run(self):
+        self.make_payment('pi_ok', 'succeeded')
+
+        out = StringIO()
+        call_command('reconcile_stripe_payments', '--dry-run', stdout=out)
+
+        self.assertIn('[dry run] Checked 1 open payments: transitions: 1 completed', out.getvalue())
+        self.assertEqual(Payment.objects.get().status, 'pending')
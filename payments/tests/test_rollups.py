@@ -0,0 +1,211 @@
+"""
+Tests for the daily sales rollups and the reports that read them
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import TeacherProfile
+from courses.models import Course, Video
+from payments.models import Order, OrderItem, Payment, SalesRollup
+from payments.webhooks import handle_refund
+
+User = get_user_model()
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        teacher_user = User.objects.create_user(username='teacher', password='teacher123')
+        self.teacher_user = teacher_user
+        self.teacher = TeacherProfile.objects.create(user=teacher_user)
+        other_user = User.objects.create_user(username='other', password='other123')
+        self.other_teacher = TeacherProfile.objects.create(user=other_user)
+
+        self.course = Course.objects.create(
+            teacher=self.teacher, title='Conversation', price=50, published=True
+        )
+        self.video = Video.objects.create(
+            course=self.course, title='Lesson 1', video_url='https://example.com/1.mp4'
+        )
+        self.other_course = Course.objects.create(
+            teacher=self.other_teacher, title='Grammar', price=30, published=True
+        )
+        self.student = User.objects.create_user(username='student', password='student123')
+        self.client = APIClient()
+        self.payments = 0
+
+    def make_order(self, contents, currency='EUR', discount=0):
+        self.payments += 1
+        payment = Payment.objects.create(
+            user=self.student, amount=10, currency=currency,
+            provider_payment_id=f'pi_{self.payments}'
+        )
+        order = Order.objects.create(
+            user=self.student, payment=payment, status='pending_payment'
+        )
+        for content, price in contents:
+            OrderItem.objects.create(
+                order=order,
+                content_type=ContentType.objects.get_for_model(content),
+                object_id=content.id,
+                name=content.title,
+                price=price
+            )
+        order.subtotal = sum(price for content, price in contents)
+        order.discount_amount = discount
+        order.total_amount = order.subtotal - order.discount_amount
+        order.save()
+        return order
+
+    def refund(self, order, amount=None):
+        amount = order.total_amount if amount is None else Decimal(amount)
+        charge = type('Charge', (), {
+            'id': 'ch_1', 'payment_intent': order.payment.provider_payment_id,
+            'refunded': amount == order.total_amount, 'amount_refunded': int(amount * 100)
+        })
+        handle_refund(charge)
+
+    def snapshot(self):
+        return sorted(
+            SalesRollup.objects.values_list(
+                'day', 'teacher_id', 'course_id', 'content_type__model', 'currency',
+                'gross', 'refunds', 'sales_count', 'refund_count'
+            )
+        )
+
+    def test_completion_and_refund_update_rollups(self):
+        first = self.make_order([(self.course, 50), (self.video, 5)])
+        second = self.make_order([(self.course, 40), (self.other_course, 30)])
+        first.mark_as_completed()
+        second.mark_as_completed()
+
+        rollup = SalesRollup.objects.get(course=self.course, content_type__model='course')
+        self.assertEqual(rollup.teacher, self.teacher)
+        self.assertEqual(rollup.gross, Decimal('90.00'))
+        self.assertEqual(rollup.sales_count, 2)
+        video_rollup = SalesRollup.objects.get(content_type__model='video')
+        self.assertEqual((video_rollup.course, video_rollup.gross), (self.course, Decimal('5.00')))
+
+        self.refund(second)
+        self.refund(second)
+
+        rollup.refresh_from_db()
+        self.assertEqual((rollup.refunds, rollup.refund_count), (Decimal('40.00'), 1))
+        other = SalesRollup.objects.get(course=self.other_course)
+        self.assertEqual((other.gross, other.refunds), (Decimal('30.00'), Decimal('30.00')))
+
+    def test_discount_is_spread_over_items(self):
+        order = self.make_order([(self.course, 50), (self.video, 10), (self.other_course, 30)], discount=10)
+        order.mark_as_completed()
+
+        gross = dict(SalesRollup.objects.values_list('content_type__model', 'gross').filter(teacher=self.teacher))
+        self.assertEqual(gross, {'course': Decimal('44.44'), 'video': Decimal('8.89')})
+        other = SalesRollup.objects.get(course=self.other_course)
+        self.assertEqual(other.gross, Decimal('26.67'))
+        self.assertEqual(sum(SalesRollup.objects.values_list('gross', flat=True)), order.total_amount)
+
+    def test_partial_refunds_book_the_refunded_amount(self):
+        order = self.make_order([(self.course, 60), (self.other_course, 30)], discount=9)
+        order.mark_as_completed()
+
+        self.refund(order, '27.00')
+        self.refund(order, '27.00')
+        rollup = SalesRollup.objects.get(course=self.course)
+        other = SalesRollup.objects.get(course=self.other_course)
+        self.assertEqual((rollup.gross, rollup.refunds, rollup.refund_count), (Decimal('54.00'), Decimal('18.00'), 1))
+        self.assertEqual((other.refunds, other.refund_count), (Decimal('9.00'), 1))
+
+        # Stripe reports the total refunded so far
+        self.refund(order, '81.00')
+        rollup.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((rollup.refunds, rollup.refund_count), (Decimal('54.00'), 1))
+        self.assertEqual((other.refunds, other.refund_count), (Decimal('27.00'), 1))
+
+    def test_rebuild_matches_incremental_rollups(self):
+        orders = [
+            self.make_order([(self.course, 50), (self.video, 5)], discount=5),
+            self.make_order([(self.course, 50)], currency='usd'),
+            self.make_order([(self.other_course, 30)]),
+            self.make_order([(self.course, 40), (self.video, 5)], discount=3),
+        ]
+        for order in orders:
+            order.mark_as_completed()
+        self.refund(orders[2])
+        self.refund(orders[3], '20.00')
+        incremental = self.snapshot()
+
+        SalesRollup.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_sales_rollups', stdout=out)
+
+        self.assertEqual(self.snapshot(), incremental)
+        self.assertIn('Rebuilt 4 rollup rows', out.getvalue())
+        self.assertIn('USD', {row[4] for row in incremental})
+
+    def test_rebuild_since_keeps_older_days(self):
+        old = self.make_order([(self.course, 50)])
+        old.mark_as_completed()
+        two_weeks_ago = timezone.now() - timedelta(days=14)
+        Order.objects.filter(pk=old.pk).update(completed_at=two_weeks_ago)
+        SalesRollup.objects.update(day=timezone.localdate(two_weeks_ago), gross=99)
+        self.make_order([(self.course, 50)]).mark_as_completed()
+
+        since = timezone.localdate() - timedelta(days=7)
+        call_command('rebuild_sales_rollups', f'--since={since}', stdout=StringIO())
+
+        self.assertEqual(
+            sorted(SalesRollup.objects.values_list('gross', flat=True)),
+            [Decimal('50.00'), Decimal('99.00')]
+        )
+
+    def test_teacher_earnings_endpoint(self):
+        self.make_order([(self.course, 50), (self.video, 5)]).mark_as_completed()
+        refunded = self.make_order([(self.course, 50)])
+        refunded.mark_as_completed()
+        self.refund(refunded)
+        self.make_order([(self.other_course, 30)]).mark_as_completed()
+
+        self.client.force_authenticate(user=self.teacher_user)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/payments/earnings/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['totals'], [{
+            'currency': 'EUR', 'gross': '105.00', 'refunds': '50.00', 'net': '55.00',
+            'sales_count': 3, 'refund_count': 1
+        }])
+        self.assertEqual(len(response.data['courses']), 1)
+        self.assertEqual(response.data['courses'][0]['course__title'], 'Conversation')
+        self.assertEqual(response.data['days'][0]['day'], timezone.localdate())
+
+        self.client.force_authenticate(user=self.student)
+        self.assertEqual(self.client.get('/api/payments/earnings/').status_code, 403)
+
+    def test_admin_sales_report(self):
+        self.make_order([(self.course, 50)]).mark_as_completed()
+        self.make_order([(self.other_course, 30)]).mark_as_completed()
+
+        self.client.force_authenticate(user=self.student)
+        self.assertEqual(self.client.get('/api/payments/reports/sales/').status_code, 403)
+
+        admin = User.objects.create_user(username='admin', password='admin123', is_staff=True)
+        self.client.force_authenticate(user=admin)
+        response = self.client.get('/api/payments/reports/sales/', {'group_by': 'teacher'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['teacher'], row['gross']) for row in response.data['results']],
+            [(self.teacher.id, '50.00'), (self.other_teacher.id, '30.00')]
+        )
+
+        response = self.client.get('/api/payments/reports/sales/', {
+            'start': '2024-01-10', 'end': '2024-01-01'
+        })
+        self.assertEqual(response.status_code, 400)
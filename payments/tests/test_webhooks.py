@@ -0,0 +1,177 @@
+"""
+Tests for stored, idempotent Stripe webhook processing
+"""
+import hashlib
+import hmac
+import json
+import time
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from accounts.models import TeacherProfile
+from courses.models import Course
+from enrollments.models import Enrollment
+from payments.models import Order, OrderItem, Payment, StripeEvent
+from payments.webhooks import MAX_ATTEMPTS, process_pending_events, record_event
+
+User = get_user_model()
+
+WEBHOOK_SECRET = 'whsec_test'
+
+
+def make_event(event_id, event_type, obj, created):
+    return {
+        'id': event_id,
+        'object': 'event',
+        'type': event_type,
+        'created': created,
+        'data': {'object': obj},
+    }
+
+
+def intent(intent_id):
+    return {'id': intent_id, 'object': 'payment_intent'}
+
+
+def charge(intent_id, refunded=True, amount_refunded=5000):
+    return {
+        'id': 'ch_1', 'object': 'charge', 'payment_intent': intent_id,
+        'refunded': refunded, 'amount_refunded': amount_refunded
+    }
+
+
+class WebhookFixturesMixin:
+    def create_order(self, intent_id='pi_1'):
+        teacher_user = User.objects.create_user(username='teacher', password='teacher123')
+        teacher = TeacherProfile.objects.create(user=teacher_user)
+        self.course = Course.objects.create(
+            teacher=teacher, title='Conversation', price=50, published=True
+        )
+        self.student = User.objects.create_user(username='student', password='student123')
+        self.payment = Payment.objects.create(
+            user=self.student, amount=50, provider_payment_id=intent_id, status='processing'
+        )
+        self.order = Order.objects.create(
+            user=self.student, payment=self.payment, status='pending_payment'
+        )
+        OrderItem.objects.create(
+            order=self.order,
+            content_type=ContentType.objects.get_for_model(Course),
+            object_id=self.course.id,
+            name=self.course.title,
+            price=50
+        )
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+class WebhookEndpointTests(WebhookFixturesMixin, TestCase):
+    def setUp(self):
+        self.create_order()
+
+    def post(self, event, secret=WEBHOOK_SECRET):
+        payload = json.dumps(event)
+        timestamp = int(time.time())
+        signature = hmac.new(
+            secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256
+        ).hexdigest()
+        return self.client.post(
+            '/api/payments/webhook/', payload, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=f't={timestamp},v1={signature}'
+        )
+
+    def test_event_is_stored_not_processed(self):
+        event = make_event('evt_1', 'payment_intent.succeeded', intent('pi_1'), 100)
+
+        response = self.post(event)
+
+        self.assertEqual(response.status_code, 200)
+        stored = StripeEvent.objects.get(event_id='evt_1')
+        self.assertEqual(stored.status, 'pending')
+        self.assertEqual(stored.payment_key, 'pi_1')
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'processing')
+
+    def test_redelivery_is_deduplicated(self):
+        event = make_event('evt_1', 'payment_intent.succeeded', intent('pi_1'), 100)
+        self.assertEqual(self.post(event).status_code, 200)
+        self.assertEqual(self.post(event).status_code, 200)
+
+        self.assertEqual(StripeEvent.objects.count(), 1)
+        process_pending_events()
+        self.assertEqual(self.post(event).status_code, 200)
+        self.assertEqual(process_pending_events(), 0)
+        self.assertEqual(Enrollment.objects.filter(student=self.student).count(), 1)
+
+    def test_invalid_signature_is_rejected(self):
+        event = make_event('evt_1', 'payment_intent.succeeded', intent('pi_1'), 100)
+        self.assertEqual(self.post(event, secret='wrong').status_code, 400)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    def test_unhandled_types_are_ignored(self):
+        self.post(make_event('evt_2', 'customer.created', {'id': 'cus_1', 'object': 'customer'}, 1))
+        self.assertEqual(StripeEvent.objects.get().status, 'ignored')
+
+
+class EventProcessingTests(WebhookFixturesMixin, TestCase):
+    def setUp(self):
+        self.create_order()
+
+    def test_events_apply_in_stripe_order(self):
+        # Delivered out of order: the refund arrives before the success
+        record_event(make_event('evt_2', 'charge.refunded', charge('pi_1'), 200))
+        record_event(make_event('evt_1', 'payment_intent.succeeded', intent('pi_1'), 100))
+
+        self.assertEqual(process_pending_events(), 2)
+
+        self.payment.refresh_from_db()
+        self.order.refresh_from_db()
+        self.assertEqual(self.payment.status, 'refunded')
+        self.assertEqual(self.order.status, 'refunded')
+        self.assertEqual(
+            list(StripeEvent.objects.values_list('status', flat=True)),
+            ['processed', 'processed']
+        )
+
+    def test_failure_blocks_later_events_until_retry(self):
+        record_event(make_event('evt_1', 'payment_intent.succeeded', intent('pi_1'), 100))
+        record_event(make_event('evt_2', 'charge.refunded', charge('pi_1'), 200))
+
+        with patch('payments.models.Order.mark_as_completed', side_effect=RuntimeError('boom')):
+            self.assertEqual(process_pending_events(), 0)
+
+        first, second = StripeEvent.objects.all()
+        self.assertEqual((first.status, first.attempts, first.last_error), ('pending', 1, 'boom'))
+        self.assertEqual((second.status, second.attempts), ('pending', 0))
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'processing')
+
+        self.assertEqual(process_pending_events(), 2)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'refunded')
+
+    def test_event_fails_after_max_attempts(self):
+        record_event(make_event('evt_1', 'payment_intent.succeeded', intent('pi_1'), 100))
+
+        with patch('payments.models.Order.mark_as_completed', side_effect=RuntimeError('boom')):
+            for _ in range(MAX_ATTEMPTS):
+                process_pending_events()
+
+        self.assertEqual(StripeEvent.objects.get().status, 'failed')
+
+    def test_replay_command(self):
+        record_event(make_event('evt_1', 'payment_intent.succeeded', intent('pi_1'), 100))
+        call_command('process_stripe_events', stdout=StringIO())
+        Enrollment.objects.all().delete()
+        OrderItem.objects.update(enrollment_id=None)
+        Order.objects.filter(pk=self.order.pk).update(status='processing')
+
+        out = StringIO()
+        call_command('replay_stripe_events', 'evt_1', stdout=out)
+
+        self.assertIn('Replayed 1 of 1 events', out.getvalue())
+        self.assertEqual(Enrollment.objects.filter(student=self.student).count(), 1)
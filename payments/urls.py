@@ -13,11 +13,23 @@ urlpatterns = [
     # ViewSet URLs
     path('', include(router.urls)),
     
+    # Cart
+    path('cart/', views.CartView.as_view(), name='cart'),
+    path('cart/items/', views.CartItemsView.as_view(), name='cart-items'),
+    path('cart/items/<str:content_type>/<int:object_id>/',
+         views.CartItemDetailView.as_view(), name='cart-item-detail'),
+    path('cart/coupon/', views.CartCouponView.as_view(), name='cart-coupon'),
+    path('cart/checkout/', views.CartCheckoutView.as_view(), name='cart-checkout'),
+    
     # Checkout endpoints
     path('checkout/', views.CheckoutView.as_view(), name='checkout'),
     path('confirm-payment/<int:payment_id>/', 
          views.PaymentConfirmView.as_view(), name='confirm-payment'),
     
+    # Reports
+    path('earnings/', views.EarningsView.as_view(), name='earnings'),
+    path('reports/sales/', views.SalesReportView.as_view(), name='sales-report'),
+    
     # Webhook URL
     path('webhook/', webhooks.stripe_webhook, name='stripe-webhook'),
 ]
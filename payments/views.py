@@ -5,15 +5,22 @@ from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.db import transaction
 from django.contrib.contenttypes.models import ContentType
+from django.urls import reverse
 from rest_framework import viewsets, generics, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from core.file_serving import serve_file
 from courses.models import Course
-from .models import Order, OrderItem, Payment
+from .cart import add_item, checkout_cart, get_cart, price_cart
+from .models import Cart, Order, OrderItem, Payment, SalesRollup
+from .coupons import CouponError, calculate_discount, get_rule, redeem_coupon, release_coupon
+from .pricing import PricingError, content_types_by_name
+from .receipts import RECEIPT_STATUSES, get_receipt
+from .rollups import summarize
 from .serializers import (
-    OrderSerializer, OrderCreateSerializer, PaymentSerializer,
-    CheckoutSerializer, CourseOrderSerializer
+    OrderSerializer, OrderCreateSerializer, OrderItemCreateSerializer, PaymentSerializer,
+    ApplyCouponSerializer, CheckoutSerializer, CourseOrderSerializer, SalesReportQuerySerializer
 )
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
@@ -48,6 +55,11 @@ class OrderViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Filter orders to show only user's own orders"""
+        if self.action in ('receipt', 'receipt_document'):
+            # Served from the stored receipt; items are only needed to build one
+            return Order.objects.filter(user=self.request.user).select_related(
+                'receipt', 'payment'
+            )
         return Order.objects.filter(user=self.request.user).prefetch_related(
             'items', 'payment'
         ).order_by('-created_at')
@@ -64,52 +76,79 @@ class OrderViewSet(viewsets.ModelViewSet):
     @action(detail=True)
     def receipt(self, request, pk=None):
         """
-        Generate and return payment receipt
+        Return the stored payment receipt
         """
         order = self.get_object()
-        if order.status != 'completed':
+        if order.status not in RECEIPT_STATUSES:
             return Response(
                 {'error': 'Receipt only available for completed orders'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get items
-        items = order.items.all()
-        item_details = []
+        receipt = get_receipt(order)
+        receipt_data = dict(receipt.data)
+        receipt_data['document_url'] = request.build_absolute_uri(
+            f"{reverse('payments:order-receipt-document', args=[order.pk])}?v={receipt.content_hash}"
+        )
+        return Response(receipt_data)
+    
+    @action(detail=True, url_path='receipt/document')
+    def receipt_document(self, request, pk=None):
+        """
+        Download the rendered receipt document.
         
-        for item in items:
-            item_details.append({
-                'name': item.name,
-                'description': item.description,
-                'quantity': item.quantity,
-                'price': str(item.price),
-                'subtotal': str(item.subtotal)
-            })
+        Requested with the current ?v=<content hash> (as linked from the
+        receipt endpoint) the document is cacheable for a year; the hash
+        changes when a refund regenerates the receipt.
+        """
+        order = self.get_object()
+        if order.status not in RECEIPT_STATUSES:
+            return Response(
+                {'error': 'Receipt only available for completed orders'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        receipt = get_receipt(order)
+        if request.query_params.get('v') == receipt.content_hash:
+            cache_control = 'private, max-age=31536000, immutable'
+        else:
+            cache_control = 'private, no-cache'
+        return serve_file(
+            request,
+            receipt.file,
+            'text/html; charset=utf-8',
+            filename=f'receipt-{order.pk}.html',
+            etag=receipt.content_hash,
+            cache_control=cache_control
+        )
+    
+    @action(detail=True, methods=['post'])
+    def coupon(self, request, pk=None):
+        """
+        Apply a coupon code to a draft order, or remove it with an empty code
+        """
+        order = self.get_object()
+        if order.status != 'draft':
+            return Response(
+                {'error': 'Coupons can only be changed on draft orders'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Basic receipt data
-        receipt_data = {
-            'order_id': order.id,
-            'date': order.created_at.strftime('%Y-%m-%d'),
-            'completed_date': order.completed_at.strftime('%Y-%m-%d') if order.completed_at else None,
-            'items': item_details,
-            'subtotal': str(order.subtotal),
-            'discount': str(order.discount_amount),
-            'tax': str(order.tax_amount),
-            'total': str(order.total_amount),
-            'status': order.status
-        }
+        serializer = ApplyCouponSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        code = serializer.validated_data['code']
         
-        # Add payment details if available
-        if order.payment:
-            receipt_data['payment'] = {
-                'id': order.payment.id,
-                'method': order.payment.payment_method,
-                'provider': order.payment.provider,
-                'transaction_id': order.payment.transaction_id,
-                'receipt_url': order.payment.receipt_url
-            }
-            
-        return Response(receipt_data)
+        if code:
+            try:
+                rule = get_rule(code)
+                calculate_discount(rule, order.items.all())
+            except CouponError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            order.coupon_code = rule.code
+        else:
+            order.coupon_code = ''
+        order.calculate_totals()
+        return Response(OrderSerializer(order).data)
     
     @transaction.atomic
     @action(detail=False, methods=['post'])
@@ -162,26 +201,37 @@ class CheckoutView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = CheckoutSerializer
     
-    @transaction.atomic
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        # Get the order
-        order_id = serializer.validated_data['order_id']
-        order = get_object_or_404(Order, id=order_id, user=request.user)
-        
-        # Check if order is already in progress
-        if order.status != 'draft':
-            return Response({
-                'error': 'Order is already being processed'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
         # Get payment method and details
+        order_id = serializer.validated_data['order_id']
         payment_method = serializer.validated_data['payment_method']
         payment_details = serializer.validated_data.get('payment_details', {})
         
-        try:
+        # Price the order, count the coupon use and create the payment in a
+        # short transaction; no lock is held while Stripe is called
+        with transaction.atomic():
+            order = get_object_or_404(
+                Order.objects.select_for_update(), id=order_id, user=request.user
+            )
+            
+            # Check if order is already in progress
+            if order.status != 'draft':
+                return Response({
+                    'error': 'Order is already being processed'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Re-price the order and count the coupon use
+            order.calculate_totals()
+            try:
+                redeem_coupon(order)
+            except CouponError as e:
+                return Response({
+                    'error': str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
             # Create payment object
             payment = Payment.objects.create(
                 user=request.user,
@@ -197,7 +247,8 @@ class CheckoutView(generics.GenericAPIView):
             order.payment = payment
             order.status = 'pending_payment'
             order.save()
-            
+        
+        try:
             # Create Stripe PaymentIntent
             metadata = {
                 'order_id': str(order.id),
@@ -219,22 +270,31 @@ class CheckoutView(generics.GenericAPIView):
                 payment_method_types=['card']
             )
             
-            # Update payment with Stripe details
-            payment.provider_payment_id = intent.id
-            payment.provider_reference = intent.id
-            payment.save()
-            
-            return Response({
-                'client_secret': intent.client_secret,
-                'payment_id': payment.id,
-                'stripe_publishable_key': settings.STRIPE_PUBLISHABLE_KEY,
-                'order': OrderSerializer(order).data
-            })
-            
-        except stripe.error.StripeError as e:
+        except Exception as e:
+            # Put the order back in draft and give the coupon use back
+            with transaction.atomic():
+                release_coupon(order)
+                order.payment = None
+                order.status = 'draft'
+                order.save()
+                payment.delete()
+            if not isinstance(e, stripe.error.StripeError):
+                raise
             return Response({
                 'error': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Update payment with Stripe details
+        payment.provider_payment_id = intent.id
+        payment.provider_reference = intent.id
+        payment.save()
+        
+        return Response({
+            'client_secret': intent.client_secret,
+            'payment_id': payment.id,
+            'stripe_publishable_key': settings.STRIPE_PUBLISHABLE_KEY,
+            'order': OrderSerializer(order).data
+        })
 
 
 class PaymentConfirmView(generics.GenericAPIView):
@@ -312,3 +372,180 @@ class PaymentConfirmView(generics.GenericAPIView):
             return Response({
                 'error': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _rollups_for_period(data):
+    return SalesRollup.objects.filter(day__gte=data['start'], day__lte=data['end'])
+
+
+class EarningsView(generics.GenericAPIView):
+    """
+    Earnings of the requesting teacher, read from the daily sales rollups.
+
+    Query params: start, end (dates, default the last 30 days), currency.
+    Returns totals, per-course totals and per-day totals, each per currency.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        teacher = getattr(request.user, 'teacher_profile', None)
+        if teacher is None:
+            return Response({
+                'detail': 'Only teachers have earnings'
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        params = SalesReportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+
+        rollups = _rollups_for_period(data).filter(teacher=teacher)
+        if 'currency' in data:
+            rollups = rollups.filter(currency=data['currency'])
+
+        return Response({
+            'teacher': teacher.id,
+            'start': data['start'],
+            'end': data['end'],
+            'totals': summarize(rollups),
+            'courses': summarize(rollups, ['course', 'course__title']),
+            'days': summarize(rollups, ['day'])
+        })
+
+
+class SalesReportView(generics.GenericAPIView):
+    """
+    Sales across all teachers for admin dashboards, read from the rollups.
+
+    Query params: start, end (dates, default the last 30 days), group_by
+    (day, teacher, course or content_type), teacher, currency.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        params = SalesReportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+
+        rollups = _rollups_for_period(data)
+        if 'teacher' in data:
+            rollups = rollups.filter(teacher_id=data['teacher'])
+        if 'currency' in data:
+            rollups = rollups.filter(currency=data['currency'])
+
+        group_by = {
+            'day': ['day'],
+            'teacher': ['teacher'],
+            'course': ['course', 'course__title'],
+            'content_type': ['content_type__model'],
+        }.get(data.get('group_by'), [])
+
+        return Response({
+            'start': data['start'],
+            'end': data['end'],
+            'group_by': data.get('group_by'),
+            'results': summarize(rollups, group_by)
+        })
+
+
+def _cart_data(priced):
+    return {
+        'items': [
+            {
+                'content_type': line.content_type.model,
+                'object_id': line.object_id,
+                'name': line.name,
+                'price': str(line.price),
+                'quantity': line.quantity,
+                'subtotal': str(line.subtotal)
+            }
+            for line in priced.lines
+        ],
+        'coupon_code': priced.coupon_code,
+        'subtotal': str(priced.subtotal),
+        'discount_amount': str(priced.discount_amount),
+        'tax_amount': str(priced.tax_amount),
+        'total_amount': str(priced.total_amount)
+    }
+
+
+class CartView(generics.GenericAPIView):
+    """
+    The requesting user's cart, priced with current prices.
+    GET shows it, DELETE empties it.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(_cart_data(price_cart(get_cart(request.user))))
+
+    def delete(self, request):
+        Cart.objects.filter(user=request.user).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CartItemsView(generics.GenericAPIView):
+    """
+    Add content to the cart (POST with content_type, object_id, quantity)
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = OrderItemCreateSerializer
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            content_type = content_types_by_name([data['content_type']])[data['content_type']]
+            cart = add_item(request.user, content_type, data['object_id'], data['quantity'])
+        except PricingError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(_cart_data(price_cart(cart)), status=status.HTTP_201_CREATED)
+
+
+class CartItemDetailView(generics.GenericAPIView):
+    """
+    Remove content from the cart
+    """
+    permission_classes = [IsAuthenticated]
+
+    def delete(self, request, content_type, object_id):
+        cart = get_cart(request.user)
+        cart.items.filter(content_type__model=content_type, object_id=object_id).delete()
+        return Response(_cart_data(price_cart(cart)))
+
+
+class CartCouponView(generics.GenericAPIView):
+    """
+    Set the cart's coupon code, or remove it with an empty code
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = ApplyCouponSerializer
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        code = serializer.validated_data['code']
+
+        cart = get_cart(request.user)
+        if code:
+            try:
+                code = get_rule(code).code
+            except CouponError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        cart.coupon_code = code
+        cart.save(update_fields=['coupon_code', 'updated_at'])
+        return Response(_cart_data(price_cart(cart)))
+
+
+class CartCheckoutView(generics.GenericAPIView):
+    """
+    Turn the cart into a draft order, to be paid through the checkout endpoint
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            order = checkout_cart(request.user)
+        except PricingError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
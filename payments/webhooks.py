@@ -1,42 +1,50 @@
+"""
+Stripe webhook endpoint and event processing.
+
+The endpoint only verifies the signature and stores the event; Stripe gets
+its 200 straight away and redelivered events hit the unique event_id and
+are dropped. A worker (the process_stripe_events command) then applies the
+stored events in the order Stripe created them, one payment at a time.
+"""
+import json
 import stripe
 import logging
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.utils import timezone
-from .models import Payment, Order
+from .coupons import release_coupon
+from .models import Payment, Order, StripeEvent
+from .receipts import generate_receipt_safely
+from .rollups import record_refund
 
 logger = logging.getLogger(__name__)
 
+# Failed events are retried until they have been attempted this many times
+MAX_ATTEMPTS = 5
+
+
 @csrf_exempt
 @require_POST
 def stripe_webhook(request):
     """
-    Handle Stripe webhook events
+    Verify and store a Stripe webhook event for asynchronous processing
     """
     payload = request.body
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
     
     try:
         # Verify webhook signature
-        event = stripe.Webhook.construct_event(
+        stripe.Webhook.construct_event(
             payload,
             sig_header,
             settings.STRIPE_WEBHOOK_SECRET
         )
-        
-        # Handle different event types
-        if event.type == 'payment_intent.succeeded':
-            handle_payment_intent_succeeded(event.data.object)
-                
-        elif event.type == 'payment_intent.payment_failed':
-            handle_payment_intent_failed(event.data.object)
-            
-        elif event.type == 'charge.refunded':
-            handle_refund(event.data.object)
-            
-        # Return success
+        record_event(json.loads(payload))
         return HttpResponse(status=200)
         
     except ValueError as e:
@@ -52,6 +60,103 @@ def stripe_webhook(request):
         return HttpResponse(status=500)
 
 
+def payment_key_for(event_data):
+    """The payment intent a raw event refers to, or '' if none"""
+    obj = event_data.get('data', {}).get('object', {})
+    if obj.get('object') == 'payment_intent':
+        return obj.get('id', '')
+    return obj.get('payment_intent') or ''
+
+
+def record_event(event_data):
+    """
+    Store a raw event unless it was received before.
+
+    Returns:
+        tuple: (StripeEvent, created)
+    """
+    event_type = event_data['type']
+    try:
+        with transaction.atomic():
+            event = StripeEvent.objects.create(
+                event_id=event_data['id'],
+                event_type=event_type,
+                payment_key=payment_key_for(event_data),
+                payload=event_data,
+                stripe_created=datetime.fromtimestamp(
+                    event_data.get('created', 0), tz=dt_timezone.utc
+                ),
+                status='pending' if event_type in EVENT_HANDLERS else 'ignored'
+            )
+        return event, True
+    except IntegrityError:
+        logger.info(f"Duplicate webhook event {event_data['id']} ignored")
+        return StripeEvent.objects.get(event_id=event_data['id']), False
+
+
+def apply_event(event):
+    """Run the handler for a stored event"""
+    stripe_event = stripe.Event.construct_from(event.payload, stripe.api_key)
+    EVENT_HANDLERS[event.event_type](stripe_event.data.object)
+
+
+def process_events_for_payment(payment_key):
+    """
+    Apply the pending events of one payment in order.
+
+    The payment row is locked for the duration, so concurrent workers
+    serialize on it. Processing stops at the first failing event so later
+    events never overtake it; it is retried on the next run.
+
+    Returns:
+        int: number of events processed
+    """
+    processed = 0
+    with transaction.atomic():
+        list(Payment.objects.select_for_update().filter(provider_payment_id=payment_key))
+        events = StripeEvent.objects.select_for_update().filter(
+            payment_key=payment_key, status='pending'
+        ).order_by('stripe_created', 'id')
+
+        for event in events:
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    apply_event(event)
+            except Exception as e:
+                logger.error(f"Error processing webhook event {event.event_id}: {str(e)}")
+                event.last_error = str(e)
+                if event.attempts >= MAX_ATTEMPTS:
+                    event.status = 'failed'
+                event.save(update_fields=['attempts', 'last_error', 'status'])
+                if event.status == 'pending':
+                    break
+                continue
+
+            event.status = 'processed'
+            event.processed_at = timezone.now()
+            event.save(update_fields=['attempts', 'status', 'processed_at'])
+            processed += 1
+    return processed
+
+
+def process_pending_events(limit=100):
+    """
+    Process pending events, grouped by payment.
+
+    Returns:
+        int: number of events processed
+    """
+    keys = []
+    for key in StripeEvent.objects.filter(status='pending').order_by(
+        'stripe_created', 'id'
+    ).values_list('payment_key', flat=True)[:limit]:
+        if key not in keys:
+            keys.append(key)
+
+    return sum(process_events_for_payment(key) for key in keys)
+
+
 def handle_payment_intent_succeeded(payment_intent):
     """
     Handle successful payment
@@ -60,9 +165,10 @@ def handle_payment_intent_succeeded(payment_intent):
         # Find payment by provider_payment_id
         payment = Payment.objects.get(provider_payment_id=payment_intent.id)
         
-        # Mark payment as completed
-        payment.status = 'completed'
-        payment.completed_at = timezone.now()
+        # Mark payment as completed, keeping the original time on replays
+        if payment.status != 'completed':
+            payment.status = 'completed'
+            payment.completed_at = timezone.now()
         
         # Get receipt URL if available
         if hasattr(payment_intent, 'charges') and payment_intent.charges.data:
@@ -90,9 +196,6 @@ def handle_payment_intent_succeeded(payment_intent):
             
         except Order.DoesNotExist:
             logger.error(f"Order not found for payment_intent: {payment_intent.id}")
-            
-    except Exception as e:
-        logger.error(f"Error processing payment success: {str(e)}")
 
 
 def handle_payment_intent_failed(payment_intent):
@@ -104,18 +207,40 @@ def handle_payment_intent_failed(payment_intent):
         payment.status = 'failed'
         payment.save()
         
-        # Update order status
+        # Update order status and give its coupon use back; a successful
+        # retry counts the use again (Order.mark_as_completed)
         if hasattr(payment, 'order'):
             payment.order.status = 'failed'
             payment.order.save()
+            release_coupon(payment.order)
             
         logger.info(f"Payment {payment.id} marked as failed via webhook")
         
     except Payment.DoesNotExist:
         logger.error(f"Payment not found for failed payment_intent: {payment_intent.id}")
+
+
+def handle_payment_intent_canceled(payment_intent):
+    """
+    Handle a payment cancelled in Stripe, e.g. an abandoned checkout
+    """
+    try:
+        payment = Payment.objects.get(provider_payment_id=payment_intent.id)
+        if payment.status in ('pending', 'processing'):
+            payment.status = 'cancelled'
+            payment.save()
         
-    except Exception as e:
-        logger.error(f"Error processing payment failure: {str(e)}")
+        if hasattr(payment, 'order'):
+            order = payment.order
+            if order.status == 'pending_payment':
+                order.status = 'cancelled'
+                order.save()
+            release_coupon(order)
+            
+        logger.info(f"Payment {payment.id} marked as cancelled via webhook")
+        
+    except Payment.DoesNotExist:
+        logger.error(f"Payment not found for cancelled payment_intent: {payment_intent.id}")
 
 
 def handle_refund(charge):
@@ -137,13 +262,28 @@ def handle_refund(charge):
         
         # Update order if exists
         if hasattr(payment, 'order'):
-            payment.order.status = 'refunded'
-            payment.order.save()
+            order = payment.order
+            if order.status != 'refunded':
+                order.refunded_at = timezone.now()
+            order.status = 'refunded'
+            # amount_refunded is the total so far, in cents; events may repeat
+            refunded = Decimal(charge.amount_refunded) / 100
+            newly_refunded = refunded - order.refunded_amount
+            if newly_refunded > 0:
+                order.refunded_amount = refunded
+            order.save()
+            record_refund(order, newly_refunded)
+            transaction.on_commit(lambda: generate_receipt_safely(order.pk))
             
         logger.info(f"Payment {payment.id} marked as refunded via webhook")
         
     except Payment.DoesNotExist:
         logger.error(f"Payment not found for refund of charge: {charge.id}")
-        
-    except Exception as e:
-        logger.error(f"Error processing refund: {str(e)}")
+
+
+EVENT_HANDLERS = {
+    'payment_intent.succeeded': handle_payment_intent_succeeded,
+    'payment_intent.payment_failed': handle_payment_intent_failed,
+    'payment_intent.canceled': handle_payment_intent_canceled,
+    'charge.refunded': handle_refund,
+}